@@ -3,6 +3,8 @@
 from .atomic_agent import (
     AtomicAgent,
     AgentConfig,
+    BatchItemResult,
+    RunResult,
     BasicChatInputSchema,
     BasicChatOutputSchema,
 )
@@ -10,6 +12,8 @@ from .atomic_agent import (
 __all__ = [
     "AtomicAgent",
     "AgentConfig",
+    "BatchItemResult",
+    "RunResult",
     "BasicChatInputSchema",
     "BasicChatOutputSchema",
 ]
@@ -1,45 +1,139 @@
 import instructor
 from instructor import Mode
+from instructor.core.hooks import Hooks, HookName
 from instructor.processing.multimodal import Image, Audio, PDF
-from pydantic import BaseModel, Field
-from typing import Optional, Type, Generator, AsyncGenerator, get_args, get_origin, Dict, List, Callable, Any
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import (
+    Optional,
+    Type,
+    Generator,
+    AsyncGenerator,
+    AsyncIterator,
+    get_args,
+    get_origin,
+    Dict,
+    List,
+    Callable,
+    Any,
+    Iterable,
+    NamedTuple,
+    Tuple,
+    Set,
+)
+import asyncio
+import copy
+import inspect
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
 import logging
-from atomic_agents.context.chat_history import ChatHistory
+from contextvars import ContextVar, copy_context
+from atomic_agents.context.chat_history import ChatHistory, Message
 from atomic_agents.context.system_prompt_generator import (
     BaseDynamicContextProvider,
     SystemPromptGenerator,
     BaseSystemPromptGenerator,
+    fetch_context_snapshot,
+    fetch_context_snapshot_async,
+    use_context_snapshot,
 )
 from atomic_agents.base.base_io_schema import BaseIOSchema
-from atomic_agents.utils.token_counter import get_token_counter, TokenCountResult
+from atomic_agents.utils.token_counter import get_token_counter, TokenCountResult, OffloadedTokenCountResult
+from atomic_agents.utils.token_backends import BaseTokenCounterBackend
+from atomic_agents.utils.response_cache import BaseResponseCache, make_cache_key
+from atomic_agents.utils.single_flight import SingleFlight
+from atomic_agents.utils.rate_limiter import RateLimiter
+from atomic_agents.utils.schema_cache import get_schema_artifacts
+from atomic_agents.utils.prompt_cache import extract_prompt_cache_usage, supports_cache_control, with_cache_control
 import json
 
 from instructor.dsl.partial import PartialBase
-from jiter import from_json
+from atomic_agents.utils.partial_json import PartialCoalescer, PartialModelStream
+
+# Events emitted by Instructor itself; the agent relays them to its handlers through per-request hooks
+_INSTRUCTOR_HOOK_EVENTS = frozenset(hook_name.value for hook_name in HookName)
+
+# Shared executor for background hook handlers of agents without a hook_executor
+_default_hook_executor: Optional[ThreadPoolExecutor] = None
+_default_hook_executor_lock = threading.Lock()
+
+
+def _get_default_hook_executor() -> ThreadPoolExecutor:
+    global _default_hook_executor
+    with _default_hook_executor_lock:
+        if _default_hook_executor is None:
+            _default_hook_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="atomic-agents-hooks")
+        return _default_hook_executor
+
+
+# Creates the PartialModelStream for the partial stream being started, set by the agent around create_partial
+_partial_stream_factory: ContextVar[Optional[Callable[..., PartialModelStream]]] = ContextVar(
+    "_partial_stream_factory", default=None
+)
 
 
 def model_from_chunks_patched(cls, json_chunks, **kwargs):
-    potential_object = ""
-    partial_model = cls.get_partial_model()
+    stream = (_partial_stream_factory.get() or PartialModelStream)(cls.get_partial_model(), **kwargs)
     for chunk in json_chunks:
-        potential_object += chunk
-        obj = from_json((potential_object or "{}").encode(), partial_mode="trailing-strings")
-        obj = partial_model.model_validate(obj, strict=None, **kwargs)
-        yield obj
+        partial = stream.feed(chunk)
+        if partial is not None:
+            yield partial
+        if stream.stopped:
+            # Stop reading so the provider stream is released early
+            if hasattr(json_chunks, "close"):
+                json_chunks.close()
+            return
+    partial = stream.flush()
+    if partial is not None:
+        yield partial
 
 
 async def model_from_chunks_async_patched(cls, json_chunks, **kwargs):
-    potential_object = ""
-    partial_model = cls.get_partial_model()
+    stream = (_partial_stream_factory.get() or PartialModelStream)(cls.get_partial_model(), **kwargs)
     async for chunk in json_chunks:
-        potential_object += chunk
-        obj = from_json((potential_object or "{}").encode(), partial_mode="trailing-strings")
-        obj = partial_model.model_validate(obj, strict=None, **kwargs)
-        yield obj
+        partial = stream.feed(chunk)
+        if partial is not None:
+            yield partial
+        if stream.stopped:
+            # Stop reading so the provider stream is released early
+            if hasattr(json_chunks, "aclose"):
+                await json_chunks.aclose()
+            return
+    partial = stream.flush()
+    if partial is not None:
+        yield partial
+
+
+_from_streaming_response = PartialBase.from_streaming_response.__func__
+_from_streaming_response_async = PartialBase.from_streaming_response_async.__func__
+
+
+def from_streaming_response_patched(cls, completion, mode, **kwargs):
+    try:
+        yield from _from_streaming_response(cls, completion, mode, **kwargs)
+    finally:
+        # Release the provider stream, which closing the JSON chunk generator alone doesn't do
+        if hasattr(completion, "close"):
+            completion.close()
+
+
+async def from_streaming_response_async_patched(cls, completion, mode, **kwargs):
+    try:
+        async for item in _from_streaming_response_async(cls, completion, mode, **kwargs):
+            yield item
+    finally:
+        # Async generators have aclose(), provider streams (e.g. openai.AsyncStream) an async close()
+        close = getattr(completion, "aclose", None) or getattr(completion, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
 
 
 PartialBase.model_from_chunks = classmethod(model_from_chunks_patched)
 PartialBase.model_from_chunks_async = classmethod(model_from_chunks_async_patched)
+PartialBase.from_streaming_response = classmethod(from_streaming_response_patched)
+PartialBase.from_streaming_response_async = classmethod(from_streaming_response_async_patched)
 
 
 class BasicChatInputSchema(BaseIOSchema):
@@ -63,6 +157,43 @@ class BasicChatOutputSchema(BaseIOSchema):
     )
 
 
+class BatchItemResult(NamedTuple):
+    """
+    Result of a single item of a batch run.
+
+    Attributes:
+        index: Position of the item in the batch inputs.
+        input: The input of the item.
+        output: The response, or None if the item failed.
+        error: The exception raised by the item, or None if it succeeded.
+        history: The item's own copy of the history, including its turn.
+    """
+
+    index: int
+    input: Any
+    output: Optional[Any]
+    error: Optional[BaseException]
+    history: ChatHistory
+
+    @property
+    def ok(self) -> bool:
+        """Whether the item succeeded."""
+        return self.error is None
+
+
+class RunResult(NamedTuple):
+    """
+    Result of a run on an explicitly passed history.
+
+    Attributes:
+        output: The response.
+        new_messages: The messages appended to the history by the run (the user input and the response).
+    """
+
+    output: Any
+    new_messages: List[Message]
+
+
 class AgentConfig(BaseModel):
     client: instructor.core.client.Instructor = Field(..., description="Client for interacting with the language model.")
     model: str = Field(default="gpt-5-mini", description="The model to use for generating responses.")
@@ -97,9 +228,113 @@ class AgentConfig(BaseModel):
         description=(
             "Maximum tokens for the full context (system prompt + history + tools). "
             "When exceeded, oldest conversation turns are automatically trimmed to stay within limit. "
-            "Uses LiteLLM's provider-agnostic token counter — works with any supported model."
+            "Uses LiteLLM's provider-agnostic token counter — works with any supported model — "
+            "unless token_counter_backend is set."
+        ),
+    )
+    trim_target_tokens: Optional[int] = Field(
+        None,
+        description=(
+            "Low watermark for context trimming. When the context exceeds max_context_tokens (the high watermark), "
+            "oldest turns are trimmed until it fits within trim_target_tokens, so trimming happens rarely and the "
+            "message prefix stays unchanged in between. Defaults to max_context_tokens."
+        ),
+    )
+    token_counter_backend: Optional[BaseTokenCounterBackend] = Field(
+        None,
+        description=(
+            "Tokenizer backend for get_context_token_count and max_context_tokens trimming. "
+            "Defaults to LiteLLM's exact counting; HeuristicBackend estimates offline in microseconds."
+        ),
+    )
+    token_counter_executor: Optional[Executor] = Field(
+        None,
+        description=(
+            "Thread pool in which run_async and run_async_stream count tokens, so tokenizing the history "
+            "doesn't block the event loop. Defaults to the event loop's default executor."
+        ),
+    )
+    hook_executor: Optional[Executor] = Field(
+        None,
+        description=(
+            "Executor in which hook handlers registered with background=True run. Defaults to a thread pool "
+            "shared by all agents."
+        ),
+    )
+    response_cache: Optional[BaseResponseCache] = Field(
+        None,
+        description=(
+            "Cache for responses of run/run_async. Requests with the same model, messages, output schema and "
+            "API parameters are answered from the cache instead of calling the model."
+        ),
+    )
+    single_flight: Optional[SingleFlight] = Field(
+        None,
+        description=(
+            "Group in which concurrent identical run_async requests share one in-flight model call. "
+            "Agents sharing the group (e.g. created from the same config) coalesce their requests."
+        ),
+    )
+    rate_limiter: Optional[RateLimiter] = Field(
+        None,
+        description=(
+            "Rate limiter shared by agents using the same provider account. Each model call waits until the "
+            "limiter admits it, based on the estimated prompt tokens plus the reserved output tokens."
+        ),
+    )
+    prompt_cache_layout: bool = Field(
+        False,
+        description=(
+            "Lay out messages for provider-side prompt caching. The system message only holds the static part of "
+            "the system prompt; the dynamic part (context provider output) is sent after the conversation history "
+            "with the tool_result_role (the user role with cache markers), so the leading messages stay identical "
+            "across requests."
+        ),
+    )
+    prompt_cache_markers: Optional[bool] = Field(
+        None,
+        description=(
+            "Whether prompt_cache_layout adds cache-control breakpoints to the system message and the last history "
+            "message. None adds them for backends that support them (Anthropic)."
+        ),
+    )
+    stream_min_interval: Optional[float] = Field(
+        None,
+        description=(
+            "Minimum number of seconds between two partial responses yielded while streaming. "
+            "Partials arriving in between are coalesced; the latest state is always yielded at the end of the stream."
         ),
     )
+    stream_min_changed_chars: Optional[int] = Field(
+        None,
+        description=(
+            "Minimum number of streamed JSON characters between two partial responses yielded while streaming. "
+            "Partials arriving in between are coalesced; the latest state is always yielded at the end of the stream."
+        ),
+    )
+    stream_skip_unchanged: bool = Field(
+        False,
+        description=(
+            "Skip partial responses identical to the previously yielded one while streaming. "
+            "Always enabled when stream_min_interval or stream_min_changed_chars is set."
+        ),
+    )
+    stream_stop_after_fields: Optional[List[str]] = Field(
+        None,
+        description=(
+            "Top-level output fields after which streaming stops. Once all of them and every required field are "
+            "complete, the provider stream is closed and the remaining optional fields keep their defaults."
+        ),
+    )
+
+    @model_validator(mode="after")
+    def _check_trim_target_tokens(self) -> "AgentConfig":
+        if self.trim_target_tokens is not None:
+            if self.max_context_tokens is None:
+                raise ValueError("trim_target_tokens requires max_context_tokens")
+            if self.trim_target_tokens > self.max_context_tokens:
+                raise ValueError("trim_target_tokens must not exceed max_context_tokens")
+        return self
 
 
 class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
@@ -126,24 +361,43 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         model_api_parameters (dict): Additional parameters passed to the API provider.
             - Use this for parameters like 'temperature', 'max_tokens', etc.
         max_context_tokens (Optional[int]): Maximum tokens for the full context. When exceeded,
-            oldest conversation turns are automatically trimmed. Uses LiteLLM's token counter.
+            oldest conversation turns are automatically trimmed. Uses LiteLLM's token counter by default.
+        trim_target_tokens (Optional[int]): Token count trimming reduces the context to once max_context_tokens is
+            exceeded. Defaults to max_context_tokens.
+        token_counter_backend (Optional[BaseTokenCounterBackend]): Tokenizer backend used for token counting.
+        token_counter_executor (Optional[Executor]): Thread pool in which the async run methods count tokens.
+        hook_executor (Optional[Executor]): Executor in which background hook handlers run.
+        response_cache (Optional[BaseResponseCache]): Cache for responses of run/run_async.
+        single_flight (Optional[SingleFlight]): Group in which concurrent identical run_async requests share one call.
+        rate_limiter (Optional[RateLimiter]): Rate limiter shared by agents using the same provider account.
+        prompt_cache_layout (bool): Whether the static system prompt and the history are sent ahead of the dynamic context.
+        prompt_cache_markers (Optional[bool]): Whether cache-control breakpoints are added to the prompt cache layout.
+        stream_min_interval (Optional[float]): Minimum seconds between two partial responses yielded while streaming.
+        stream_min_changed_chars (Optional[int]): Minimum streamed JSON characters between two partial responses.
+        stream_skip_unchanged (bool): Whether partial responses identical to the previous one are skipped.
+        stream_stop_after_fields (Optional[List[str]]): Top-level output fields after which streaming stops.
 
     Hook System:
         The AtomicAgent integrates with Instructor's hook system to provide comprehensive monitoring
-        and error handling capabilities. Supported events include:
+        and error handling capabilities. Handlers are kept on the agent, not on the client: the
+        agent passes its own hooks with each request, so agents sharing a client only see events
+        of their own requests. Supported events include:
 
         - 'parse:error': Triggered when Pydantic validation fails
         - 'completion:kwargs': Triggered before completion request
         - 'completion:response': Triggered after completion response
         - 'completion:error': Triggered on completion errors
         - 'completion:last_attempt': Triggered on final retry attempt
+        - 'token:counted': Triggered with the TokenCountResult of every context token count
+        - 'prompt_cache:usage': Triggered with the PromptCacheUsage of responses reporting prompt caching statistics
 
     Hook Methods:
-        - register_hook(event, handler): Register a hook handler for an event
+        - register_hook(event, handler, background=False): Register a hook handler for an event
         - unregister_hook(event, handler): Remove a hook handler
         - clear_hooks(event=None): Clear hooks for specific event or all events
         - enable_hooks()/disable_hooks(): Control hook processing
         - hooks_enabled: Property to check if hooks are enabled
+        - wait_for_hooks(timeout=None): Wait for background hook handlers to finish
 
     Example:
         ```python
@@ -204,16 +458,43 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         self.mode = config.mode
         self.model_api_parameters = config.model_api_parameters or {}
         self.max_context_tokens = config.max_context_tokens
+        self.trim_target_tokens = config.trim_target_tokens
+        self.token_counter_backend = config.token_counter_backend
+        self.token_counter_executor = config.token_counter_executor
+        self.hook_executor = config.hook_executor
+        self.response_cache = config.response_cache
+        self.single_flight = config.single_flight
+        self.rate_limiter = config.rate_limiter
+        self.prompt_cache_layout = config.prompt_cache_layout
+        self.prompt_cache_markers = config.prompt_cache_markers
+        self.stream_min_interval = config.stream_min_interval
+        self.stream_min_changed_chars = config.stream_min_changed_chars
+        self.stream_skip_unchanged = config.stream_skip_unchanged
+        self.stream_stop_after_fields = config.stream_stop_after_fields
+
+        # Messages the runs append to the history, recorded by forks for RunResult.new_messages
+        self._appended_messages: Optional[List[Message]] = None
+
+        # Field completion callbacks for streamed responses
+        self._field_callbacks: Dict[str, List[Callable]] = {}
 
         # Hook management attributes
         self._hook_handlers: Dict[str, List[Callable]] = {}
         self._hooks_enabled: bool = True
+        # Handlers run in hook_executor (or on the event loop, for coroutine functions) instead of inline
+        self._background_hooks: Set[Tuple[str, Callable]] = set()
+        self._pending_hooks: Set[Future] = set()
+        # Hooks passed with this agent's requests, relaying Instructor events to _dispatch_hook
+        self._instructor_hooks: Hooks = Hooks()
+        self._hook_relays: Dict[str, Callable] = {}
 
     def reset_history(self):
         """
         Resets the history to its initial state.
+
+        The history is restored in place, so a persistent history (e.g. SQLiteChatHistory) stays persistent.
         """
-        self.history = self.initial_history.copy()
+        self.history.restore(self.initial_history)
 
     def add_tool_result(self, content: BaseIOSchema) -> None:
         """
@@ -230,6 +511,18 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         """
         self.history.add_message(self.tool_result_role, content)
 
+    def _add_message(self, role: str, content: BaseIOSchema) -> None:
+        """
+        Adds a message of the current run to the history, recording it if the agent is a fork.
+
+        Args:
+            role (str): The role of the message sender.
+            content (BaseIOSchema): The content of the message.
+        """
+        message = self.history.add_message(role, content)
+        if self._appended_messages is not None:
+            self._appended_messages.append(message)
+
     @property
     def input_schema(self) -> Type[BaseIOSchema]:
         """
@@ -283,20 +576,57 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         """
         if self.system_role is None:
             return []
+        if self.prompt_cache_layout:
+            content = self.system_prompt_generator.generate_static_prompt()
+        else:
+            content = self.system_prompt_generator.generate_prompt()
         return [
             {
                 "role": self.system_role,
-                "content": self.system_prompt_generator.generate_prompt(),
+                "content": content,
             }
         ]
 
+    def _build_dynamic_context_messages(self) -> List[Dict]:
+        """
+        Builds the message carrying the dynamic part of the system prompt when prompt_cache_layout is enabled.
+
+        With cache markers the message is sent as "user": providers with explicit breakpoints
+        (Anthropic) move system messages into the system prompt, ahead of the cached history,
+        which would invalidate the cache on every request.
+
+        Returns:
+            List[Dict]: A list containing the dynamic context message, or an empty list if there is none.
+        """
+        if self.system_role is None or not self.prompt_cache_layout:
+            return []
+        content = self.system_prompt_generator.generate_dynamic_prompt()
+        if not content:
+            return []
+        role = "user" if self._uses_cache_markers() else self.tool_result_role
+        return [{"role": role, "content": content}]
+
+    def _uses_cache_markers(self) -> bool:
+        """Whether cache-control breakpoints are added to the prepared messages."""
+        if not self.prompt_cache_layout:
+            return False
+        if self.prompt_cache_markers is not None:
+            return self.prompt_cache_markers
+        return supports_cache_control(self.client, self.mode)
+
     def _trim_context(self) -> None:
         """
         Trim oldest conversation turns to stay within max_context_tokens limit.
 
-        Called before building the messages list. Uses the full context token count
-        (system prompt + history + tools) via get_context_token_count().
-        Removes oldest turns one at a time until the context fits within the limit.
+        Called before building the messages list. The context is counted via
+        get_context_token_count() (system prompt + history + tools), whose history part is the
+        sum of the per-message token counts cached by the history. If it exceeds the limit, the
+        oldest turns are selected in a single walk that subtracts the same cached counts, so only
+        messages that were never counted are tokenized.
+
+        Trimming stops once the context fits within trim_target_tokens (the low watermark),
+        which defaults to max_context_tokens. A lower target trims less often and in bigger
+        steps, keeping the message prefix unchanged for the turns in between.
 
         Turn-preserving: always removes complete turns, never individual messages.
 
@@ -306,38 +636,86 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         if self.max_context_tokens is None:
             return
 
-        result = self.get_context_token_count()
-        total_tokens = result.total
+        token_count = self.get_context_token_count()
+        if token_count.total <= self.max_context_tokens:
+            return
+
+        self._remove_trimmed_turns(*self._select_turns_to_trim(token_count))
 
-        if total_tokens <= self.max_context_tokens:
+    async def _trim_context_async(self) -> None:
+        """
+        Async variant of _trim_context() used by run_async and run_async_stream.
+
+        The tokenization runs in token_counter_executor, so it doesn't block the event loop. The
+        walk over the cached per-message counts and the removal of the turns run on the loop.
+
+        Raises:
+            ValueError: If a single turn itself exceeds max_context_tokens.
+        """
+        if self.max_context_tokens is None:
             return
 
-        logger = logging.getLogger(__name__)
+        token_count = await self.get_context_token_count_async()
+        if token_count.total <= self.max_context_tokens:
+            return
+
+        self._remove_trimmed_turns(*self._select_turns_to_trim(token_count))
+
+    def _select_turns_to_trim(self, token_count: TokenCountResult) -> Tuple[List[str], int]:
+        """
+        Select the oldest turns to drop so the context fits within trim_target_tokens (or max_context_tokens if unset).
+
+        The history part of token_count is the sum of the per-message counts cached by the history,
+        so subtracting the cached counts of the removed turns gives the exact count of what remains.
 
-        # Collect unique turn_ids in order (oldest first)
-        turn_ids_ordered = []
-        seen = set()
-        for msg in self.history.history:
-            if msg.turn_id and msg.turn_id not in seen:
-                turn_ids_ordered.append(msg.turn_id)
-                seen.add(msg.turn_id)
+        Args:
+            token_count (TokenCountResult): The current token count of the full context.
 
-        # Remove oldest turns until within limit
-        for turn_id in turn_ids_ordered:
-            if total_tokens <= self.max_context_tokens:
+        Returns:
+            Tuple[List[str], int]: The turn IDs to remove and the token count once they are removed.
+        """
+        counter = get_token_counter(self.token_counter_backend)
+        count_message = self._get_message_token_counter(counter)
+        target_tokens = self.trim_target_tokens if self.trim_target_tokens is not None else self.max_context_tokens
+        total_tokens = token_count.total
+
+        turn_ids = self.history.get_turn_ids()
+        turns_to_remove: List[str] = []
+        for turn_id in turn_ids:
+            if total_tokens <= target_tokens:
                 break
+            total_tokens -= sum(
+                self.history.get_token_counts(self.model, count_message, turn_id=turn_id, tokenizer_key=counter.cache_key)
+            )
+            turns_to_remove.append(turn_id)
+        if not turns_to_remove:
+            return turns_to_remove, total_tokens
+
+        if len(turns_to_remove) == len(turn_ids) and not token_count.system_prompt:
+            # Without a system prompt, the request overhead was counted with the history
+            total_tokens -= counter.get_request_overhead(self.model)
+        logging.getLogger(__name__).warning(
+            "Context exceeded max_context_tokens (%d). Trimmed %d turn(s) (%d tokens). New total: %d.",
+            self.max_context_tokens,
+            len(turns_to_remove),
+            token_count.total - total_tokens,
+            total_tokens,
+        )
+        return turns_to_remove, total_tokens
 
+    def _remove_trimmed_turns(self, turns_to_remove: List[str], total_tokens: int) -> None:
+        """
+        Remove the turns selected by _select_turns_to_trim() from the history.
+
+        Args:
+            turns_to_remove (List[str]): The turn IDs to remove.
+            total_tokens (int): The token count of the context once they are removed.
+
+        Raises:
+            ValueError: If the context still exceeds max_context_tokens.
+        """
+        for turn_id in turns_to_remove:
             self.history.delete_turn_id(turn_id)
-            new_result = self.get_context_token_count()
-            removed = total_tokens - new_result.total
-            total_tokens = new_result.total
-            logger.warning(
-                "Context exceeded max_context_tokens (%d). " "Trimmed turn '%s' (%d tokens). New total: %d.",
-                self.max_context_tokens,
-                turn_id,
-                removed,
-                total_tokens,
-            )
 
         if total_tokens > self.max_context_tokens:
             raise ValueError(
@@ -362,7 +740,192 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
                         self.tool_result_role,
                     )
                     msg["role"] = self.tool_result_role
+        if self._uses_cache_markers():
+            # Breakpoints at the end of the system prompt and of the history cache everything before the dynamic context
+            if self.messages:
+                self.messages[0] = with_cache_control(self.messages[0])
+            if history:
+                history[-1] = with_cache_control(history[-1])
         self.messages += history
+        self.messages += self._build_dynamic_context_messages()
+
+    def _dispatch_prompt_cache_usage(self, response: Any) -> None:
+        """
+        Dispatch the 'prompt_cache:usage' hook if the response reports prompt caching statistics.
+
+        Args:
+            response (Any): The response returned by the client.
+        """
+        if self._hooks_enabled and "prompt_cache:usage" in self._hook_handlers:
+            usage = extract_prompt_cache_usage(response)
+            if usage is not None:
+                self._dispatch_hook("prompt_cache:usage", usage)
+
+    def _get_request_key(self) -> Optional[str]:
+        """
+        Compute the key identifying the prepared request, used by the response cache and single-flight group.
+
+        Returns:
+            Optional[str]: The request key, or None if neither a response cache nor a single-flight group is configured.
+        """
+        if self.response_cache is None and self.single_flight is None:
+            return None
+        return make_cache_key(
+            self.model, self.messages, self.output_schema, self._get_completion_kwargs(), mode=self.mode.value
+        )
+
+    def _load_cached_response(self, cache_key: Optional[str]) -> Optional[OutputSchema]:
+        """
+        Look up a cached response and validate it against the output schema.
+
+        Args:
+            cache_key (Optional[str]): The request key, or None if caching is disabled.
+
+        Returns:
+            Optional[OutputSchema]: The cached response, or None on a miss or if it no longer validates.
+        """
+        if cache_key is None or self.response_cache is None:
+            return None
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            return None
+        try:
+            return self.output_schema.model_validate_json(cached)
+        except ValidationError as e:
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Ignoring cached response that no longer matches the output schema: {e}")
+            return None
+
+    def _store_cached_response(self, cache_key: Optional[str], response: OutputSchema) -> None:
+        """
+        Store a response in the response cache.
+
+        Args:
+            cache_key (Optional[str]): The request key, or None if caching is disabled.
+            response (OutputSchema): The validated response.
+        """
+        if cache_key is not None and self.response_cache is not None:
+            self.response_cache.set(cache_key, response.model_dump_json())
+
+    def _estimate_request_tokens(self) -> int:
+        """
+        Estimate the tokens a model call reserves with the rate limiter: the prompt tokens of the
+        prepared context plus the output reservation (max_completion_tokens or max_tokens from
+        model_api_parameters, otherwise the limiter's output_tokens).
+
+        The count does not dispatch 'token:counted', so hooks only see counts requested by callers
+        and by context trimming.
+
+        Returns:
+            int: The estimated tokens, or 0 if the rate limiter does not limit tokens.
+        """
+        if self.rate_limiter is None or self.rate_limiter.tokens_per_minute is None:
+            return 0
+        output_tokens = (
+            self.model_api_parameters.get("max_completion_tokens")
+            or self.model_api_parameters.get("max_tokens")
+            or self.rate_limiter.output_tokens
+        )
+        return self._count_context_tokens().total + output_tokens
+
+    async def _estimate_request_tokens_async(self) -> int:
+        """
+        Async variant of _estimate_request_tokens() that counts the prompt tokens in token_counter_executor.
+
+        Returns:
+            int: The estimated tokens, or 0 if the rate limiter does not limit tokens.
+        """
+        if self.rate_limiter is None or self.rate_limiter.tokens_per_minute is None:
+            return 0
+        output_tokens = (
+            self.model_api_parameters.get("max_completion_tokens")
+            or self.model_api_parameters.get("max_tokens")
+            or self.rate_limiter.output_tokens
+        )
+        return (await self._count_context_tokens_async()).total + output_tokens
+
+    def _acquire_rate_limit(self) -> None:
+        """Block until the rate limiter admits the next model call."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self._estimate_request_tokens())
+
+    async def _acquire_rate_limit_async(self) -> None:
+        """Wait until the rate limiter admits the next model call."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(await self._estimate_request_tokens_async())
+
+    def _build_partial_stream_factory(self, streams: List[PartialModelStream]) -> Optional[Callable[..., PartialModelStream]]:
+        """
+        Build the factory for the PartialModelStream used while streaming a response.
+
+        Args:
+            streams (List[PartialModelStream]): Receives every stream created by the factory.
+
+        Returns:
+            Optional[Callable[..., PartialModelStream]]: The factory, or None if no streaming option is in use.
+
+        Raises:
+            ValueError: If stream_stop_after_fields names a field that is not part of the output schema.
+        """
+        coalescing = (
+            self.stream_min_interval is not None or self.stream_min_changed_chars is not None or self.stream_skip_unchanged
+        )
+        if not coalescing and not self._field_callbacks and not self.stream_stop_after_fields:
+            return None
+
+        stop_after_fields = None
+        if self.stream_stop_after_fields:
+            unknown_fields = set(self.stream_stop_after_fields) - set(self.output_schema.model_fields)
+            if unknown_fields:
+                raise ValueError(f"stream_stop_after_fields contains unknown output fields: {sorted(unknown_fields)}")
+            # Required fields are always awaited, so the early-stopped response is a valid output
+            stop_after_fields = list(self.stream_stop_after_fields)
+            stop_after_fields += [
+                name
+                for name, field in self.output_schema.model_fields.items()
+                if field.is_required() and name not in stop_after_fields
+            ]
+
+        def create_stream(model: Type[BaseModel], **kwargs) -> PartialModelStream:
+            coalescer = None
+            if coalescing:
+                coalescer = PartialCoalescer(
+                    min_interval=self.stream_min_interval, min_changed_chars=self.stream_min_changed_chars
+                )
+            stream = PartialModelStream(
+                model,
+                coalescer=coalescer,
+                on_field_complete=self._dispatch_field_complete if self._field_callbacks else None,
+                stop_after_fields=stop_after_fields,
+                **kwargs,
+            )
+            streams.append(stream)
+            return stream
+
+        return create_stream
+
+    def _build_stream_response(self, last_response: BaseModel, streams: List[PartialModelStream]) -> OutputSchema:
+        """
+        Build the final response from the last partial response of a stream.
+
+        If the stream was stopped early via stream_stop_after_fields, the response is validated from
+        the completed fields, which include every required field; the other fields keep their defaults.
+
+        Args:
+            last_response (BaseModel): The last partial response.
+            streams (List[PartialModelStream]): The streams created while streaming the response.
+
+        Returns:
+            OutputSchema: The final response.
+
+        Raises:
+            ValidationError: If the response is not a valid output, so it is never added to the history.
+        """
+        if not streams or not streams[-1].stopped:
+            return self.output_schema(**last_response.model_dump())
+
+        data = last_response.model_dump()
+        return self.output_schema.model_validate({field: data[field] for field in streams[-1].completed_fields})
 
     def _get_completion_kwargs(self) -> Dict[str, Any]:
         """
@@ -377,6 +940,17 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         completion_kwargs.setdefault("strict", None)
         return completion_kwargs
 
+    def _get_hook_kwargs(self) -> Dict[str, Any]:
+        """
+        Build the per-request hooks kwargs for Instructor completion calls.
+
+        Kept apart from _get_completion_kwargs() so the hooks don't become part of the request key.
+
+        Returns:
+            Dict[str, Any]: The agent's Instructor hooks, or nothing if no Instructor event has a handler.
+        """
+        return {"hooks": self._instructor_hooks} if self._hook_relays else {}
+
     def _build_tools_definition(self) -> Optional[List[Dict[str, Any]]]:
         """
         Build the tools definition that Instructor sends for TOOLS mode.
@@ -384,92 +958,80 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         This uses Instructor's actual schema generation to create the exact
         tools parameter that would be sent to the LLM for TOOLS mode.
         For JSON modes, returns None as the schema is embedded in messages.
+        The definition is generated once per output schema and shared, so it must not be modified.
 
         Returns:
             Optional[List[Dict[str, Any]]]: Tools definition for TOOLS mode, or None for JSON modes.
         """
-        from instructor.processing.schema import generate_openai_schema
-
-        # Only return tools for TOOLS-based modes
-        tools_modes = {Mode.TOOLS, Mode.TOOLS_STRICT, Mode.PARALLEL_TOOLS}
-        if self.mode in tools_modes:
-            return [
-                {
-                    "type": "function",
-                    "function": generate_openai_schema(self.output_schema),
-                }
-            ]
-        return None
+        return get_schema_artifacts(self.output_schema, self.mode).tools
 
     def _build_schema_for_json_mode(self) -> str:
         """
         Build the schema context for JSON modes (appended to system message).
 
         This matches exactly how Instructor formats the schema for JSON/MD_JSON modes.
+        The text is generated once per output schema.
 
         Returns:
             str: JSON schema string formatted as Instructor does.
         """
-        from textwrap import dedent
+        artifacts = get_schema_artifacts(self.output_schema, self.mode)
+        if artifacts.json_mode_text is None:
+            artifacts = get_schema_artifacts(self.output_schema, Mode.JSON)
+        return artifacts.json_mode_text
 
-        schema = self.output_schema.model_json_schema()
-        return dedent(
-            f"""
-        As a genius expert, your task is to understand the content and provide
-        the parsed objects in json that match the following json_schema:
+    def _get_message_token_counter(self, counter: Any) -> Callable[[Dict[str, Any]], int]:
+        """
+        Get the function ChatHistory.get_token_counts() uses to count a history message.
 
-        {json.dumps(schema, indent=2, ensure_ascii=False)}
+        Args:
+            counter (TokenCounter): The token counter to use.
 
-        Make sure to return an instance of the JSON, not the schema itself
+        Returns:
+            Callable[[Dict[str, Any]], int]: Counts the tokens a message in the format returned by
+            ChatHistory.get_history() adds to the request.
         """
-        ).strip()
+        return lambda message: counter.count_message(self.model, self._serialize_message_for_token_count(message))
 
-    def _serialize_history_for_token_count(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _serialize_message_for_token_count(message: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Serialize conversation history for token counting, handling multimodal content.
+        Serialize a single history message for token counting.
 
-        This method converts instructor multimodal objects (Image, Audio, PDF) to the
-        OpenAI format that LiteLLM's token counter expects. Text content is also
-        converted to the proper multimodal text format when mixed with media.
+        Args:
+            message (Dict[str, Any]): A message as returned by ChatHistory.get_history().
 
         Returns:
-            List[Dict[str, Any]]: History messages in LiteLLM-compatible format.
+            Dict[str, Any]: The message in LiteLLM-compatible format.
         """
-        history = self.history.get_history()
-        serialized = []
-
-        for message in history:
-            content = message.get("content")
-
-            if isinstance(content, list):
-                # Multimodal content - convert to OpenAI format
-                serialized_content = []
-                for item in content:
-                    if isinstance(item, str):
-                        # Text content - wrap in OpenAI text format
-                        serialized_content.append({"type": "text", "text": item})
-                    elif isinstance(item, (Image, Audio, PDF)):
-                        # Multimodal object - use instructor's to_openai method
-                        try:
-                            serialized_content.append(item.to_openai(Mode.JSON))
-                        except Exception as e:
-                            # Log the error and use placeholder for token estimation
-                            logger = logging.getLogger(__name__)
-                            media_type = type(item).__name__
-                            logger.warning(
-                                f"Failed to serialize {media_type} for token counting: {e}. "
-                                f"Using placeholder for estimation."
-                            )
-                            serialized_content.append({"type": "text", "text": f"[{media_type.lower()} content]"})
-                    else:
-                        # Unknown type - convert to string
-                        serialized_content.append({"type": "text", "text": str(item)})
-                serialized.append({"role": message["role"], "content": serialized_content})
+        content = message.get("content")
+
+        if not isinstance(content, list):
+            # Simple text content - keep as is
+            return message
+
+        # Multimodal content - convert to OpenAI format
+        serialized_content = []
+        for item in content:
+            if isinstance(item, str):
+                # Text content - wrap in OpenAI text format
+                serialized_content.append({"type": "text", "text": item})
+            elif isinstance(item, (Image, Audio, PDF)):
+                # Multimodal object - use instructor's to_openai method
+                try:
+                    serialized_content.append(item.to_openai(Mode.JSON))
+                except Exception as e:
+                    # Log the error and use placeholder for token estimation
+                    logger = logging.getLogger(__name__)
+                    media_type = type(item).__name__
+                    logger.warning(
+                        f"Failed to serialize {media_type} for token counting: {e}. " f"Using placeholder for estimation."
+                    )
+                    serialized_content.append({"type": "text", "text": f"[{media_type.lower()} content]"})
             else:
-                # Simple text content - keep as is
-                serialized.append(message)
-
-        return serialized
+                # Unknown type - convert to string
+                serialized_content.append({"type": "text", "text": str(item)})
+        return {"role": message["role"], "content": serialized_content}
 
     def get_context_token_count(self) -> TokenCountResult:
         """
@@ -515,17 +1077,97 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
             The 'token:counted' hook event is dispatched, allowing for
             monitoring and logging of token usage.
         """
-        counter = get_token_counter()
+        result = self._count_context_tokens()
+
+        # Dispatch hook for monitoring
+        self._dispatch_hook("token:counted", result)
+
+        return result
+
+    async def get_context_token_count_async(self) -> OffloadedTokenCountResult:
+        """
+        Async variant of get_context_token_count().
+
+        The context providers are queried concurrently and the system prompt and history are
+        serialized on the event loop, then the tokenization runs in token_counter_executor (the
+        event loop's default executor if unset), so it doesn't block other coroutines. The time
+        the offloaded counting took is reported in the result's duration.
+
+        Returns:
+            OffloadedTokenCountResult: The token count, with duration set to the seconds spent counting.
+
+        Note:
+            The 'token:counted' hook event is dispatched, allowing for
+            monitoring and logging of token usage.
+        """
+        result = await self._count_context_tokens_async()
+
+        # Dispatch hook for monitoring
+        self._dispatch_hook("token:counted", result)
 
+        return result
+
+    def _count_context_tokens(self) -> TokenCountResult:
+        """
+        Count the context tokens like get_context_token_count(), without dispatching 'token:counted'.
+
+        Returns:
+            TokenCountResult: The token count.
+        """
+        counter = get_token_counter(self.token_counter_backend)
+        history_tokens = sum(
+            self.history.get_token_counts(
+                self.model, self._get_message_token_counter(counter), tokenizer_key=counter.cache_key
+            )
+        )
+        return self._count_context(counter, *self._build_token_count_request(), history_tokens)
+
+    async def _count_context_tokens_async(self) -> OffloadedTokenCountResult:
+        """
+        Count the context tokens like get_context_token_count_async(), without dispatching 'token:counted'.
+
+        Returns:
+            OffloadedTokenCountResult: The token count, with duration set to the seconds spent counting.
+        """
+        counter = get_token_counter(self.token_counter_backend)
+        context_snapshot = await fetch_context_snapshot_async(self.system_prompt_generator.context_providers)
+        with use_context_snapshot(context_snapshot):
+            request = self._build_token_count_request()
+        # The history is only read on the event loop: the worker only tokenizes the messages without a cached count
+        counted_tokens, uncounted = self.history.get_token_count_snapshot(self.model, tokenizer_key=counter.cache_key)
+        serialized = [self._serialize_message_for_token_count(message) for _, message in uncounted]
+
+        def count() -> Tuple[List[int], OffloadedTokenCountResult]:
+            start = time.perf_counter()
+            counts = [counter.count_message(self.model, message) for message in serialized]
+            result = self._count_context(counter, *request, counted_tokens + sum(counts))
+            return counts, OffloadedTokenCountResult.from_result(result, time.perf_counter() - start)
+
+        counts, result = await self._run_in_token_counter_executor(count)
+        for (message, _), message_tokens in zip(uncounted, counts):
+            self.history.set_token_count(message, self.model, message_tokens, tokenizer_key=counter.cache_key)
+        return result
+
+    def _build_token_count_request(self) -> Tuple[List[Dict[str, Any]], Any]:
+        """
+        Serialize the system part of the context for token counting, as Instructor would send it.
+
+        The history is counted from the per-message counts cached by ChatHistory.get_token_counts().
+
+        Returns:
+            Tuple: The system messages (with the schema text appended in JSON modes) and the output
+            schema's SchemaArtifacts.
+        """
         # Build system messages
         system_messages = self._build_system_messages()
 
         # Handle schema serialization based on mode
-        tools = self._build_tools_definition()
+        schema_artifacts = get_schema_artifacts(self.output_schema, self.mode)
+        tools = schema_artifacts.tools
 
         if tools is None:
             # JSON mode - append schema to system message like Instructor does
-            schema_context = self._build_schema_for_json_mode()
+            schema_context = schema_artifacts.json_mode_text
             if system_messages:
                 system_messages = [
                     {
@@ -536,17 +1178,97 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
             else:
                 system_messages = [{"role": "system", "content": schema_context}]
 
-        result = counter.count_context(
+        system_messages = system_messages + self._build_dynamic_context_messages()
+        return system_messages, schema_artifacts
+
+    def _count_context(
+        self,
+        counter: Any,
+        system_messages: List[Dict[str, Any]],
+        schema_artifacts: Any,
+        history_tokens: int,
+    ) -> TokenCountResult:
+        """
+        Count the tokens of a context serialized by _build_token_count_request().
+
+        Args:
+            counter (TokenCounter): The token counter to use.
+            system_messages (List[Dict[str, Any]]): The serialized system messages.
+            schema_artifacts (SchemaArtifacts): The output schema's artifacts.
+            history_tokens (int): The sum of the history's per-message token counts.
+
+        Returns:
+            TokenCountResult: The token count.
+        """
+        tools = schema_artifacts.tools
+        return counter.count_context(
             model=self.model,
             system_messages=system_messages,
-            history_messages=self._serialize_history_for_token_count(),
+            history_messages=[],
             tools=tools,
+            tools_tokens=schema_artifacts.token_count(self.model, counter) if tools else None,
+            system_tokens=self._count_system_tokens(counter, system_messages, schema_artifacts),
+            history_tokens=history_tokens,
         )
 
-        # Dispatch hook for monitoring
-        self._dispatch_hook("token:counted", result)
+    def _count_system_tokens(
+        self, counter: Any, system_messages: List[Dict[str, Any]], schema_artifacts: Any
+    ) -> Optional[int]:
+        """
+        Count the system messages from the cached token counts of their parts.
 
-        return result
+        The static part of the system prompt is counted once per model by the system prompt
+        generator, and the JSON-mode schema text once per model by the schema artifacts, so only
+        the dynamic part (context provider output) is tokenized. Each part is counted as the text
+        of a message, so the message framing and the request overhead are subtracted from its count
+        and added once for the whole system message.
+
+        Args:
+            counter (TokenCounter): The token counter to use.
+            system_messages (List[Dict[str, Any]]): The serialized system messages.
+            schema_artifacts (SchemaArtifacts): The output schema's artifacts.
+
+        Returns:
+            Optional[int]: The token count, or None if the system message doesn't start with the
+            static prompt (e.g. with a generator that overrides generate_prompt), so it must be counted whole.
+        """
+        if self.system_role is None or not system_messages:
+            return None
+        static_prompt = self.system_prompt_generator.generate_static_prompt()
+        content = system_messages[0]["content"]
+        if not isinstance(static_prompt, str) or not static_prompt or not content.startswith(static_prompt):
+            return None
+
+        # Framing and request overhead included in each count_text() result
+        text_overhead = counter.count_text(self.model, "")
+        tokens = counter.count_messages(self.model, [{"role": system_messages[0]["role"], "content": ""}])
+        tokens += self.system_prompt_generator.count_static_prompt_tokens(self.model, counter) - text_overhead
+        rest = content[len(static_prompt) :]
+        schema_text = schema_artifacts.json_mode_text
+        if schema_text is not None and rest.endswith(schema_text):
+            tokens += schema_artifacts.token_count(self.model, counter) - text_overhead
+            rest = rest[: -len(schema_text)]
+        if rest.strip():
+            tokens += counter.count_text(self.model, rest.strip()) - text_overhead
+        for message in system_messages[1:]:
+            tokens += counter.count_message(self.model, message)
+        return tokens
+
+    async def _run_in_token_counter_executor(self, func: Callable[[], Any]) -> Any:
+        """
+        Run a token counting function in token_counter_executor without blocking the event loop.
+
+        The function runs in a copy of the caller's context, so context variables such as the
+        context provider snapshot of the current run are visible in the worker thread.
+
+        Args:
+            func (Callable[[], Any]): The function to run.
+
+        Returns:
+            Any: The function's return value.
+        """
+        context = copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.token_counter_executor, context.run, func)
 
     def run(self, user_input: Optional[InputSchema] = None) -> OutputSchema:
         """
@@ -562,25 +1284,35 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
             self.client, instructor.core.client.AsyncInstructor
         ), "The run method is not supported for async clients. Use run_async instead."
 
-        # Trim history BEFORE adding new user message to protect the new input
-        self._trim_context()
+        # Query the context providers once for the whole run, however often the prompt is built
+        context_snapshot = fetch_context_snapshot(self.system_prompt_generator.context_providers)
+        with use_context_snapshot(context_snapshot):
+            # Trim history BEFORE adding new user message to protect the new input
+            self._trim_context()
 
-        if user_input:
-            self.history.initialize_turn()
-            self.current_user_input = user_input
-            self.history.add_message("user", user_input)
+            if user_input:
+                self.history.initialize_turn()
+                self.current_user_input = user_input
+                self._add_message("user", user_input)
 
-        self._prepare_messages()
-        response = self.client.chat.completions.create(
-            messages=self.messages,
-            model=self.model,
-            response_model=self.output_schema,
-            **self._get_completion_kwargs(),
-        )
-        self.history.add_message(self.assistant_role, response)
-        self._prepare_messages()
+            self._prepare_messages()
+            cache_key = self._get_request_key()
+            response = self._load_cached_response(cache_key)
+            if response is None:
+                self._acquire_rate_limit()
+                response = self.client.chat.completions.create(
+                    messages=self.messages,
+                    model=self.model,
+                    response_model=self.output_schema,
+                    **self._get_completion_kwargs(),
+                    **self._get_hook_kwargs(),
+                )
+                self._dispatch_prompt_cache_usage(response)
+                self._store_cached_response(cache_key, response)
+            self._add_message(self.assistant_role, response)
+            self._prepare_messages()
 
-        return response
+            return response
 
     def run_stream(self, user_input: Optional[InputSchema] = None) -> Generator[OutputSchema, None, OutputSchema]:
         """
@@ -599,22 +1331,33 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
             self.client, instructor.core.client.AsyncInstructor
         ), "The run_stream method is not supported for async clients. Use run_async instead."
 
-        self._trim_context()
+        context_snapshot = fetch_context_snapshot(self.system_prompt_generator.context_providers)
+        with use_context_snapshot(context_snapshot):
+            self._trim_context()
 
-        if user_input:
-            self.history.initialize_turn()
-            self.current_user_input = user_input
-            self.history.add_message("user", user_input)
+            if user_input:
+                self.history.initialize_turn()
+                self.current_user_input = user_input
+                self._add_message("user", user_input)
 
-        self._prepare_messages()
+            self._prepare_messages()
 
-        response_stream = self.client.chat.completions.create_partial(
-            model=self.model,
-            messages=self.messages,
-            response_model=self.output_schema,
-            **self._get_completion_kwargs(),
-            stream=True,
-        )
+            self._acquire_rate_limit()
+
+            # The synchronous client consumes the whole stream inside create_partial
+            streams: List[PartialModelStream] = []
+            factory_token = _partial_stream_factory.set(self._build_partial_stream_factory(streams))
+            try:
+                response_stream = self.client.chat.completions.create_partial(
+                    model=self.model,
+                    messages=self.messages,
+                    response_model=self.output_schema,
+                    **self._get_completion_kwargs(),
+                    **self._get_hook_kwargs(),
+                    stream=True,
+                )
+            finally:
+                _partial_stream_factory.reset(factory_token)
 
         last_response = None
         for partial_response in response_stream:
@@ -622,10 +1365,11 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
             yield partial_response
 
         if last_response:
-            full_response_content = self.output_schema(**last_response.model_dump())
-            self.history.add_message(self.assistant_role, full_response_content)
-            self._prepare_messages()
-            return full_response_content
+            with use_context_snapshot(context_snapshot):
+                full_response_content = self._build_stream_response(last_response, streams)
+                self._add_message(self.assistant_role, full_response_content)
+                self._prepare_messages()
+                return full_response_content
 
     async def run_async(self, user_input: Optional[InputSchema] = None) -> OutputSchema:
         """
@@ -643,22 +1387,44 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         """
         assert isinstance(self.client, instructor.core.client.AsyncInstructor), "The run_async method is for async clients."
 
-        self._trim_context()
+        context_snapshot = await fetch_context_snapshot_async(self.system_prompt_generator.context_providers)
+        with use_context_snapshot(context_snapshot):
+            await self._trim_context_async()
 
-        if user_input:
-            self.history.initialize_turn()
-            self.current_user_input = user_input
-            self.history.add_message("user", user_input)
+            if user_input:
+                self.history.initialize_turn()
+                self.current_user_input = user_input
+                self._add_message("user", user_input)
 
-        self._prepare_messages()
+            self._prepare_messages()
 
-        response = await self.client.chat.completions.create(
-            model=self.model, messages=self.messages, response_model=self.output_schema, **self._get_completion_kwargs()
-        )
+            request_key = self._get_request_key()
+            response = self._load_cached_response(request_key)
+            if response is None:
+                messages = self.messages
+
+                async def create() -> OutputSchema:
+                    await self._acquire_rate_limit_async()
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        response_model=self.output_schema,
+                        **self._get_completion_kwargs(),
+                        **self._get_hook_kwargs(),
+                    )
+                    self._dispatch_prompt_cache_usage(response)
+                    self._store_cached_response(request_key, response)
+                    return response
 
-        self.history.add_message(self.assistant_role, response)
-        self._prepare_messages()
-        return response
+                if self.single_flight is not None:
+                    # Callers sharing the call each add the response to their own history, so each gets its own copy
+                    response = (await self.single_flight.do(request_key, create)).model_copy()
+                else:
+                    response = await create()
+
+            self._add_message(self.assistant_role, response)
+            self._prepare_messages()
+            return response
 
     async def run_async_stream(self, user_input: Optional[InputSchema] = None) -> AsyncGenerator[OutputSchema, None]:
         """
@@ -671,31 +1437,207 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
             OutputSchema: Partial responses from the chat agent.
         """
         assert isinstance(self.client, instructor.core.client.AsyncInstructor), "The run_async method is for async clients."
-        self._trim_context()
-        if user_input:
-            self.history.initialize_turn()
-            self.current_user_input = user_input
-            self.history.add_message("user", user_input)
+        context_snapshot = await fetch_context_snapshot_async(self.system_prompt_generator.context_providers)
+        with use_context_snapshot(context_snapshot):
+            await self._trim_context_async()
+            if user_input:
+                self.history.initialize_turn()
+                self.current_user_input = user_input
+                self._add_message("user", user_input)
 
-        self._prepare_messages()
+            self._prepare_messages()
 
-        response_stream = self.client.chat.completions.create_partial(
-            model=self.model,
-            messages=self.messages,
-            response_model=self.output_schema,
-            **self._get_completion_kwargs(),
-            stream=True,
-        )
+            await self._acquire_rate_limit_async()
+
+            # The asynchronous client starts parsing the stream on the first iteration step
+            streams: List[PartialModelStream] = []
+            factory_token = _partial_stream_factory.set(self._build_partial_stream_factory(streams))
+            try:
+                response_stream = self.client.chat.completions.create_partial(
+                    model=self.model,
+                    messages=self.messages,
+                    response_model=self.output_schema,
+                    **self._get_completion_kwargs(),
+                    **self._get_hook_kwargs(),
+                    stream=True,
+                )
+                partial_response = await anext(response_stream, None)
+            finally:
+                _partial_stream_factory.reset(factory_token)
 
         last_response = None
-        async for partial_response in response_stream:
+        while partial_response is not None:
             last_response = partial_response
             yield partial_response
+            partial_response = await anext(response_stream, None)
 
         if last_response:
-            full_response_content = self.output_schema(**last_response.model_dump())
-            self.history.add_message(self.assistant_role, full_response_content)
-            self._prepare_messages()
+            with use_context_snapshot(context_snapshot):
+                full_response_content = self._build_stream_response(last_response, streams)
+                self._add_message(self.assistant_role, full_response_content)
+                self._prepare_messages()
+
+    def _fork(self, history: Optional[ChatHistory] = None) -> "AtomicAgent[InputSchema, OutputSchema]":
+        """
+        Create an agent that shares this agent's configuration but has its own per-call state.
+
+        The fork shares the client, system prompt generator, hooks and other components, so it can
+        run concurrently with other forks without touching this agent's history or messages.
+
+        Args:
+            history (Optional[ChatHistory]): The history the fork works on. Defaults to a copy of the initial history.
+
+        Returns:
+            AtomicAgent: The forked agent.
+        """
+        fork = copy.copy(self)
+        fork.history = history if history is not None else self.initial_history.copy()
+        fork.current_user_input = None
+        fork.messages = []
+        fork._appended_messages = []
+        return fork
+
+    def run_with_history(self, user_input: Optional[InputSchema], history: ChatHistory) -> RunResult:
+        """
+        Runs the agent on the given history instead of the agent's own.
+
+        The run keeps no per-call state on the agent, so a single configured agent can serve many
+        sessions (one history each), including from several threads at once. The passed history is
+        updated in place like the agent's own history would be (trimmed, then extended with the turn).
+
+        Args:
+            user_input (Optional[InputSchema]): The input from the user. If not provided, skips adding to history.
+            history (ChatHistory): The session's history.
+
+        Returns:
+            RunResult: The response and the messages appended to the history.
+        """
+        fork = self._fork(history)
+        output = fork.run(user_input)
+        return RunResult(output, fork._appended_messages)
+
+    async def run_with_history_async(self, user_input: Optional[InputSchema], history: ChatHistory) -> RunResult:
+        """
+        Runs the agent asynchronously on the given history instead of the agent's own.
+
+        The run keeps no per-call state on the agent, so overlapping calls for different sessions
+        (one history each) don't interfere. The passed history is updated in place like the agent's
+        own history would be (trimmed, then extended with the turn).
+
+        Args:
+            user_input (Optional[InputSchema]): The input from the user. If not provided, skips adding to history.
+            history (ChatHistory): The session's history.
+
+        Returns:
+            RunResult: The response and the messages appended to the history.
+        """
+        fork = self._fork(history)
+        output = await fork.run_async(user_input)
+        return RunResult(output, fork._appended_messages)
+
+    def run_batch(self, inputs: Iterable[InputSchema], concurrency: int = 4) -> List[BatchItemResult]:
+        """
+        Runs many independent inputs concurrently in threads, each against its own copy of the initial history.
+
+        The agent's own history is not modified. Failures are collected per item instead of being raised.
+
+        Args:
+            inputs (Iterable[InputSchema]): The inputs to run.
+            concurrency (int): Maximum number of items running at the same time.
+
+        Returns:
+            List[BatchItemResult]: One result per input, in input order.
+        """
+        assert not isinstance(
+            self.client, instructor.core.client.AsyncInstructor
+        ), "The run_batch method is not supported for async clients. Use run_batch_async instead."
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        items = list(inputs)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+            return list(executor.map(self._run_batch_item, range(len(items)), items))
+
+    async def run_batch_async(self, inputs: Iterable[InputSchema], concurrency: int = 8) -> List[BatchItemResult]:
+        """
+        Runs many independent inputs concurrently, each against its own copy of the initial history.
+
+        The agent's own history is not modified. Failures are collected per item instead of being raised.
+
+        Args:
+            inputs (Iterable[InputSchema]): The inputs to run.
+            concurrency (int): Maximum number of items running at the same time.
+
+        Returns:
+            List[BatchItemResult]: One result per input, in input order.
+        """
+        results = [result async for result in self.iter_batch_async(inputs, concurrency=concurrency)]
+        return sorted(results, key=lambda result: result.index)
+
+    async def iter_batch_async(self, inputs: Iterable[InputSchema], concurrency: int = 8) -> AsyncIterator[BatchItemResult]:
+        """
+        Runs many independent inputs concurrently and yields their results as they complete.
+
+        Each item runs against its own copy of the initial history; the agent's own history is not
+        modified. Failures are collected per item instead of being raised. If the iteration is
+        stopped early, items still running are cancelled.
+
+        Args:
+            inputs (Iterable[InputSchema]): The inputs to run.
+            concurrency (int): Maximum number of items running at the same time.
+
+        Yields:
+            BatchItemResult: The result of each item, in completion order.
+
+        Raises:
+            BaseException: A BaseException that is not an Exception (e.g. asyncio.CancelledError or
+                KeyboardInterrupt) raised while running an item. The other items are cancelled.
+        """
+        assert isinstance(
+            self.client, instructor.core.client.AsyncInstructor
+        ), "The run_batch_async method is for async clients."
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        items = list(enumerate(inputs))
+        pending = iter(items)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            try:
+                for index, user_input in pending:
+                    results.put_nowait(await self._run_batch_item_async(index, user_input))
+            except BaseException as e:
+                # Not collected per item: hand it to the consumer, which would otherwise wait for the item forever
+                results.put_nowait(e)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+        try:
+            for _ in items:
+                result = await results.get()
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _run_batch_item(self, index: int, user_input: InputSchema) -> BatchItemResult:
+        agent = self._fork()
+        try:
+            return BatchItemResult(index, user_input, agent.run(user_input), None, agent.history)
+        except Exception as e:
+            return BatchItemResult(index, user_input, None, e, agent.history)
+
+    async def _run_batch_item_async(self, index: int, user_input: InputSchema) -> BatchItemResult:
+        agent = self._fork()
+        try:
+            return BatchItemResult(index, user_input, await agent.run_async(user_input), None, agent.history)
+        except Exception as e:
+            return BatchItemResult(index, user_input, None, e, agent.history)
 
     def get_context_provider(self, provider_name: str) -> Type[BaseDynamicContextProvider]:
         """
@@ -736,22 +1678,71 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         else:
             raise KeyError(f"Context provider '{provider_name}' not found.")
 
+    def register_field_callback(self, field_name: str, callback: Callable[[Any], None]) -> None:
+        """
+        Registers a callback that fires as soon as a top-level output field is complete while streaming.
+
+        The callback receives the validated (partial model) value of the field. It fires during
+        run_stream/run_async_stream, before the partial response containing the completed field is yielded.
+
+        Args:
+            field_name (str): The name of the top-level output field.
+            callback (Callable[[Any], None]): The function to call with the field value.
+        """
+        self._field_callbacks.setdefault(field_name, []).append(callback)
+
+    def unregister_field_callback(self, field_name: str, callback: Callable[[Any], None]) -> None:
+        """
+        Unregisters a field completion callback.
+
+        Args:
+            field_name (str): The name of the top-level output field.
+            callback (Callable[[Any], None]): The callback to remove.
+        """
+        if field_name in self._field_callbacks and callback in self._field_callbacks[field_name]:
+            self._field_callbacks[field_name].remove(callback)
+            if not self._field_callbacks[field_name]:
+                del self._field_callbacks[field_name]
+
+    def _dispatch_field_complete(self, field_name: str, value: Any) -> None:
+        """
+        Internal method to call the field completion callbacks with error isolation.
+
+        Args:
+            field_name (str): The name of the completed field.
+            value (Any): The validated value of the field.
+        """
+        for callback in self._field_callbacks.get(field_name, []):
+            try:
+                callback(value)
+            except Exception as e:
+                logger = logging.getLogger(__name__)
+                logger.warning(f"Field callback for '{field_name}' raised exception: {e}")
+
     # Hook Management Methods
-    def register_hook(self, event: str, handler: Callable) -> None:
+    def register_hook(self, event: str, handler: Callable, background: bool = False) -> None:
         """
         Registers a hook handler for a specific event.
 
+        Handlers of Instructor events are not registered on the client: the agent passes its own
+        hooks with each request, so agents sharing a client only receive events of their own requests.
+
         Args:
             event (str): The event name (e.g., 'parse:error', 'completion:kwargs', etc.)
             handler (Callable): The callback function to handle the event
+            background (bool): Run the handler in hook_executor instead of inline. Coroutine functions always
+                run in the background, as a task on the running event loop if there is one.
         """
         if event not in self._hook_handlers:
             self._hook_handlers[event] = []
         self._hook_handlers[event].append(handler)
+        if background or inspect.iscoroutinefunction(handler):
+            self._background_hooks.add((event, handler))
 
-        # Register with instructor client if it supports hooks
-        if hasattr(self.client, "on"):
-            self.client.on(event, handler)
+        if event in _INSTRUCTOR_HOOK_EVENTS and event not in self._hook_relays:
+            relay = self._make_hook_relay(event)
+            self._hook_relays[event] = relay
+            self._instructor_hooks.on(event, relay)
 
     def unregister_hook(self, event: str, handler: Callable) -> None:
         """
@@ -763,34 +1754,66 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         """
         if event in self._hook_handlers and handler in self._hook_handlers[event]:
             self._hook_handlers[event].remove(handler)
-
-            # Remove from instructor client if it supports hooks
-            if hasattr(self.client, "off"):
-                self.client.off(event, handler)
+            if handler not in self._hook_handlers[event]:
+                self._background_hooks.discard((event, handler))
+            if not self._hook_handlers[event]:
+                self._remove_hook_relay(event)
 
     def clear_hooks(self, event: Optional[str] = None) -> None:
         """
         Clears hook handlers for a specific event or all events.
 
+        Only this agent's handlers are removed; other agents sharing the client keep theirs.
+
         Args:
             event (Optional[str]): The event name to clear, or None to clear all
         """
         if event:
             if event in self._hook_handlers:
-                # Clear from instructor client first
-                if hasattr(self.client, "clear"):
-                    self.client.clear(event)
                 self._hook_handlers[event].clear()
+                self._background_hooks.difference_update([key for key in self._background_hooks if key[0] == event])
+                self._remove_hook_relay(event)
         else:
             # Clear all hooks
-            if hasattr(self.client, "clear"):
-                self.client.clear()
             self._hook_handlers.clear()
+            self._background_hooks.clear()
+            for relay_event in list(self._hook_relays):
+                self._remove_hook_relay(relay_event)
+
+    def _make_hook_relay(self, event: str) -> Callable:
+        """
+        Create the handler registered on the agent's Instructor hooks for an event.
+
+        Args:
+            event (str): The Instructor event name
+
+        Returns:
+            Callable: A handler dispatching the event to this agent's handlers.
+        """
+
+        def relay(*args, **kwargs) -> None:
+            self._dispatch_hook(event, *args, **kwargs)
+
+        return relay
+
+    def _remove_hook_relay(self, event: str) -> None:
+        """
+        Stop passing an event's relay with requests once the event has no handlers left.
+
+        Args:
+            event (str): The event name
+        """
+        relay = self._hook_relays.pop(event, None)
+        if relay is not None:
+            self._instructor_hooks.off(event, relay)
 
     def _dispatch_hook(self, event: str, *args, **kwargs) -> None:
         """
         Internal method to dispatch hook events with error isolation.
 
+        Only this agent's handlers for the event are visited. Background handlers are submitted
+        without waiting for them.
+
         Args:
             event (str): The event name
             *args: Arguments to pass to handlers
@@ -799,7 +1822,10 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
         if not self._hooks_enabled or event not in self._hook_handlers:
             return
 
-        for handler in self._hook_handlers[event]:
+        for handler in list(self._hook_handlers[event]):
+            if self._background_hooks and (event, handler) in self._background_hooks:
+                self._submit_background_hook(event, handler, args, kwargs)
+                continue
             try:
                 handler(*args, **kwargs)
             except Exception as e:
@@ -807,6 +1833,63 @@ class AtomicAgent[InputSchema: BaseIOSchema, OutputSchema: BaseIOSchema]:
                 logger = logging.getLogger(__name__)
                 logger.warning(f"Hook handler for '{event}' raised exception: {e}")
 
+    def _submit_background_hook(self, event: str, handler: Callable, args: tuple, kwargs: Dict[str, Any]) -> None:
+        """
+        Run a hook handler off the calling thread and track it until it finishes.
+
+        Coroutine functions are scheduled on the running event loop, or run to completion in
+        hook_executor if there is none. Other handlers run in hook_executor.
+
+        Args:
+            event (str): The event name
+            handler (Callable): The handler to run
+            args (tuple): Arguments to pass to the handler
+            kwargs (Dict[str, Any]): Keyword arguments to pass to the handler
+        """
+        try:
+            if inspect.iscoroutinefunction(handler):
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    future = self._get_hook_executor().submit(asyncio.run, handler(*args, **kwargs))
+                else:
+                    future = asyncio.run_coroutine_threadsafe(handler(*args, **kwargs), loop)
+            else:
+                future = self._get_hook_executor().submit(handler, *args, **kwargs)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Hook handler for '{event}' could not be scheduled: {e}")
+            return
+
+        self._pending_hooks.add(future)
+
+        def done(future: Future) -> None:
+            self._pending_hooks.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                logger = logging.getLogger(__name__)
+                logger.warning(f"Hook handler for '{event}' raised exception: {future.exception()}")
+
+        future.add_done_callback(done)
+
+    def _get_hook_executor(self) -> Executor:
+        """Returns the executor for background hook handlers."""
+        return self.hook_executor if self.hook_executor is not None else _get_default_hook_executor()
+
+    def wait_for_hooks(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the background hook handlers dispatched so far to finish.
+
+        Must not be called from the event loop thread while handlers scheduled on that loop are
+        pending; use ``await asyncio.to_thread(agent.wait_for_hooks)`` there instead.
+
+        Args:
+            timeout (Optional[float]): Maximum number of seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            bool: True if all handlers finished, False if the timeout expired first.
+        """
+        _, not_done = wait(list(self._pending_hooks), timeout=timeout)
+        return not not_done
+
     def enable_hooks(self) -> None:
         """Enable hook processing."""
         self._hooks_enabled = True
@@ -829,7 +1912,6 @@ if __name__ == "__main__":
     from rich import box
     from openai import OpenAI, AsyncOpenAI
     import instructor
-    import asyncio
     from rich.live import Live
 
     def _create_schema_table(title: str, schema: Type[BaseModel]) -> Table:
@@ -1,7 +1,98 @@
+import datetime
 import inspect
+import uuid
+import weakref
+from decimal import Decimal
+from enum import Enum
+from pathlib import PurePath
+from typing import Annotated, Any, Literal, Tuple, Type, get_args, get_origin
+
+from instructor.processing.multimodal import PDF, Audio, Image
 from pydantic import BaseModel
 from rich.json import JSON
 
+MULTIMODAL_TYPES = (Image, Audio, PDF)
+
+# Field types that never hold multimodal objects
+_PLAIN_TYPES = (
+    str,
+    bytes,
+    bool,
+    int,
+    float,
+    complex,
+    Decimal,
+    Enum,
+    uuid.UUID,
+    PurePath,
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+)
+
+# Names of the fields that can hold multimodal objects, per model class
+_multimodal_fields: "weakref.WeakKeyDictionary[Type[BaseModel], Tuple[str, ...]]" = weakref.WeakKeyDictionary()
+
+
+def get_multimodal_fields(model_class: Type[BaseModel]) -> Tuple[str, ...]:
+    """
+    Get the fields of a model whose values can hold Image, Audio or PDF objects, at any depth.
+
+    Based on the field types, so walks for multimodal content only have to visit these fields, and
+    none for text-only models. Computed when a BaseIOSchema subclass is created, or on first use for
+    other models and for models with unresolved forward references.
+
+    Fields typed with a model class are always included: pydantic keeps instances of its subclasses
+    as they are, and a subclass can add multimodal fields. Walks check such values at runtime by
+    looking up the fields of the value's own class.
+
+    Args:
+        model_class (Type[BaseModel]): The model class.
+
+    Returns:
+        Tuple[str, ...]: The field names, in definition order. Fields typed Any, object, a model class
+            or an arbitrary class are included, as they may hold anything.
+    """
+    try:
+        return _multimodal_fields[model_class]
+    except KeyError:
+        pass
+    fields = tuple(name for name, field in model_class.model_fields.items() if _may_hold_multimodal(field.annotation))
+    if model_class.__pydantic_complete__:
+        _multimodal_fields[model_class] = fields
+    return fields
+
+
+def _may_hold_multimodal(annotation: Any) -> bool:
+    """
+    Whether values of a type annotation can hold multimodal objects.
+
+    Args:
+        annotation (Any): The type annotation.
+
+    Returns:
+        bool: False if the values can't hold multimodal objects, True otherwise (also when unsure).
+    """
+    if annotation is None or annotation is type(None):
+        return False
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return False
+    if origin is Annotated:
+        return _may_hold_multimodal(get_args(annotation)[0])
+    if origin is not None:
+        args = [arg for arg in get_args(annotation) if arg is not Ellipsis]
+        # A bare container (e.g. List) can hold anything
+        return not args or any(_may_hold_multimodal(arg) for arg in args)
+    if not isinstance(annotation, type):
+        # Any, type variables, forward references
+        return True
+    if issubclass(annotation, (*MULTIMODAL_TYPES, BaseModel)):
+        # The value of a model field can be an instance of a subclass with more fields
+        return True
+    # Other types, including bare containers and arbitrary classes, are walked
+    return not issubclass(annotation, _PLAIN_TYPES)
+
 
 class BaseIOSchema(BaseModel):
     """Base schema for input/output in the Atomic Agents framework."""
@@ -17,6 +108,7 @@ class BaseIOSchema(BaseModel):
     def __pydantic_init_subclass__(cls, **kwargs):
         super().__pydantic_init_subclass__(**kwargs)
         cls._validate_description()
+        get_multimodal_fields(cls)
 
     @classmethod
     def _validate_description(cls):
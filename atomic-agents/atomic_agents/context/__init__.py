@@ -3,7 +3,10 @@ from .system_prompt_generator import (
     BaseDynamicContextProvider,
     SystemPromptGenerator,
     BaseSystemPromptGenerator,
+    ContextProviderStats,
 )
+from .history_store import BaseHistoryStore, JSONLHistoryStore
+from .sqlite_chat_history import SQLiteChatHistory
 
 __all__ = [
     "Message",
@@ -11,4 +14,8 @@ __all__ = [
     "SystemPromptGenerator",
     "BaseDynamicContextProvider",
     "BaseSystemPromptGenerator",
+    "ContextProviderStats",
+    "BaseHistoryStore",
+    "JSONLHistoryStore",
+    "SQLiteChatHistory",
 ]
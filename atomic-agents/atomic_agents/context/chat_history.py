@@ -1,17 +1,33 @@
+import base64
+import binascii
 import json
+import sys
 import uuid
+import weakref
+import zlib
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Type
+from typing import Any, Callable, ClassVar, Dict, Hashable, List, Optional, Tuple, Type, Union
 
 from instructor.processing.multimodal import PDF, Image, Audio
-from pydantic import BaseModel, Field
-
-from atomic_agents.base.base_io_schema import BaseIOSchema
+from pydantic import BaseModel, Field, PrivateAttr
 
+from atomic_agents.base.base_io_schema import BaseIOSchema, get_multimodal_fields
+from atomic_agents.utils.msgpack_codec import compress, decompress, packb, unpackb
 
 INSTRUCTOR_MULTIMODAL_TYPES = (Image, Audio, PDF)
 
+# Binary dumps start with this magic, followed by the format version and the compression code
+BINARY_DUMP_MAGIC = b"AAHB"
+BINARY_DUMP_VERSION = 1
+_BINARY_COMPRESSIONS = {None: 0, "zlib": 1, "zstd": 2}
+
+# Fields of a dumped Image, Audio or PDF, whose base64 'data' is stored as raw bytes in binary dumps
+_MULTIMODAL_DUMP_KEYS = frozenset({"source", "media_type", "data"})
+
+# Process-wide cache of the content classes loaded from dumps, dropped with the classes
+_classes_by_name: "weakref.WeakValueDictionary[str, Type[BaseIOSchema]]" = weakref.WeakValueDictionary()
+
 
 class Message(BaseModel):
     """
@@ -27,6 +43,19 @@ class Message(BaseModel):
     content: BaseIOSchema
     turn_id: Optional[str] = None
 
+    # Caches filled lazily by ChatHistory. The content of a message is not modified after it is
+    # added, so cached values stay valid for the message's lifetime and are dropped with it.
+    _serialized: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+    _token_counts: Dict[Hashable, int] = PrivateAttr(default_factory=dict)
+
+    # Bumped whenever the turn_id of any message is reassigned, so ChatHistory rebuilds its turn index
+    _turn_id_writes: ClassVar[int] = 0
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "turn_id":
+            Message._turn_id_writes += 1
+
 
 class ChatHistory:
     """
@@ -50,6 +79,16 @@ class ChatHistory:
         self.max_messages = max_messages
         self.current_turn_id: Optional[str] = None
 
+        # Positions of each turn's messages, in turn order. Positions are absolute sequence
+        # numbers so dropping messages from the front only advances the offset instead of
+        # renumbering every turn's index entries. The index is rebuilt if `history` is replaced,
+        # changes length outside of this class, or a message's turn_id is reassigned.
+        self._turn_index: Dict[Optional[str], List[int]] = {}
+        self._index_offset = 0
+        self._indexed_history: Optional[List[Message]] = None
+        self._indexed_length = 0
+        self._indexed_turn_id_writes = -1
+
     def initialize_turn(self) -> None:
         """
         Initializes a new turn by generating a random turn ID.
@@ -60,13 +99,16 @@ class ChatHistory:
         self,
         role: str,
         content: BaseIOSchema,
-    ) -> None:
+    ) -> Message:
         """
         Adds a message to the chat history and manages overflow.
 
         Args:
             role (str): The role of the message sender.
             content (BaseIOSchema): The content of the message.
+
+        Returns:
+            Message: The added message.
         """
         if self.current_turn_id is None:
             self.initialize_turn()
@@ -76,16 +118,113 @@ class ChatHistory:
             content=content,
             turn_id=self.current_turn_id,
         )
+        self._append_message(message)
+        return message
+
+    def _append_message(self, message: Message) -> None:
+        """
+        Appends a message to the history, keeping the turn index in sync, and manages overflow.
+
+        Args:
+            message (Message): The message to append.
+        """
+        self._ensure_turn_index()
         self.history.append(message)
+        self._turn_index.setdefault(message.turn_id, []).append(self._index_offset + len(self.history) - 1)
+        self._indexed_length += 1
         self._manage_overflow()
 
     def _manage_overflow(self) -> None:
         """
         Manages the chat history overflow based on max_messages constraint.
         """
-        if self.max_messages is not None:
-            while len(self.history) > self.max_messages:
-                self.history.pop(0)
+        if self.max_messages is not None and len(self.history) > self.max_messages:
+            self._remove_oldest(len(self.history) - self.max_messages)
+
+    def _ensure_turn_index(self) -> None:
+        """
+        Rebuilds the turn index if the history list was replaced or modified outside of this class.
+
+        Messages added or removed directly, replaced lists and reassigned turn IDs are detected.
+        Reordering the messages of `history` in place is not: assign the reordered list to `history` instead.
+        """
+        if (
+            self._indexed_history is not self.history
+            or self._indexed_length != len(self.history)
+            or self._indexed_turn_id_writes != Message._turn_id_writes
+        ):
+            self._rebuild_turn_index()
+
+    def _rebuild_turn_index(self) -> None:
+        """
+        Rebuilds the turn index from the current history.
+        """
+        self._turn_index = {}
+        for position, message in enumerate(self.history):
+            self._turn_index.setdefault(message.turn_id, []).append(position)
+        self._index_offset = 0
+        self._indexed_history = self.history
+        self._indexed_length = len(self.history)
+        self._indexed_turn_id_writes = Message._turn_id_writes
+
+    def _remove_oldest(self, count: int) -> None:
+        """
+        Removes the oldest messages from the history, keeping the turn index in sync.
+
+        Only the index entries of the removed messages are updated. The history itself stays a
+        plain list, so the slice deletion still shifts the remaining messages: it is linear in the
+        history length, though a single pointer move rather than one pop per message.
+
+        Args:
+            count (int): The number of messages to remove from the front of the history.
+        """
+        self._ensure_turn_index()
+        consistent = True
+        for sequence, message in enumerate(self.history[:count], start=self._index_offset):
+            positions = self._turn_index.get(message.turn_id)
+            if not positions or positions[0] != sequence:
+                consistent = False
+                break
+            positions.pop(0)
+            if not positions:
+                del self._turn_index[message.turn_id]
+
+        del self.history[:count]
+        self._index_offset += count
+        self._indexed_length = len(self.history)
+        if not consistent:
+            # A message's turn_id was changed after it was added
+            self._rebuild_turn_index()
+
+    def _get_turn_positions(self, turn_id: Optional[str]) -> List[int]:
+        """
+        Returns the list positions of the messages belonging to a turn.
+
+        Args:
+            turn_id (Optional[str]): The turn ID to look up.
+
+        Returns:
+            List[int]: The positions of the turn's messages in `history`, in order. Empty if not found.
+        """
+        self._ensure_turn_index()
+        positions = self._turn_index.get(turn_id)
+        offset = self._index_offset
+        if not positions or any(self.history[p - offset].turn_id != turn_id for p in positions):
+            # Unknown turn or stale index (a message's turn_id was changed after it was added)
+            self._rebuild_turn_index()
+            positions = self._turn_index.get(turn_id, [])
+            offset = 0
+        return [p - offset for p in positions]
+
+    def get_turn_ids(self) -> List[str]:
+        """
+        Returns the IDs of the turns in the history, oldest first.
+
+        Returns:
+            List[str]: The ordered list of turn IDs.
+        """
+        self._ensure_turn_index()
+        return [turn_id for turn_id in self._turn_index if turn_id is not None]
 
     def get_history(self) -> List[Dict]:
         """
@@ -100,9 +239,26 @@ class ChatHistory:
             This method supports multimodal content at any nesting depth by
             recursively extracting multimodal objects and using Pydantic's
             model_dump_json(exclude=...) for proper serialization of remaining fields.
+            Each message is serialized once and cached, so repeated calls only
+            serialize messages added since the previous call.
         """
-        history = []
-        for message in self.history:
+        return [self._serialize_message(message) for message in self.history]
+
+    def _serialize_message(self, message: Message) -> Dict:
+        """
+        Serializes a single message into the format returned by get_history().
+
+        The serialized form is computed once and cached on the message. A shallow copy
+        is returned so callers can modify the dictionary (e.g. remap the role) without
+        affecting the cache.
+
+        Args:
+            message (Message): The message to serialize.
+
+        Returns:
+            Dict: A dictionary with 'role' and 'content' keys.
+        """
+        if message._serialized is None:
             input_content = message.content
             multimodal_objects, exclude_spec = self._extract_multimodal_info(input_content)
 
@@ -112,12 +268,94 @@ class ChatHistory:
                 if content_json and content_json != "{}":
                     processed_content.append(content_json)
                 processed_content.extend(multimodal_objects)
-                history.append({"role": message.role, "content": processed_content})
+                message._serialized = {"role": message.role, "content": processed_content}
             else:
-                content_json = input_content.model_dump_json()
-                history.append({"role": message.role, "content": content_json})
+                message._serialized = {"role": message.role, "content": input_content.model_dump_json()}
+
+        content = message._serialized["content"]
+        return {"role": message.role, "content": list(content) if isinstance(content, list) else content}
+
+    def get_token_counts(
+        self,
+        model: str,
+        count_message: Callable[[Dict[str, Any]], int],
+        turn_id: Optional[str] = None,
+        tokenizer_key: Optional[Hashable] = None,
+    ) -> List[int]:
+        """
+        Returns the token count of every message in the history (or in a single turn), oldest first.
+
+        Counts are cached on each message per model and tokenizer, so a message is only
+        tokenized the first time it is counted for a given model and tokenizer. Subsequent
+        calls only count messages that were added since.
+
+        Args:
+            model (str): The model the counts are computed for, part of the cache key.
+            count_message (Callable[[Dict[str, Any]], int]): Function that counts the tokens of a
+                single message in the format returned by get_history().
+            turn_id (Optional[str]): If given, only the messages of this turn are counted.
+            tokenizer_key (Optional[Hashable]): Identifies the tokenizer behind count_message (e.g.
+                TokenCounter.cache_key), so counts of different backends are cached separately.
+
+        Returns:
+            List[int]: The token count of each message, in history order.
+        """
+        if turn_id is None:
+            messages = self.history
+        else:
+            messages = [self.history[position] for position in self._get_turn_positions(turn_id)]
+
+        key = model if tokenizer_key is None else (model, tokenizer_key)
+        counts = []
+        for message in messages:
+            count = message._token_counts.get(key)
+            if count is None:
+                count = count_message(self._serialize_message(message))
+                message._token_counts[key] = count
+            counts.append(count)
+        return counts
+
+    def get_token_count_snapshot(
+        self, model: str, tokenizer_key: Optional[Hashable] = None
+    ) -> Tuple[int, List[Tuple[Message, Dict[str, Any]]]]:
+        """
+        Returns the cached token counts of the history and the messages that have none yet, without tokenizing.
 
-        return history
+        Lets the tokenization happen elsewhere (e.g. in a worker thread) while the history is only
+        read here; the counts of the uncounted messages are then stored with set_token_count().
+
+        Args:
+            model (str): The model the counts are computed for, part of the cache key.
+            tokenizer_key (Optional[Hashable]): Identifies the tokenizer, as in get_token_counts().
+
+        Returns:
+            Tuple[int, List[Tuple[Message, Dict[str, Any]]]]: The sum of the cached counts, and each
+            uncounted message with its serialization in the format returned by get_history(), in history order.
+        """
+        key = model if tokenizer_key is None else (model, tokenizer_key)
+        counted_tokens = 0
+        uncounted = []
+        for message in self.history:
+            count = message._token_counts.get(key)
+            if count is None:
+                uncounted.append((message, self._serialize_message(message)))
+            else:
+                counted_tokens += count
+        return counted_tokens, uncounted
+
+    @staticmethod
+    def set_token_count(message: Message, model: str, count: int, tokenizer_key: Optional[Hashable] = None) -> None:
+        """
+        Caches the token count of a message returned by get_token_count_snapshot().
+
+        Args:
+            message (Message): The message the count belongs to.
+            model (str): The model the count was computed for.
+            count (int): The token count of the message.
+            tokenizer_key (Optional[Hashable]): Identifies the tokenizer, as in get_token_counts().
+        """
+        key = model if tokenizer_key is None else (model, tokenizer_key)
+        message._token_counts[key] = count
 
     @staticmethod
     def _extract_multimodal_info(obj):
@@ -126,7 +364,8 @@ class ChatHistory:
 
         Walks the object tree to find all Instructor multimodal types (Image, Audio, PDF)
         at any nesting depth, collecting them into a flat list and building an exclude
-        specification that can be passed to model_dump_json(exclude=...).
+        specification that can be passed to model_dump_json(exclude=...). Only the fields
+        of Pydantic models that can hold multimodal objects are visited.
 
         Args:
             obj: The object to inspect (BaseIOSchema, list, dict, or primitive).
@@ -139,10 +378,10 @@ class ChatHistory:
         if isinstance(obj, INSTRUCTOR_MULTIMODAL_TYPES):
             return [obj], True
 
-        if hasattr(obj, "__class__") and hasattr(obj.__class__, "model_fields"):
+        if isinstance(obj, BaseModel):
             all_objects = []
             exclude = {}
-            for field_name in obj.__class__.model_fields:
+            for field_name in get_multimodal_fields(obj.__class__):
                 if hasattr(obj, field_name):
                     field_value = getattr(obj, field_name)
                     objects, sub_exclude = ChatHistory._extract_multimodal_info(field_value)
@@ -195,6 +434,16 @@ class ChatHistory:
         new_history.current_turn_id = self.current_turn_id
         return new_history
 
+    def restore(self, snapshot: "ChatHistory") -> None:
+        """
+        Replaces the messages of this history with the ones of a snapshot, e.g. a copy() taken earlier.
+
+        Args:
+            snapshot (ChatHistory): The history to restore.
+        """
+        self.load(snapshot.dump())
+        self.current_turn_id = snapshot.current_turn_id
+
     def get_current_turn_id(self) -> Optional[str]:
         """
         Returns the current turn ID.
@@ -217,12 +466,19 @@ class ChatHistory:
         Raises:
             ValueError: If the specified turn ID is not found in the history.
         """
-        initial_length = len(self.history)
-        self.history = [msg for msg in self.history if msg.turn_id != turn_id]
+        positions = self._get_turn_positions(turn_id)
 
-        if len(self.history) == initial_length:
+        if not positions:
             raise ValueError(f"Turn ID {turn_id} not found in history.")
 
+        if positions[-1] == len(positions) - 1:
+            # Oldest turn: drop it from the front without rebuilding the rest of the index
+            self._remove_oldest(len(positions))
+        else:
+            for position in reversed(positions):
+                del self.history[position]
+            self._rebuild_turn_index()
+
         # Update current_turn_id if necessary
         if not len(self.history):
             self.current_turn_id = None
@@ -246,60 +502,234 @@ class ChatHistory:
         Returns:
             str: A JSON string representation of the ChatHistory.
         """
-        serialized_history = []
-        for message in self.history:
-            content_class = message.content.__class__
-            serialized_message = {
-                "role": message.role,
-                "content": {
-                    "class_name": f"{content_class.__module__}.{content_class.__name__}",
-                    "data": message.content.model_dump_json(),
-                },
-                "turn_id": message.turn_id,
-            }
-            serialized_history.append(serialized_message)
-
         history_data = {
-            "history": serialized_history,
+            "history": [self._dump_message(message) for message in self.history],
             "max_messages": self.max_messages,
             "current_turn_id": self.current_turn_id,
         }
         return json.dumps(history_data)
 
-    def load(self, serialized_data: str) -> None:
+    def dump_binary(self, compression: Optional[str] = None) -> bytes:
         """
-        Deserializes a JSON string and loads it into the ChatHistory instance.
+        Serializes the entire ChatHistory instance to a compact, versioned binary format.
+
+        The dump is a MessagePack document (requires the msgpack package) holding each message's
+        content as JSON bytes, so it isn't encoded twice like in dump(). The base64 data of images,
+        audio and PDFs is stored as raw bytes, and each content class name is stored once. load()
+        reads both formats.
 
         Args:
-            serialized_data (str): A JSON string representation of the ChatHistory.
+            compression (Optional[str]): 'zlib', 'zstd' (requires the zstandard package) or None.
+
+        Returns:
+            bytes: The binary representation of the ChatHistory.
 
         Raises:
-            ValueError: If the serialized data is invalid or cannot be deserialized.
+            ValueError: If the compression is unknown.
+            ImportError: If msgpack, or zstandard for zstd, is not installed.
         """
+        if compression not in _BINARY_COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}")
+        class_indexes: Dict[str, int] = {}
+        messages = []
+        for message in self.history:
+            content_class = message.content.__class__
+            class_name = f"{content_class.__module__}.{content_class.__name__}"
+            class_index = class_indexes.setdefault(class_name, len(class_indexes))
+            content_json, media = self._dump_content_binary(message.content)
+            messages.append([message.role, message.turn_id, class_index, content_json, media])
+
+        payload = packb(
+            {
+                "max_messages": self.max_messages,
+                "current_turn_id": self.current_turn_id,
+                "classes": list(class_indexes),
+                "messages": messages,
+            }
+        )
+        header = BINARY_DUMP_MAGIC + bytes((BINARY_DUMP_VERSION, _BINARY_COMPRESSIONS[compression]))
+        return header + compress(payload, compression)
+
+    @classmethod
+    def _dump_content_binary(cls, content: BaseIOSchema) -> tuple:
+        """
+        Serializes a message's content for dump_binary().
+
+        Args:
+            content (BaseIOSchema): The content to serialize.
+
+        Returns:
+            tuple: The content as JSON bytes, and a list of [path, raw bytes] pairs for the multimodal
+                data moved out of the JSON (None if there is none).
+        """
+        content_json = content.model_dump_json().encode("utf-8")
+        # Every dumped multimodal object has a media_type key, so most messages skip the walk below
+        if b'"media_type"' not in content_json:
+            return content_json, None
+
+        data = json.loads(content_json)
+        media: List[list] = []
+        cls._extract_media_bytes(data, [], media)
+        if not media:
+            return content_json, None
+        return json.dumps(data, separators=(",", ":")).encode("utf-8"), media
+
+    @classmethod
+    def _extract_media_bytes(cls, obj: Any, path: List[Union[str, int]], media: List[list]) -> None:
+        """
+        Moves the base64 data of dumped multimodal objects out of a JSON-compatible tree as raw bytes.
+
+        Args:
+            obj (Any): The dumped content, modified in place.
+            path (List[Union[str, int]]): The keys leading to obj.
+            media (List[list]): Collects [path, raw bytes] pairs.
+        """
+        if isinstance(obj, dict):
+            encoded = obj.get("data")
+            if obj.keys() == _MULTIMODAL_DUMP_KEYS and isinstance(encoded, str):
+                try:
+                    raw = base64.b64decode(encoded, validate=True)
+                except (binascii.Error, ValueError):
+                    return
+                # Only move data that re-encodes to exactly the same string
+                if base64.b64encode(raw).decode("ascii") == encoded:
+                    obj["data"] = None
+                    media.append([path, raw])
+                return
+            for key, value in obj.items():
+                cls._extract_media_bytes(value, path + [key], media)
+        elif isinstance(obj, list):
+            for index, item in enumerate(obj):
+                cls._extract_media_bytes(item, path + [index], media)
+
+    def _load_binary(self, serialized_data: bytes) -> None:
+        """
+        Loads a dump created by dump_binary().
+
+        Args:
+            serialized_data (bytes): The binary representation of the ChatHistory.
+
+        Raises:
+            ValueError: If the data is invalid or was written by an unsupported format version.
+            ImportError: If msgpack, or zstandard for zstd-compressed data, is not installed.
+        """
+        header_length = len(BINARY_DUMP_MAGIC) + 2
+        if len(serialized_data) < header_length:
+            raise ValueError("Invalid serialized data: truncated binary header")
+        version, compression_code = serialized_data[len(BINARY_DUMP_MAGIC) : header_length]
+        if version != BINARY_DUMP_VERSION:
+            raise ValueError(f"Unsupported binary history format version {version}")
+        compressions = {code: name for name, code in _BINARY_COMPRESSIONS.items()}
+        if compression_code not in compressions:
+            raise ValueError(f"Invalid serialized data: unknown compression code {compression_code}")
+
         try:
-            history_data = json.loads(serialized_data)
+            payload = decompress(serialized_data[header_length:], compressions[compression_code])
+            history_data = unpackb(payload)
+            classes = [self._get_class_from_string(class_name) for class_name in history_data["classes"]]
+            has_multimodal = [bool(get_multimodal_fields(content_class)) for content_class in classes]
             self.history = []
             self.max_messages = history_data["max_messages"]
             self.current_turn_id = history_data["current_turn_id"]
 
-            for message_data in history_data["history"]:
-                content_info = message_data["content"]
-                content_class = self._get_class_from_string(content_info["class_name"])
-                content_instance = content_class.model_validate_json(content_info["data"])
+            for role, turn_id, class_index, content_json, media in history_data["messages"]:
+                content_class = classes[class_index]
+                if media is None:
+                    content_instance = content_class.model_validate_json(content_json)
+                else:
+                    data = json.loads(content_json)
+                    for path, raw in media:
+                        target = data
+                        for key in path:
+                            target = target[key]
+                        target["data"] = base64.b64encode(raw).decode("ascii")
+                    content_instance = content_class.model_validate(data)
 
                 # Process any Image objects to convert string paths back to Path objects
-                self._process_multimodal_paths(content_instance)
+                if has_multimodal[class_index]:
+                    self._process_multimodal_paths(content_instance)
+                self.history.append(Message(role=role, content=content_instance, turn_id=turn_id))
+        except (KeyError, IndexError, AttributeError, TypeError, ValueError, zlib.error) as e:
+            raise ValueError(f"Invalid serialized data: {e}")
 
-                message = Message(role=message_data["role"], content=content_instance, turn_id=message_data["turn_id"])
-                self.history.append(message)
+    def load(self, serialized_data: Union[str, bytes]) -> None:
+        """
+        Deserializes a JSON string or a binary dump and loads it into the ChatHistory instance.
+
+        Args:
+            serialized_data (Union[str, bytes]): A representation of the ChatHistory created by dump()
+                or dump_binary().
+
+        Raises:
+            ValueError: If the serialized data is invalid or cannot be deserialized.
+            ImportError: If the data is a binary dump and msgpack is not installed.
+        """
+        if isinstance(serialized_data, (bytes, bytearray, memoryview)):
+            serialized_data = bytes(serialized_data)
+            if serialized_data.startswith(BINARY_DUMP_MAGIC):
+                self._load_binary(serialized_data)
+                return
+        try:
+            history_data = json.loads(serialized_data)
+            self.history = []
+            self.max_messages = history_data["max_messages"]
+            self.current_turn_id = history_data["current_turn_id"]
+
+            for message_data in history_data["history"]:
+                self.history.append(self._load_message(message_data))
         except (json.JSONDecodeError, KeyError, AttributeError, TypeError) as e:
             raise ValueError(f"Invalid serialized data: {e}")
 
+    @staticmethod
+    def _dump_message(message: Message) -> Dict[str, Any]:
+        """
+        Converts a message into the JSON-compatible record stored by dump().
+
+        Args:
+            message (Message): The message to convert.
+
+        Returns:
+            Dict[str, Any]: A dictionary with 'role', 'content' (class name and JSON data) and 'turn_id' keys.
+        """
+        content_class = message.content.__class__
+        return {
+            "role": message.role,
+            "content": {
+                "class_name": f"{content_class.__module__}.{content_class.__name__}",
+                "data": message.content.model_dump_json(),
+            },
+            "turn_id": message.turn_id,
+        }
+
+    @classmethod
+    def _load_message(cls, message_data: Dict[str, Any]) -> Message:
+        """
+        Rebuilds a message from a record created by _dump_message().
+
+        Args:
+            message_data (Dict[str, Any]): The message record.
+
+        Returns:
+            Message: The restored message.
+        """
+        content_info = message_data["content"]
+        content_class = cls._get_class_from_string(content_info["class_name"])
+        content_instance = content_class.model_validate_json(content_info["data"])
+
+        # Process any Image objects to convert string paths back to Path objects
+        if get_multimodal_fields(content_class):
+            cls._process_multimodal_paths(content_instance)
+
+        return Message(role=message_data["role"], content=content_instance, turn_id=message_data["turn_id"])
+
     @staticmethod
     def _get_class_from_string(class_string: str) -> Type[BaseIOSchema]:
         """
         Retrieves a class object from its string representation.
 
+        Classes are imported once per process. A cached class is only reused while it is still the
+        module's attribute of that name, so reloaded modules and redefined classes are picked up.
+
         Args:
             class_string (str): The fully qualified class name.
 
@@ -310,10 +740,20 @@ class ChatHistory:
             AttributeError: If the class cannot be found.
         """
         module_name, class_name = class_string.rsplit(".", 1)
+        content_class = _classes_by_name.get(class_string)
+        if content_class is not None and getattr(sys.modules.get(module_name), class_name, None) is content_class:
+            return content_class
         module = __import__(module_name, fromlist=[class_name])
-        return getattr(module, class_name)
-
-    def _process_multimodal_paths(self, obj):
+        content_class = getattr(module, class_name)
+        try:
+            _classes_by_name[class_string] = content_class
+        except TypeError:
+            # Not weakly referenceable, i.e. not a class
+            pass
+        return content_class
+
+    @classmethod
+    def _process_multimodal_paths(cls, obj):
         """
         Process multimodal objects to convert string paths to Path objects.
 
@@ -331,21 +771,21 @@ class ChatHistory:
         elif isinstance(obj, list):
             # Process each item in the list
             for item in obj:
-                self._process_multimodal_paths(item)
+                cls._process_multimodal_paths(item)
         elif isinstance(obj, dict):
             # Process each value in the dictionary
             for value in obj.values():
-                self._process_multimodal_paths(value)
-        elif hasattr(obj, "__class__") and hasattr(obj.__class__, "model_fields"):
-            # Process each field of the Pydantic model
-            for field_name in obj.__class__.model_fields:
+                cls._process_multimodal_paths(value)
+        elif isinstance(obj, BaseModel):
+            # Process the fields of the Pydantic model that can hold multimodal objects
+            for field_name in get_multimodal_fields(obj.__class__):
                 if hasattr(obj, field_name):
-                    self._process_multimodal_paths(getattr(obj, field_name))
+                    cls._process_multimodal_paths(getattr(obj, field_name))
         elif hasattr(obj, "__dict__") and not isinstance(obj, Enum):
             # Process each attribute of the object
             for attr_name, attr_value in obj.__dict__.items():
                 if attr_name != "__pydantic_fields_set__":  # Skip pydantic internal fields
-                    self._process_multimodal_paths(attr_value)
+                    cls._process_multimodal_paths(attr_value)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,309 @@
+"""Persistence backends that save a ChatHistory incrementally instead of re-dumping it on every turn."""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from os import PathLike
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from atomic_agents.context.chat_history import ChatHistory, Message
+
+
+class BaseHistoryStore(ABC):
+    """
+    Abstract base class for chat history stores.
+
+    A store persists a single conversation. save() is called after each change (typically after
+    every turn) and only has to write what changed since the previous save; load() rebuilds the
+    conversation in a new ChatHistory.
+    """
+
+    @abstractmethod
+    def save(self, history: ChatHistory) -> None:
+        """
+        Persist the current state of a history.
+
+        Args:
+            history (ChatHistory): The history to persist.
+        """
+        pass
+
+    @abstractmethod
+    def load(self) -> Optional[ChatHistory]:
+        """
+        Rebuild the persisted history.
+
+        Returns:
+            Optional[ChatHistory]: The restored history, or None if nothing has been saved yet.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove the persisted history."""
+        pass
+
+
+class JSONLHistoryStore(BaseHistoryStore):
+    """
+    Append-only history store writing one JSON record per line.
+
+    Each save appends delta records for the messages added since the previous save, for whole
+    turns that were deleted and for messages dropped from the front of the history (overflow and
+    context trimming). Loading replays the records. Once the log holds more records for deleted
+    messages than for live ones, it is compacted by rewriting it as a single snapshot record.
+
+    Changes the log can't express as deltas (e.g. a turn whose messages were only partly removed,
+    or reordered messages) are written as a snapshot record, which supersedes everything before it.
+
+    Record types:
+        {"op": "snapshot", "history": [...], "max_messages": ..., "current_turn_id": ...}
+        {"op": "add", "message": {...}}
+        {"op": "drop", "count": n}
+        {"op": "delete_turn", "turn_id": "..."}
+        {"op": "state", "max_messages": ..., "current_turn_id": ...}
+
+    Args:
+        path (Union[str, PathLike]): Path of the log file. Missing parent directories are created.
+        min_compaction_records (int): Minimum number of obsolete records before the log is compacted.
+        fsync (bool): Whether to fsync the log after every save, so saved turns survive a power loss.
+    """
+
+    def __init__(self, path: Union[str, PathLike], min_compaction_records: int = 256, fsync: bool = False):
+        if min_compaction_records < 1:
+            raise ValueError("min_compaction_records must be at least 1")
+        self.path = Path(path)
+        self.min_compaction_records = min_compaction_records
+        self.fsync = fsync
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # The messages and state the log currently describes, if known
+        self._persisted: Optional[List[Message]] = None
+        self._persisted_state: Optional[Dict[str, Any]] = None
+        self._record_count = 0
+        # Length of the log without a truncated last line, which is cut off before the next append
+        self._truncate_to: Optional[int] = None
+
+    def save(self, history: ChatHistory) -> None:
+        with self._lock:
+            if self._persisted is None:
+                self._load_persisted()
+            records = self._diff(history.history)
+            if records is None or self._needs_compaction(len(history.history), len(records)):
+                self._write_snapshot(history)
+                return
+
+            state = self._get_state(history)
+            if state != self._persisted_state:
+                records.append({"op": "state", **state})
+            if records:
+                self._append(records)
+                self._record_count += len(records)
+            self._persisted = list(history.history)
+            self._persisted_state = state
+
+    def load(self) -> Optional[ChatHistory]:
+        with self._lock:
+            if not self._load_persisted():
+                return None
+            history = ChatHistory(max_messages=self._persisted_state["max_messages"])
+            history.history = list(self._persisted)
+            history.current_turn_id = self._persisted_state["current_turn_id"]
+            return history
+
+    def compact(self, history: Optional[ChatHistory] = None) -> None:
+        """
+        Rewrite the log as a single snapshot record.
+
+        Args:
+            history (Optional[ChatHistory]): The history to write. Defaults to the persisted history.
+        """
+        with self._lock:
+            if history is None:
+                history = ChatHistory()
+                if self._load_persisted():
+                    history.max_messages = self._persisted_state["max_messages"]
+                    history.history = list(self._persisted)
+                    history.current_turn_id = self._persisted_state["current_turn_id"]
+            self._write_snapshot(history)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self._persisted = []
+            self._persisted_state = None
+            self._record_count = 0
+
+    def _diff(self, messages: List[Message]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Compute the delta records turning the persisted messages into the given ones.
+
+        Messages are compared by identity, as ChatHistory never modifies a message after adding it.
+
+        Args:
+            messages (List[Message]): The history's current messages.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: The records, or None if the change can't be expressed as deltas.
+        """
+        persisted = self._persisted
+        count = len(persisted)
+        if count == 0 or (len(messages) >= count and messages[0] is persisted[0] and messages[count - 1] is persisted[-1]):
+            # Only appended messages (the common case after a turn)
+            return [{"op": "add", "message": ChatHistory._dump_message(message)} for message in messages[count:]]
+
+        positions = {id(message): position for position, message in enumerate(persisted)}
+        kept = []
+        for index, message in enumerate(messages):
+            position = positions.get(id(message))
+            if position is None or persisted[position] is not message:
+                break
+            if kept and position <= kept[-1]:
+                return None
+            kept.append(position)
+        else:
+            index = len(messages)
+        appended = messages[index:]
+        if any(id(message) in positions for message in appended):
+            return None
+
+        kept_set = set(kept)
+        dropped = 0
+        while dropped < count and dropped not in kept_set:
+            dropped += 1
+        records: List[Dict[str, Any]] = [{"op": "drop", "count": dropped}] if dropped else []
+
+        # Messages removed from the middle must form whole turns
+        removed_turns: Dict[Optional[str], bool] = {}
+        for position in range(dropped, count):
+            turn_id = persisted[position].turn_id
+            removed = position not in kept_set
+            if removed_turns.setdefault(turn_id, removed) != removed:
+                # The turn was only partly removed
+                return None
+        for turn_id, removed in removed_turns.items():
+            if removed:
+                if turn_id is None:
+                    return None
+                records.append({"op": "delete_turn", "turn_id": turn_id})
+
+        records.extend({"op": "add", "message": ChatHistory._dump_message(message)} for message in appended)
+        return records
+
+    def _needs_compaction(self, live_messages: int, new_records: int) -> bool:
+        """
+        Whether the log holds enough obsolete records to be rewritten.
+
+        Args:
+            live_messages (int): The number of messages in the history being saved.
+            new_records (int): The number of records the save would append.
+
+        Returns:
+            bool: True if the log should be compacted.
+        """
+        obsolete = self._record_count + new_records - live_messages
+        return obsolete >= max(self.min_compaction_records, live_messages)
+
+    @staticmethod
+    def _get_state(history: ChatHistory) -> Dict[str, Any]:
+        return {"max_messages": history.max_messages, "current_turn_id": history.current_turn_id}
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Append records to the log in a single write.
+
+        Args:
+            records (List[Dict[str, Any]]): The records to append.
+        """
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        if self._truncate_to is not None:
+            with open(self.path, "r+b") as file:
+                file.truncate(self._truncate_to)
+            self._truncate_to = None
+        with open(self.path, "ab") as file:
+            file.write(data)
+            if self.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _write_snapshot(self, history: ChatHistory) -> None:
+        """
+        Replace the log with a single snapshot record of a history.
+
+        The snapshot is written to a temporary file first, so a crash never leaves a partial log behind.
+
+        Args:
+            history (ChatHistory): The history to write.
+        """
+        state = self._get_state(history)
+        record = {"op": "snapshot", "history": [ChatHistory._dump_message(message) for message in history.history], **state}
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+        self._persisted = list(history.history)
+        self._persisted_state = state
+        self._record_count = 1
+        self._truncate_to = None
+
+    def _load_persisted(self) -> bool:
+        """
+        Replay the log into the persisted messages and state.
+
+        A truncated last line, left by a crash during a write, is ignored. Every record ends with a
+        newline, so a last line without one is considered truncated even if it parses.
+
+        Returns:
+            bool: True if the log exists and holds a history.
+
+        Raises:
+            ValueError: If a record is invalid.
+        """
+        self._persisted = []
+        self._persisted_state = None
+        self._record_count = 0
+        self._truncate_to = None
+        if not self.path.exists():
+            return False
+
+        messages: List[Message] = []
+        state: Optional[Dict[str, Any]] = None
+        with open(self.path, "rb") as file:
+            lines = file.read().splitlines(keepends=True)
+        offset = 0
+        for line_number, line in enumerate(lines, start=1):
+            if not line.endswith(b"\n"):
+                self._truncate_to = offset
+                break
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid history log record on line {line_number}: {e}")
+            try:
+                op = record["op"]
+                if op == "snapshot":
+                    messages = [ChatHistory._load_message(message_data) for message_data in record["history"]]
+                    state = {"max_messages": record["max_messages"], "current_turn_id": record["current_turn_id"]}
+                elif op == "add":
+                    messages.append(ChatHistory._load_message(record["message"]))
+                elif op == "drop":
+                    del messages[: record["count"]]
+                elif op == "delete_turn":
+                    messages = [message for message in messages if message.turn_id != record["turn_id"]]
+                elif op == "state":
+                    state = {"max_messages": record["max_messages"], "current_turn_id": record["current_turn_id"]}
+                else:
+                    raise ValueError(f"unknown op {op!r}")
+            except (KeyError, AttributeError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid history log record on line {line_number}: {e}")
+            self._record_count += 1
+
+        self._persisted = messages
+        self._persisted_state = state or {"max_messages": None, "current_turn_id": None}
+        return self._record_count > 0
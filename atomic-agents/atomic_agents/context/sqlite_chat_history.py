@@ -0,0 +1,381 @@
+"""Chat history stored in a SQLite database, one row per message, with only a tail window kept in memory."""
+
+import sqlite3
+import threading
+import uuid
+import weakref
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+from atomic_agents.context.chat_history import ChatHistory, Message
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS messages ("
+    "session_id TEXT NOT NULL, seq INTEGER NOT NULL, turn_id TEXT, role TEXT NOT NULL, "
+    "class_name TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (session_id, seq))",
+    "CREATE INDEX IF NOT EXISTS messages_turn ON messages (session_id, turn_id)",
+    "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, current_turn_id TEXT)",
+)
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection, lock: threading.RLock) -> Iterator[None]:
+    """
+    Run the statements of the block in one transaction, whatever the connection's isolation level.
+
+    Inside a transaction the caller opened on a shared connection, the statements join it and the
+    caller commits them. Otherwise the block is committed, or rolled back if it raises.
+    """
+    with lock:
+        if connection.in_transaction:
+            yield
+            return
+        connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+def _delete_session(connection: sqlite3.Connection, lock: threading.RLock, session_id: str) -> None:
+    """Delete a session's rows, ignoring a connection that has been closed in the meantime."""
+    try:
+        with _transaction(connection, lock):
+            connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    except sqlite3.ProgrammingError:
+        pass
+
+
+class SQLiteChatHistory(ChatHistory):
+    """
+    Chat history persisted in a SQLite database and loaded lazily.
+
+    Every message is stored as its own row, indexed by session and turn, and written when it is
+    added, so nothing has to be dumped after a turn. Creating the history only loads the last
+    `window` messages, and the conversation the history exposes (get_history, get_token_counts,
+    get_turn_ids), and an agent therefore sends, is the loaded messages. Older messages stay in the
+    database until load_older() pages them in or dump() needs them. Overflow (max_messages) and
+    deletions of older turns are applied to the database without loading the affected messages.
+    unload() releases paged-in messages again.
+
+    `history` holds the loaded messages only: the tail window until the older ones are paged in.
+    Modify the history through its methods; changes made to `history` directly are not persisted.
+    copy() and restore() copy the rows inside the database, without loading them. Each copy still
+    writes every row of the session once, and an agent takes one when it is created (as the state
+    reset_history() returns to). For long sessions, create the agent once and reuse it, or pass the
+    history to run_with_history() instead of creating an agent per request.
+
+    Each change is committed when it is made, whatever the connection's isolation level. On a shared
+    connection inside a transaction the caller opened, changes join that transaction instead.
+
+    Args:
+        database (Union[str, PathLike, sqlite3.Connection]): Path of the database file, or an open connection
+            to share between histories. Missing parent directories are created.
+        session_id (str): The conversation's ID. Histories with the same ID share their messages.
+        max_messages (Optional[int]): Maximum number of messages to keep in the session.
+        window (int): Number of most recent messages loaded when the history is created and kept by unload().
+        page_size (int): Number of older messages read per query when paging them in.
+    """
+
+    def __init__(
+        self,
+        database: Union[str, PathLike, sqlite3.Connection],
+        session_id: str,
+        max_messages: Optional[int] = None,
+        window: int = 50,
+        page_size: int = 500,
+    ):
+        if window < 0:
+            raise ValueError("window must not be negative")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        super().__init__(max_messages=max_messages)
+        self.session_id = session_id
+        self.window = window
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        if isinstance(database, sqlite3.Connection):
+            self._connection = database
+        else:
+            path = Path(database)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._connection.execute(statement)
+
+        # Rows with seq >= _boundary are loaded into `history` (in order), older rows are not
+        self._unloaded = 0
+        self._boundary = 0
+        self._next_seq = 0
+        self._load_window()
+
+    def _transaction(self):
+        return _transaction(self._connection, self._lock)
+
+    def _load_window(self) -> None:
+        """
+        Load the session's state and its last `window` messages.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT current_turn_id FROM sessions WHERE session_id = ?", (self.session_id,)
+            ).fetchone()
+            self.current_turn_id = row[0] if row else None
+            count, last_seq = self._connection.execute(
+                "SELECT COUNT(*), MAX(seq) FROM messages WHERE session_id = ?", (self.session_id,)
+            ).fetchone()
+            self._next_seq = last_seq + 1 if last_seq is not None else 0
+
+            rows = []
+            if self.window:
+                rows = self._connection.execute(
+                    "SELECT seq, turn_id, role, class_name, data FROM messages WHERE session_id = ? "
+                    "ORDER BY seq DESC LIMIT ?",
+                    (self.session_id, self.window),
+                ).fetchall()
+                rows.reverse()
+        self.history = [self._message_from_row(row) for row in rows]
+        self._boundary = rows[0][0] if rows else self._next_seq
+        self._unloaded = count - len(rows)
+
+    @staticmethod
+    def _message_from_row(row: tuple) -> Message:
+        _, turn_id, role, class_name, data = row
+        return ChatHistory._load_message(
+            {"role": role, "content": {"class_name": class_name, "data": data}, "turn_id": turn_id}
+        )
+
+    def load_older(self) -> None:
+        """
+        Page all messages that are not loaded yet into `history`, newest pages first.
+        """
+        if not self._unloaded:
+            return
+        with self._lock:
+            older: List[Message] = []
+            while True:
+                rows = self._connection.execute(
+                    "SELECT seq, turn_id, role, class_name, data FROM messages WHERE session_id = ? AND seq < ? "
+                    "ORDER BY seq DESC LIMIT ?",
+                    (self.session_id, self._boundary, self.page_size),
+                ).fetchall()
+                if not rows:
+                    break
+                rows.reverse()
+                older[:0] = [self._message_from_row(row) for row in rows]
+                self._boundary = rows[0][0]
+            self.history[:0] = older
+            self._unloaded = 0
+            self._rebuild_turn_index()
+
+    def unload(self) -> None:
+        """
+        Release the loaded messages except the last `window` ones. They stay in the database.
+        """
+        with self._lock:
+            excess = len(self.history) - self.window
+            if excess <= 0:
+                return
+            if self.window:
+                (self._boundary,) = self._connection.execute(
+                    "SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                    (self.session_id, self.window - 1),
+                ).fetchone()
+            else:
+                self._boundary = self._next_seq
+            del self.history[:excess]
+            self._unloaded += excess
+            self._rebuild_turn_index()
+
+    def initialize_turn(self) -> None:
+        super().initialize_turn()
+        self._save_current_turn_id()
+
+    def _save_current_turn_id(self) -> None:
+        with self._transaction():
+            self._connection.execute(
+                "INSERT INTO sessions (session_id, current_turn_id) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET current_turn_id = excluded.current_turn_id",
+                (self.session_id, self.current_turn_id),
+            )
+
+    def _append_message(self, message: Message) -> None:
+        record = self._dump_message(message)
+        with self._transaction():
+            self._connection.execute(
+                "INSERT INTO messages (session_id, seq, turn_id, role, class_name, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.session_id,
+                    self._next_seq,
+                    message.turn_id,
+                    message.role,
+                    record["content"]["class_name"],
+                    record["content"]["data"],
+                ),
+            )
+            self._next_seq += 1
+            super()._append_message(message)
+
+    def _manage_overflow(self) -> None:
+        if self.max_messages is None:
+            return
+        excess = self.get_message_count() - self.max_messages
+        if excess <= 0:
+            return
+        with self._transaction():
+            self._connection.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq IN "
+                "(SELECT seq FROM messages WHERE session_id = ? ORDER BY seq LIMIT ?)",
+                (self.session_id, self.session_id, excess),
+            )
+            # Older messages that were never loaded go first
+            unloaded_removed = min(excess, self._unloaded)
+            self._unloaded -= unloaded_removed
+            if excess > unloaded_removed:
+                self._remove_oldest(excess - unloaded_removed)
+
+    def delete_turn_id(self, turn_id: str):
+        with self._transaction():
+            (unloaded_removed,) = self._connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ? AND turn_id = ? AND seq < ?",
+                (self.session_id, turn_id, self._boundary),
+            ).fetchone()
+            deleted = self._connection.execute(
+                "DELETE FROM messages WHERE session_id = ? AND turn_id = ?", (self.session_id, turn_id)
+            ).rowcount
+            if not deleted:
+                raise ValueError(f"Turn ID {turn_id} not found in history.")
+            self._unloaded -= unloaded_removed
+
+            current_turn_id = self.current_turn_id
+            if self._get_turn_positions(turn_id):
+                super().delete_turn_id(turn_id)
+            if turn_id == current_turn_id:
+                # Update to the last remaining message's turn_id, which may not be loaded
+                row = self._connection.execute(
+                    "SELECT turn_id FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT 1", (self.session_id,)
+                ).fetchone()
+                self.current_turn_id = row[0] if row else None
+                self._save_current_turn_id()
+
+    def get_message_count(self) -> int:
+        return self._unloaded + len(self.history)
+
+    def dump(self) -> str:
+        self.load_older()
+        return super().dump()
+
+    def dump_binary(self, compression: Optional[str] = None) -> bytes:
+        self.load_older()
+        return super().dump_binary(compression=compression)
+
+    def copy(self, session_id: Optional[str] = None) -> "SQLiteChatHistory":
+        """
+        Copies the session into another session of the same database, without loading its messages.
+
+        Args:
+            session_id (Optional[str]): The session to copy into, replacing its messages. None copies into a
+                new temporary session, which is deleted when the returned history is garbage collected.
+
+        Returns:
+            SQLiteChatHistory: The copy, with the same settings and its last `window` messages loaded.
+        """
+        temporary = session_id is None
+        if temporary:
+            session_id = f"{self.session_id}/copy-{uuid.uuid4().hex}"
+        self._copy_session(self.session_id, session_id, self.current_turn_id)
+        copied = SQLiteChatHistory(
+            self._connection, session_id, max_messages=self.max_messages, window=self.window, page_size=self.page_size
+        )
+        # Both histories use the connection, so they must not use it concurrently
+        copied._lock = self._lock
+        if temporary:
+            weakref.finalize(copied, _delete_session, self._connection, self._lock, session_id)
+        return copied
+
+    def restore(self, snapshot: ChatHistory) -> None:
+        """
+        Replaces the session's messages with the ones of a snapshot, e.g. a copy() taken earlier.
+
+        A SQLiteChatHistory snapshot in the same database is copied inside the database, without
+        loading its messages.
+
+        Args:
+            snapshot (ChatHistory): The history to restore.
+        """
+        if not isinstance(snapshot, SQLiteChatHistory) or snapshot._connection is not self._connection:
+            super().restore(snapshot)
+            self._save_current_turn_id()
+            return
+        with self._lock:
+            self._copy_session(snapshot.session_id, self.session_id, snapshot.current_turn_id)
+            self._load_window()
+
+    def _copy_session(self, source: str, target: str, current_turn_id: Optional[str]) -> None:
+        """
+        Replace the rows of the target session with the ones of the source session in one transaction.
+        """
+        with self._transaction():
+            self._connection.execute("DELETE FROM messages WHERE session_id = ?", (target,))
+            self._connection.execute(
+                "INSERT INTO messages (session_id, seq, turn_id, role, class_name, data) "
+                "SELECT ?, seq, turn_id, role, class_name, data FROM messages WHERE session_id = ?",
+                (target, source),
+            )
+            self._connection.execute(
+                "INSERT INTO sessions (session_id, current_turn_id) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET current_turn_id = excluded.current_turn_id",
+                (target, current_turn_id),
+            )
+
+    def load(self, serialized_data: Union[str, bytes]) -> None:
+        """
+        Replaces the session's messages with the ones of a serialized ChatHistory.
+
+        Args:
+            serialized_data (Union[str, bytes]): A representation of the ChatHistory created by dump()
+                or dump_binary().
+
+        Raises:
+            ValueError: If the serialized data is invalid or cannot be deserialized.
+        """
+        super().load(serialized_data)
+        records = [self._dump_message(message) for message in self.history]
+        with self._transaction():
+            self._connection.execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+            self._connection.executemany(
+                "INSERT INTO messages (session_id, seq, turn_id, role, class_name, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.session_id,
+                        seq,
+                        record["turn_id"],
+                        record["role"],
+                        record["content"]["class_name"],
+                        record["content"]["data"],
+                    )
+                    for seq, record in enumerate(records)
+                ],
+            )
+            self._save_current_turn_id()
+            self._unloaded = 0
+            self._boundary = 0
+            self._next_seq = len(records)
+
+    def clear(self) -> None:
+        """
+        Deletes all messages of the session.
+        """
+        with self._transaction():
+            self._connection.execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+            self.history = []
+            self.current_turn_id = None
+            self._save_current_turn_id()
+            self._unloaded = 0
+            self._boundary = self._next_seq
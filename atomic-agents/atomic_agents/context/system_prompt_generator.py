@@ -1,19 +1,165 @@
+import asyncio
+import time
+import weakref
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Provider output fetched once for the run in progress, keyed by provider id
+_context_snapshot: ContextVar[Optional[Dict[int, str]]] = ContextVar("_context_snapshot", default=None)
+
+
+class ContextProviderStats(NamedTuple):
+    """
+    Call counters and timings of a context provider.
+
+    Attributes:
+        calls: Number of times the provider was queried.
+        cache_hits: Number of requests for its info answered without querying it.
+        last_duration: Seconds the last query took (None if it was never queried).
+        total_duration: Total seconds spent querying it.
+    """
+
+    calls: int
+    cache_hits: int
+    last_duration: Optional[float]
+    total_duration: float
+
+    @property
+    def mean_duration(self) -> float:
+        """Average seconds a query took."""
+        return self.total_duration / self.calls if self.calls else 0.0
 
 
 class BaseDynamicContextProvider(ABC):
-    def __init__(self, title: str):
+    """
+    Base class for providers of dynamic information injected into the system prompt.
+
+    Subclasses implement get_info(), and may implement get_info_async() for providers backed by
+    async I/O. Prompt generators read the info through get_cached_info()/get_cached_info_async(),
+    which reuse the last result for ttl seconds and record the time spent querying the provider.
+
+    Args:
+        title (str): The title of the provider's section in the prompt.
+        ttl (Optional[float]): Seconds the info is reused before the provider is queried again.
+            None queries the provider on every prompt build (at most once per agent run).
+    """
+
+    ttl: Optional[float] = None
+    _cached_info: Optional[str] = None
+    _cached_at: float = 0.0
+    _calls: int = 0
+    _cache_hits: int = 0
+    _last_duration: Optional[float] = None
+    _total_duration: float = 0.0
+
+    def __init__(self, title: str, ttl: Optional[float] = None):
         self.title = title
+        self.ttl = ttl
 
     @abstractmethod
     def get_info(self) -> str:
         pass
 
+    async def get_info_async(self) -> str:
+        """Async variant of get_info(). Defaults to running get_info() in a worker thread."""
+        return await asyncio.to_thread(self.get_info)
+
+    def get_cached_info(self) -> str:
+        """Returns the info, querying the provider with get_info() only if no cached info is usable."""
+        info = self._lookup_cached_info()
+        if info is not None:
+            return info
+        start = time.perf_counter()
+        info = self.get_info()
+        return self._store_info(info, time.perf_counter() - start)
+
+    async def get_cached_info_async(self) -> str:
+        """Returns the info, querying the provider with get_info_async() only if no cached info is usable."""
+        info = self._lookup_cached_info()
+        if info is not None:
+            return info
+        start = time.perf_counter()
+        info = await self.get_info_async()
+        return self._store_info(info, time.perf_counter() - start)
+
+    def invalidate(self) -> None:
+        """Discards the cached info, so the provider is queried on the next prompt build."""
+        self._cached_info = None
+
+    def stats(self) -> ContextProviderStats:
+        """Returns the provider's call counters and timings."""
+        return ContextProviderStats(self._calls, self._cache_hits, self._last_duration, self._total_duration)
+
+    def _lookup_cached_info(self) -> Optional[str]:
+        snapshot = _context_snapshot.get()
+        if snapshot is not None and id(self) in snapshot:
+            self._cache_hits += 1
+            return snapshot[id(self)]
+        if self.ttl is not None and self._cached_info is not None and time.monotonic() - self._cached_at < self.ttl:
+            self._cache_hits += 1
+            return self._cached_info
+        return None
+
+    def _store_info(self, info: str, duration: float) -> str:
+        self._calls += 1
+        self._last_duration = duration
+        self._total_duration += duration
+        if self.ttl is not None:
+            self._cached_info = info
+            self._cached_at = time.monotonic()
+        return info
+
     def __repr__(self) -> str:
         return self.get_info()
 
 
+def fetch_context_snapshot(providers: Dict[str, BaseDynamicContextProvider]) -> Dict[int, str]:
+    """
+    Fetches the info of every provider once, for use with use_context_snapshot().
+
+    Args:
+        providers (Dict[str, BaseDynamicContextProvider]): The context providers.
+
+    Returns:
+        Dict[int, str]: The info of each provider, keyed by provider id.
+    """
+    return {id(provider): provider.get_cached_info() for provider in providers.values()}
+
+
+async def fetch_context_snapshot_async(providers: Dict[str, BaseDynamicContextProvider]) -> Dict[int, str]:
+    """
+    Fetches the info of every provider concurrently, for use with use_context_snapshot().
+
+    Args:
+        providers (Dict[str, BaseDynamicContextProvider]): The context providers.
+
+    Returns:
+        Dict[int, str]: The info of each provider, keyed by provider id.
+    """
+    providers = list(providers.values())
+    infos = await asyncio.gather(*(provider.get_cached_info_async() for provider in providers))
+    return {id(provider): info for provider, info in zip(providers, infos)}
+
+
+@contextmanager
+def use_context_snapshot(snapshot: Dict[int, str]) -> Iterator[None]:
+    """
+    Answers the providers' get_cached_info() calls from a snapshot within the block.
+
+    The snapshot only applies to the current thread or task, so concurrent runs don't see each other's.
+
+    Args:
+        snapshot (Dict[int, str]): The snapshot returned by fetch_context_snapshot() or fetch_context_snapshot_async().
+    """
+    token = _context_snapshot.set(snapshot)
+    try:
+        yield
+    finally:
+        _context_snapshot.reset(token)
+
+
 class BaseSystemPromptGenerator(ABC):
     def __init__(self, context_providers: Optional[Dict[str, BaseDynamicContextProvider]] = None):
         self.context_providers = context_providers or {}
@@ -22,11 +168,53 @@ class BaseSystemPromptGenerator(ABC):
     def generate_prompt(self) -> str:
         pass
 
+    def generate_static_prompt(self) -> str:
+        """Part of the prompt that is identical across requests. Defaults to the whole prompt."""
+        return self.generate_prompt()
+
+    def generate_dynamic_prompt(self) -> str:
+        """Part of the prompt that may change between requests, such as context provider output. Defaults to none."""
+        return ""
+
+    async def generate_prompt_async(self) -> str:
+        """Generates the prompt with the context providers queried concurrently via get_info_async()."""
+        with use_context_snapshot(await fetch_context_snapshot_async(self.context_providers)):
+            return self.generate_prompt()
+
+    def count_static_prompt_tokens(self, model: str, counter: Any) -> int:
+        """
+        Tokens of the static part of the prompt, counted as a single message.
+
+        Args:
+            model (str): The model identifier.
+            counter (TokenCounter): The token counter to use.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return counter.count_text(model, self.generate_static_prompt())
+
+    def provider_stats(self) -> Dict[str, ContextProviderStats]:
+        """Returns the call counters and timings of each context provider, to find slow providers."""
+        return {name: provider.stats() for name, provider in self.context_providers.items()}
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__} (providers={list(self.context_providers)})"
 
 
 class SystemPromptGenerator(BaseSystemPromptGenerator):
+    """
+    Generates the system prompt from static sections and the output of context providers.
+
+    The static sections (background, steps and output instructions) are rendered once and
+    reused until one of their lists is modified or replaced; only the context provider
+    section is rendered on every call. The token count of the static sections is cached
+    per model and token counter in the same way.
+
+    The section lists passed in are used as is, not copied, so modifying them later changes the
+    prompt. Changes are detected by comparing the lists' items with those of the last rendering.
+    """
+
     def __init__(
         self,
         background: Optional[List[str]] = None,
@@ -35,6 +223,9 @@ class SystemPromptGenerator(BaseSystemPromptGenerator):
         context_providers: Optional[Dict[str, BaseDynamicContextProvider]] = None,
     ):
         super().__init__(context_providers=context_providers)
+        self._static_prompt: Optional[str] = None
+        self._static_sections: Optional[Tuple[Tuple[str, ...], ...]] = None
+        self._static_token_counts: "weakref.WeakKeyDictionary[Any, Dict[str, int]]" = weakref.WeakKeyDictionary()
         self.background = background or ["This is a conversation with a helpful and friendly AI assistant."]
         self.steps = steps or []
         self.output_instructions = output_instructions or []
@@ -46,7 +237,36 @@ class SystemPromptGenerator(BaseSystemPromptGenerator):
             ]
         )
 
+    def invalidate_static_prompt(self) -> None:
+        """Discards the rendered static sections and their token counts, so they are rebuilt on next use."""
+        self._static_prompt = None
+        self._static_token_counts = weakref.WeakKeyDictionary()
+
     def generate_prompt(self) -> str:
+        dynamic_parts = self._dynamic_prompt_parts()
+        if not dynamic_parts:
+            return self.generate_static_prompt()
+        return (self.generate_static_prompt() + "\n\n" + "\n".join(dynamic_parts)).strip()
+
+    def generate_static_prompt(self) -> str:
+        sections = (tuple(self.background), tuple(self.steps), tuple(self.output_instructions))
+        if self._static_prompt is None or sections != self._static_sections:
+            self.invalidate_static_prompt()
+            self._static_prompt = "\n".join(self._static_prompt_parts()).strip()
+            self._static_sections = sections
+        return self._static_prompt
+
+    def count_static_prompt_tokens(self, model: str, counter: Any) -> int:
+        self.generate_static_prompt()
+        counts = self._static_token_counts.setdefault(counter, {})
+        if model not in counts:
+            counts[model] = super().count_static_prompt_tokens(model, counter)
+        return counts[model]
+
+    def generate_dynamic_prompt(self) -> str:
+        return "\n".join(self._dynamic_prompt_parts()).strip()
+
+    def _static_prompt_parts(self) -> List[str]:
         sections = [
             ("IDENTITY and PURPOSE", self.background),
             ("INTERNAL ASSISTANT STEPS", self.steps),
@@ -61,13 +281,18 @@ class SystemPromptGenerator(BaseSystemPromptGenerator):
                 prompt_parts.extend(f"- {item}" for item in content)
                 prompt_parts.append("")
 
+        return prompt_parts
+
+    def _dynamic_prompt_parts(self) -> List[str]:
+        prompt_parts = []
+
         if self.context_providers:
             prompt_parts.append("# EXTRA INFORMATION AND CONTEXT")
             for provider in self.context_providers.values():
-                info = provider.get_info()
+                info = provider.get_cached_info()
                 if info:
                     prompt_parts.append(f"## {provider.title}")
                     prompt_parts.append(info)
                     prompt_parts.append("")
 
-        return "\n".join(prompt_parts).strip()
+        return prompt_parts
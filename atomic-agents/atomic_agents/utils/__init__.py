@@ -1,12 +1,50 @@
 """Utility functions."""
 
 from .format_tool_message import format_tool_message
-from .token_counter import TokenCounter, TokenCountResult, TokenCountError, get_token_counter
+from .token_counter import (
+    TokenCounter,
+    TokenCountResult,
+    OffloadedTokenCountResult,
+    TokenCountError,
+    TokenCacheInfo,
+    get_token_counter,
+)
+from .token_backends import BaseTokenCounterBackend, LiteLLMBackend, TiktokenBackend, HeuristicBackend
+from .partial_json import PartialJSONParser, IncrementalModelValidator, PartialCoalescer, PartialModelStream
+from .response_cache import BaseResponseCache, LRUResponseCache, SQLiteResponseCache, make_cache_key
+from .single_flight import SingleFlight
+from .rate_limiter import RateLimiter, RateLimiterStats
+from .schema_cache import SchemaArtifacts, get_schema_artifacts, clear_schema_cache
+from .prompt_cache import PromptCacheUsage, extract_prompt_cache_usage, supports_cache_control, with_cache_control
 
 __all__ = [
     "format_tool_message",
     "TokenCounter",
     "TokenCountResult",
+    "OffloadedTokenCountResult",
     "TokenCountError",
+    "TokenCacheInfo",
     "get_token_counter",
+    "BaseTokenCounterBackend",
+    "LiteLLMBackend",
+    "TiktokenBackend",
+    "HeuristicBackend",
+    "PartialJSONParser",
+    "IncrementalModelValidator",
+    "PartialCoalescer",
+    "PartialModelStream",
+    "BaseResponseCache",
+    "LRUResponseCache",
+    "SQLiteResponseCache",
+    "make_cache_key",
+    "SingleFlight",
+    "RateLimiter",
+    "RateLimiterStats",
+    "SchemaArtifacts",
+    "get_schema_artifacts",
+    "clear_schema_cache",
+    "PromptCacheUsage",
+    "extract_prompt_cache_usage",
+    "supports_cache_control",
+    "with_cache_control",
 ]
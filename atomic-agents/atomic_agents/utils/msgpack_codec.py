@@ -0,0 +1,105 @@
+"""MessagePack encoding and compression for compact binary dumps, backed by the optional msgpack package."""
+
+import zlib
+from typing import Any, Optional
+
+_COMPRESSIONS = ("zlib", "zstd")
+
+
+def packb(obj: Any) -> bytes:
+    """
+    Encode a value as MessagePack.
+
+    Args:
+        obj (Any): The value to encode. Supports everything JSON can hold plus bytes.
+
+    Returns:
+        bytes: The encoded value.
+
+    Raises:
+        ImportError: If msgpack is not installed.
+        TypeError: If the value contains an unsupported type.
+        OverflowError: If an integer doesn't fit in 64 bits.
+    """
+    return _get_msgpack().packb(obj, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    """
+    Decode a MessagePack value created by packb().
+
+    Args:
+        data (bytes): The encoded value.
+
+    Returns:
+        Any: The decoded value, with arrays as lists.
+
+    Raises:
+        ImportError: If msgpack is not installed.
+        ValueError: If the data is truncated, has trailing bytes or is not valid MessagePack.
+    """
+    return _get_msgpack().unpackb(data, raw=False)
+
+
+def compress(data: bytes, method: Optional[str]) -> bytes:
+    """
+    Compress data with zlib or zstd.
+
+    Args:
+        data (bytes): The data to compress.
+        method (Optional[str]): 'zlib', 'zstd' (requires the zstandard package) or None for no compression.
+
+    Returns:
+        bytes: The compressed data.
+
+    Raises:
+        ValueError: If the method is unknown.
+        ImportError: If zstd is requested but zstandard is not installed.
+    """
+    if method is None:
+        return data
+    if method == "zlib":
+        return zlib.compress(data)
+    if method == "zstd":
+        return _get_zstandard().ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown compression {method!r}, expected one of {_COMPRESSIONS}")
+
+
+def decompress(data: bytes, method: Optional[str]) -> bytes:
+    """
+    Decompress data compressed by compress().
+
+    Args:
+        data (bytes): The compressed data.
+        method (Optional[str]): The compression the data was compressed with.
+
+    Returns:
+        bytes: The decompressed data.
+
+    Raises:
+        ValueError: If the method is unknown.
+        ImportError: If the data is zstd-compressed but zstandard is not installed.
+    """
+    if method is None:
+        return data
+    if method == "zlib":
+        return zlib.decompress(data)
+    if method == "zstd":
+        return _get_zstandard().ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"Unknown compression {method!r}, expected one of {_COMPRESSIONS}")
+
+
+def _get_msgpack():
+    try:
+        import msgpack
+    except ImportError as e:
+        raise ImportError("msgpack is required for binary history dumps. Install it with: pip install msgpack") from e
+    return msgpack
+
+
+def _get_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstandard is required for zstd compression. Install it with: pip install zstandard") from e
+    return zstandard
@@ -0,0 +1,624 @@
+"""Incremental parsing and validation of JSON documents streamed in chunks."""
+
+import inspect
+import json
+import re
+import time
+import types
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Type, Union, get_args, get_origin
+
+from jiter import from_json
+from pydantic import BaseModel
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_LITERAL = re.compile(r"[0-9a-zA-Z+\-.]*")
+# An escape sequence that may still be incomplete at the end of a string fragment. A complete
+# high surrogate is held back as well until its low surrogate has arrived.
+_INCOMPLETE_ESCAPE = re.compile(r"(?:\\u[dD][89abAB][0-9a-fA-F]{2}(?:\\(?:u[0-9a-fA-F]{0,3})?)?|\\u[0-9a-fA-F]{0,3}|\\)$")
+_INCOMPLETE_ESCAPE_MAX_LENGTH = 12
+_SURROGATE = re.compile("[\ud800-\udfff]")
+
+_MISSING = object()
+
+# Parser states of a container frame
+_VALUE = 0  # expecting a value, or waiting for the nested container that is being parsed
+_VALUE_OR_END = 1  # right after '['
+_KEY_OR_END = 2  # right after '{'
+_KEY = 3  # after ',' in an object
+_COLON = 4
+_COMMA_OR_END = 5
+
+
+def _decode_string_fragment(raw: str) -> str:
+    """Decode the raw (still escaped) content of a JSON string fragment."""
+    text = json.loads(f'"{raw}"')
+    if _SURROGATE.search(text):
+        raise ValueError("lone surrogate in string escape")
+    return text
+
+
+class _StringToken:
+    """A JSON string being parsed. Decoded incrementally, holding back any incomplete escape."""
+
+    __slots__ = ("parts", "pending", "escape", "is_key")
+
+    def __init__(self, is_key: bool):
+        self.parts: List[str] = []
+        self.pending = ""
+        self.escape = False
+        self.is_key = is_key
+
+    def append(self, raw: str) -> None:
+        pending = self.pending + raw
+        cut = len(pending)
+        pos = max(0, cut - _INCOMPLETE_ESCAPE_MAX_LENGTH)
+        while match := _INCOMPLETE_ESCAPE.search(pending, pos):
+            start = match.start()
+            backslashes = len(pending[:start]) - len(pending[:start].rstrip("\\"))
+            if backslashes % 2 == 0:
+                cut = start
+                break
+            pos = start + 1
+
+        if cut:
+            self.parts.append(_decode_string_fragment(pending[:cut]))
+        self.pending = pending[cut:]
+
+    def value(self) -> str:
+        if len(self.parts) > 1:
+            self.parts[:] = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+
+class _LiteralToken:
+    """A number, true, false or null being parsed."""
+
+    __slots__ = ("text",)
+
+    def __init__(self):
+        self.text = ""
+
+    def value(self) -> Any:
+        try:
+            return json.loads(self.text)
+        except ValueError:
+            return _MISSING
+
+
+class _Frame:
+    """An object or array that is still open."""
+
+    __slots__ = ("items", "key", "state")
+
+    def __init__(self, items):
+        self.items = items
+        self.key: Optional[str] = None
+        self.state = _KEY_OR_END if isinstance(items, dict) else _VALUE_OR_END
+
+
+class PartialJSONParser:
+    """
+    Incremental parser for a JSON document that arrives in chunks.
+
+    Keeps the parser state (open containers and the token in progress) between chunks, so
+    each chunk is only scanned once and completed values are never parsed again. snapshot()
+    returns the same partial value as ``jiter.from_json(buffer, partial_mode="trailing-strings")``
+    on the accumulated buffer: incomplete strings are included, incomplete numbers and literals
+    are left out.
+
+    If the input is something the incremental parser does not accept (malformed JSON, lone
+    surrogates, ...), it falls back to running jiter on the full buffer for the rest of the
+    document, so errors and edge cases behave exactly as they would without it.
+
+    Example:
+        ```python
+        parser = PartialJSONParser()
+        parser.feed('{"title": "Hel')
+        parser.snapshot()  # {"title": "Hel"}
+        parser.pop_changed_keys()  # {"title"}
+        parser.feed('lo", "tags": [')
+        parser.snapshot()  # {"title": "Hello", "tags": []}
+        parser.pop_changed_keys()  # {"title", "tags"}
+        ```
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._stack: List[_Frame] = []
+        self._token = None
+        self._started = False
+        self._done = False
+        self._root: Any = None
+        self._changed: Set[str] = set()
+        self._completed: List[str] = []
+        self._fallback = False
+
+    def feed(self, chunk: str) -> None:
+        """
+        Consume the next chunk of the document.
+
+        Args:
+            chunk (str): The next piece of the JSON text.
+        """
+        self._chunks.append(chunk)
+        if self._fallback:
+            return
+        try:
+            self._consume(chunk)
+        except ValueError:
+            self._fallback = True
+
+    def snapshot(self) -> Any:
+        """
+        Return the partial value of the document received so far.
+
+        Returns:
+            Any: The parsed partial value. An empty dict if nothing has been received yet.
+
+        Raises:
+            ValueError: If the accumulated text is not valid partial JSON.
+        """
+        if self._fallback:
+            return from_json(("".join(self._chunks) or "{}").encode(), partial_mode="trailing-strings")
+        if self._done:
+            return self._root
+        if self._stack:
+            return self._materialize(0)
+        if self._token is not None:
+            value = self._token.value()
+            if value is _MISSING:
+                raise ValueError("incomplete literal")
+            return value
+        return {}
+
+    def pop_changed_keys(self) -> Optional[Set[str]]:
+        """
+        Return the top-level keys whose value may have changed since the previous call.
+
+        Returns:
+            Optional[Set[str]]: The changed top-level keys, or None if they can't be tracked
+            (the document is not an object, or the parser fell back to full re-parsing).
+        """
+        if self._fallback:
+            return None
+        if self._stack:
+            root = self._stack[0]
+            if not isinstance(root.items, dict):
+                return None
+            if root.state == _VALUE and root.key is not None:
+                self._changed.add(root.key)
+        elif not isinstance(self._root, dict):
+            return None
+
+        changed = self._changed
+        self._changed = set()
+        return changed
+
+    def pop_completed_keys(self) -> List[str]:
+        """
+        Return the top-level keys whose value was completed since the previous call.
+
+        A value is complete once its closing quote, bracket or brace (or the delimiter after a
+        number or literal) has been received.
+
+        Returns:
+            List[str]: The completed top-level keys, in the order they were completed. Always empty
+            if the document is not an object or the parser fell back to full re-parsing.
+        """
+        completed = self._completed
+        self._completed = []
+        return [] if self._fallback else completed
+
+    def _materialize(self, level: int) -> Any:
+        frame = self._stack[level]
+        if level + 1 < len(self._stack):
+            child = self._materialize(level + 1)
+        elif self._token is not None and not getattr(self._token, "is_key", False):
+            child = self._token.value()
+        else:
+            child = _MISSING
+
+        if isinstance(frame.items, dict):
+            items = dict(frame.items)
+            if child is not _MISSING and frame.state == _VALUE:
+                items[frame.key] = child
+            return items
+
+        items = list(frame.items)
+        if child is not _MISSING:
+            items.append(child)
+        return items
+
+    def _emit(self, value: Any) -> None:
+        if not self._stack:
+            self._root = value
+            self._done = True
+            return
+
+        frame = self._stack[-1]
+        if isinstance(frame.items, dict):
+            frame.items[frame.key] = value
+            if len(self._stack) == 1:
+                self._changed.add(frame.key)
+                self._completed.append(frame.key)
+            frame.key = None
+        else:
+            frame.items.append(value)
+        frame.state = _COMMA_OR_END
+
+    def _consume(self, chunk: str) -> None:
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self._token is not None:
+                if isinstance(self._token, _StringToken):
+                    i = self._consume_string(chunk, i)
+                else:
+                    i = self._consume_literal(chunk, i)
+                continue
+            if self._done:
+                return
+
+            i = _WHITESPACE.match(chunk, i).end()
+            if i >= n:
+                return
+
+            char = chunk[i]
+            if not self._stack:
+                if self._started:
+                    raise ValueError(f"unexpected character {char!r}")
+                self._started = True
+                i = self._start_value(chunk, i)
+                continue
+
+            frame = self._stack[-1]
+            state = frame.state
+            if state == _VALUE:
+                i = self._start_value(chunk, i)
+            elif state == _VALUE_OR_END:
+                if char == "]":
+                    self._stack.pop()
+                    self._emit(frame.items)
+                    i += 1
+                else:
+                    frame.state = _VALUE
+                    i = self._start_value(chunk, i)
+            elif state == _KEY_OR_END or state == _KEY:
+                if char == '"':
+                    self._token = _StringToken(is_key=True)
+                    i += 1
+                elif char == "}" and state == _KEY_OR_END:
+                    self._stack.pop()
+                    self._emit(frame.items)
+                    i += 1
+                else:
+                    raise ValueError(f"expected object key, got {char!r}")
+            elif state == _COLON:
+                if char != ":":
+                    raise ValueError(f"expected ':', got {char!r}")
+                frame.state = _VALUE
+                i += 1
+            else:
+                is_object = isinstance(frame.items, dict)
+                if char == ",":
+                    frame.state = _KEY if is_object else _VALUE
+                elif char == ("}" if is_object else "]"):
+                    self._stack.pop()
+                    self._emit(frame.items)
+                else:
+                    raise ValueError(f"expected ',' or end of container, got {char!r}")
+                i += 1
+
+    def _start_value(self, chunk: str, i: int) -> int:
+        char = chunk[i]
+        if char == '"':
+            self._token = _StringToken(is_key=False)
+            return i + 1
+        if char == "{":
+            self._stack.append(_Frame({}))
+            return i + 1
+        if char == "[":
+            self._stack.append(_Frame([]))
+            return i + 1
+        if _LITERAL.match(chunk, i).end() > i:
+            self._token = _LiteralToken()
+            return i
+        raise ValueError(f"expected value, got {char!r}")
+
+    def _consume_string(self, chunk: str, i: int) -> int:
+        token = self._token
+        start = i
+        n = len(chunk)
+        while i < n:
+            if token.escape:
+                token.escape = False
+                i += 1
+                continue
+            match = _STRING_SPECIAL.search(chunk, i)
+            if match is None:
+                break
+            i = match.start()
+            if chunk[i] == "\\":
+                token.escape = True
+                i += 1
+                continue
+
+            # Closing quote
+            token.append(chunk[start:i])
+            if token.pending:
+                raise ValueError("incomplete escape at end of string")
+            self._token = None
+            if token.is_key:
+                frame = self._stack[-1]
+                frame.key = token.value()
+                frame.state = _COLON
+            else:
+                self._emit(token.value())
+            return i + 1
+
+        token.append(chunk[start:])
+        return n
+
+    def _consume_literal(self, chunk: str, i: int) -> int:
+        token = self._token
+        end = _LITERAL.match(chunk, i).end()
+        token.text += chunk[i:end]
+        if end < len(chunk):
+            # A delimiter follows, so the literal is complete
+            self._token = None
+            self._emit(json.loads(token.text))
+        return end
+
+
+def _list_item_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """Return T if the annotation is List[T] or Optional[List[T]] with T a Pydantic model, else None."""
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None
+        annotation = args[0]
+    if get_origin(annotation) is not list:
+        return None
+    (item,) = get_args(annotation) or (None,)
+    return item if inspect.isclass(item) and issubclass(item, BaseModel) else None
+
+
+class IncrementalModelValidator:
+    """
+    Validates successive partial snapshots of a streamed object against a Pydantic model.
+
+    After the first snapshot, only the top-level fields that changed are re-validated (via
+    Pydantic's assignment validation on a shallow copy of the previous result), so the cost of
+    each step does not grow with the fields that are already complete. For list-of-model fields,
+    items that were already validated are reused and only new or growing items are validated.
+    Models whose validation depends on more than individual fields (model validators, aliases,
+    frozen or non-default ``extra`` handling) are always validated in full.
+
+    Args:
+        model (Type[BaseModel]): The (partial) model to validate against.
+        **kwargs: Extra keyword arguments passed to ``model_validate``.
+    """
+
+    def __init__(self, model: Type[BaseModel], **kwargs: Any):
+        self.model = model
+        self.kwargs = kwargs
+        self._incremental = set(kwargs) <= {"context"} and self._supports_incremental(model)
+        self._previous: Optional[BaseModel] = None
+        self._previous_keys: Set[str] = set()
+        self._previous_lists: Dict[str, Any] = {}
+        self._list_item_models: Dict[str, Type[BaseModel]] = {}
+
+        if self._incremental:
+            validated_fields = set()
+            for decorator in model.__pydantic_decorators__.field_validators.values():
+                validated_fields.update(decorator.info.fields)
+            for name, field in model.model_fields.items():
+                item_model = _list_item_model(field.annotation)
+                if item_model and not field.metadata and name not in validated_fields and "*" not in validated_fields:
+                    self._list_item_models[name] = item_model
+
+    @staticmethod
+    def _supports_incremental(model: Type[BaseModel]) -> bool:
+        config = model.model_config
+        if config.get("frozen") or config.get("extra") in ("allow", "forbid") or config.get("alias_generator"):
+            return False
+        if model.__pydantic_decorators__.model_validators:
+            return False
+        return not any(field.alias or field.validation_alias for field in model.model_fields.values())
+
+    def validate(self, data: Any, changed_keys: Optional[Set[str]] = None) -> BaseModel:
+        """
+        Validate the next snapshot.
+
+        Args:
+            data (Any): The partial value, as returned by PartialJSONParser.snapshot().
+            changed_keys (Optional[Set[str]]): Top-level keys that changed since the previous snapshot.
+                None forces a full validation.
+
+        Returns:
+            BaseModel: The validated model instance.
+        """
+        if (
+            self._previous is None
+            or not self._incremental
+            or changed_keys is None
+            or not isinstance(data, dict)
+            or not self._previous_keys <= data.keys()
+        ):
+            result = self.model.model_validate(data, strict=None, **self.kwargs)
+        else:
+            result = self._previous.model_copy()
+            fields: Dict[str, Any] = self.model.model_fields
+            for key in changed_keys:
+                if key not in data or key not in fields:
+                    continue
+                if key in self._list_item_models and isinstance(data[key], list):
+                    self._validate_list_field(result, key, data[key])
+                else:
+                    self.model.__pydantic_validator__.validate_assignment(result, key, data[key], strict=None, **self.kwargs)
+
+        self._previous = result
+        self._previous_keys = set(data) if isinstance(data, dict) else set()
+        if isinstance(data, dict):
+            self._previous_lists = {key: data[key] for key in self._list_item_models if isinstance(data.get(key), list)}
+        return result
+
+    def _validate_list_field(self, result: BaseModel, key: str, raw_items: List[Any]) -> None:
+        # Completed items are the same objects in consecutive snapshots, so an identical raw
+        # item at the same index can reuse the item validated for the previous snapshot.
+        previous_raw = self._previous_lists.get(key) or []
+        previous_items = getattr(self._previous, key) or []
+        reusable = min(len(previous_raw), len(previous_items))
+        item_model = self._list_item_models[key]
+
+        items = []
+        for index, raw in enumerate(raw_items):
+            if index < reusable and previous_raw[index] is raw:
+                items.append(previous_items[index])
+            else:
+                items.append(item_model.model_validate(raw, strict=None, **self.kwargs))
+
+        result.__dict__[key] = items
+        result.__pydantic_fields_set__.add(key)
+
+
+class PartialCoalescer:
+    """
+    Decides when a streamed partial result is worth emitting.
+
+    Chunks arriving before both configured thresholds are met are coalesced into the next
+    emitted partial. The first partial is emitted as soon as it arrives.
+
+    Args:
+        min_interval (Optional[float]): Minimum number of seconds between two emitted partials.
+        min_changed_chars (Optional[int]): Minimum number of streamed JSON characters between two emitted partials.
+        clock (Callable[[], float]): Time source, defaults to time.monotonic.
+    """
+
+    def __init__(
+        self,
+        min_interval: Optional[float] = None,
+        min_changed_chars: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_interval = min_interval
+        self.min_changed_chars = min_changed_chars
+        self.clock = clock
+        self._last_emitted: Optional[float] = None
+        self._pending_chars = 0
+
+    def add(self, chars: int) -> None:
+        """Record the number of characters received since the previous call."""
+        self._pending_chars += chars
+
+    def ready(self) -> bool:
+        """Whether enough time has passed and enough characters have arrived to emit again."""
+        if self._last_emitted is None:
+            return True
+        if self.min_interval is not None and self.clock() - self._last_emitted < self.min_interval:
+            return False
+        return self.min_changed_chars is None or self._pending_chars >= self.min_changed_chars
+
+    def emitted(self) -> None:
+        """Record that a partial was emitted."""
+        self._last_emitted = self.clock()
+        self._pending_chars = 0
+
+
+class PartialModelStream:
+    """
+    Turns streamed JSON chunks into validated partial models.
+
+    Combines PartialJSONParser and IncrementalModelValidator. Without a coalescer, every chunk
+    produces a partial model. With a coalescer, chunks are only validated once the coalescer is
+    ready, partials identical to the previous one are skipped, and flush() returns the latest
+    state if it was held back. A chunk that completes a top-level field is always validated, so
+    field completion is reported as soon as it happens.
+
+    Args:
+        model (Type[BaseModel]): The (partial) model to validate against.
+        coalescer (Optional[PartialCoalescer]): Optional emission policy.
+        on_field_complete (Optional[Callable[[str, Any], None]]): Called with the field name and its
+            validated value whenever a top-level field is complete.
+        stop_after_fields (Optional[Iterable[str]]): Top-level fields after which the stream is done.
+            Once all of them are complete, ``stopped`` is set and the caller should stop feeding chunks.
+        **kwargs: Extra keyword arguments passed to ``model_validate``.
+    """
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        coalescer: Optional[PartialCoalescer] = None,
+        on_field_complete: Optional[Callable[[str, Any], None]] = None,
+        stop_after_fields: Optional[Iterable[str]] = None,
+        **kwargs: Any,
+    ):
+        self._parser = PartialJSONParser()
+        self._validator = IncrementalModelValidator(model, **kwargs)
+        self._coalescer = coalescer
+        self._on_field_complete = on_field_complete
+        self._stop_after_fields = set(stop_after_fields) if stop_after_fields else None
+        self._current: Optional[BaseModel] = None
+        self._last: Optional[BaseModel] = None
+        self._pending = False
+        self.completed_fields: List[str] = []
+        self.stopped = False
+
+    def feed(self, chunk: str) -> Optional[BaseModel]:
+        """
+        Consume the next chunk.
+
+        Args:
+            chunk (str): The next piece of the JSON text.
+
+        Returns:
+            Optional[BaseModel]: The partial model to emit, or None if this chunk is coalesced or skipped.
+        """
+        self._parser.feed(chunk)
+        completed = self._parser.pop_completed_keys()
+
+        if self._coalescer is None:
+            partial = self._validate(self._parser.pop_changed_keys())
+        else:
+            self._coalescer.add(len(chunk))
+            self._pending = True
+            partial = self._emit() if completed or self._coalescer.ready() else None
+
+        if completed:
+            self._complete(completed)
+        return partial
+
+    def flush(self) -> Optional[BaseModel]:
+        """
+        Return the latest partial model if it was held back by the coalescer.
+
+        Returns:
+            Optional[BaseModel]: The partial model to emit, or None if there is nothing new.
+        """
+        return self._emit() if self._pending else None
+
+    def _complete(self, fields: List[str]) -> None:
+        self.completed_fields.extend(fields)
+        if self._on_field_complete is not None:
+            for field in fields:
+                self._on_field_complete(field, getattr(self._current, field, None))
+        if self._stop_after_fields is not None and self._stop_after_fields.issubset(self.completed_fields):
+            self.stopped = True
+
+    def _validate(self, changed_keys: Optional[Set[str]]) -> BaseModel:
+        self._current = self._validator.validate(self._parser.snapshot(), changed_keys)
+        return self._current
+
+    def _emit(self) -> Optional[BaseModel]:
+        self._pending = False
+        changed_keys = self._parser.pop_changed_keys()
+        if self._last is not None and changed_keys is not None and not changed_keys:
+            return None
+
+        partial = self._validate(changed_keys)
+        if partial == self._last:
+            return None
+        self._last = partial
+        self._coalescer.emitted()
+        return partial
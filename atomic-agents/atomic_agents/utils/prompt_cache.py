@@ -0,0 +1,96 @@
+"""Helpers for provider-side prompt caching."""
+
+from typing import Any, Dict, NamedTuple, Optional
+
+from instructor import Mode, Provider
+
+# Anthropic caches the prompt up to and including a content block carrying this marker
+CACHE_CONTROL: Dict[str, str] = {"type": "ephemeral"}
+
+
+class PromptCacheUsage(NamedTuple):
+    """
+    Prompt caching statistics reported by the provider for a response.
+
+    Attributes:
+        prompt_tokens: Total prompt tokens of the request, including cached ones (None if not reported).
+        cached_tokens: Prompt tokens read from the provider's cache.
+        cache_creation_tokens: Prompt tokens written to the provider's cache (reported by Anthropic only).
+    """
+
+    prompt_tokens: Optional[int]
+    cached_tokens: int
+    cache_creation_tokens: int = 0
+
+
+def supports_cache_control(client: Any, mode: Mode) -> bool:
+    """
+    Whether a client's backend accepts cache-control breakpoints on message content blocks.
+
+    OpenAI and most other providers cache matching prompt prefixes automatically and need no markers.
+
+    Args:
+        client: The Instructor client.
+        mode: The Instructor mode.
+
+    Returns:
+        bool: True for Anthropic clients and modes.
+    """
+    return getattr(client, "provider", None) == Provider.ANTHROPIC or mode.name.startswith("ANTHROPIC")
+
+
+def with_cache_control(message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy of a message whose last content block carries a cache-control breakpoint.
+
+    String content is converted into a single text block. Messages whose content doesn't end in a
+    text block (e.g. multimodal objects) are returned unchanged.
+
+    Args:
+        message: A message with 'role' and 'content' keys.
+
+    Returns:
+        Dict[str, Any]: The marked message.
+    """
+    content = message.get("content")
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": dict(CACHE_CONTROL)}]
+    elif isinstance(content, list) and content and isinstance(content[-1], dict) and content[-1].get("type") == "text":
+        blocks = content[:-1] + [{**content[-1], "cache_control": dict(CACHE_CONTROL)}]
+    else:
+        return message
+    return {**message, "content": blocks}
+
+
+def extract_prompt_cache_usage(response: Any) -> Optional[PromptCacheUsage]:
+    """
+    Read the prompt caching statistics from the raw completion Instructor attaches to a response.
+
+    Understands Anthropic's ``cache_read_input_tokens``/``cache_creation_input_tokens`` and OpenAI's
+    ``prompt_tokens_details.cached_tokens`` usage fields.
+
+    Args:
+        response: The parsed response returned by the Instructor client.
+
+    Returns:
+        Optional[PromptCacheUsage]: The statistics, or None if the response doesn't report any.
+    """
+    usage = getattr(getattr(response, "_raw_response", None), "usage", None)
+    if usage is None:
+        return None
+
+    cache_read = getattr(usage, "cache_read_input_tokens", None)
+    cache_creation = getattr(usage, "cache_creation_input_tokens", None)
+    if isinstance(cache_read, int) or isinstance(cache_creation, int):
+        # Anthropic's input_tokens only counts the tokens after the last cache breakpoint
+        cache_read = cache_read or 0
+        cache_creation = cache_creation or 0
+        input_tokens = getattr(usage, "input_tokens", None)
+        prompt_tokens = input_tokens + cache_read + cache_creation if isinstance(input_tokens, int) else None
+        return PromptCacheUsage(prompt_tokens, cache_read, cache_creation)
+
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if not isinstance(cached_tokens, int):
+        return None
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    return PromptCacheUsage(prompt_tokens if isinstance(prompt_tokens, int) else None, cached_tokens)
@@ -0,0 +1,254 @@
+"""Token-bucket rate limiting for agents sharing a provider account."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, NamedTuple, Optional
+
+
+class RateLimiterStats(NamedTuple):
+    """
+    Snapshot of a rate limiter's state and metrics.
+
+    Attributes:
+        queue_depth: Number of callers currently waiting for admission.
+        admitted_requests: Number of requests admitted so far.
+        total_wait_time: Total seconds admitted requests spent waiting.
+        max_wait_time: Longest wait of a single admitted request, in seconds.
+        available_requests: Requests that can be admitted right now (None if requests are not limited).
+        available_tokens: Tokens that can be admitted right now (None if tokens are not limited).
+    """
+
+    queue_depth: int
+    admitted_requests: int
+    total_wait_time: float
+    max_wait_time: float
+    available_requests: Optional[float] = None
+    available_tokens: Optional[float] = None
+
+    @property
+    def mean_wait_time(self) -> float:
+        """Average wait of an admitted request, in seconds."""
+        return self.total_wait_time / self.admitted_requests if self.admitted_requests else 0.0
+
+
+class _Bucket:
+    """A token bucket that refills continuously up to its capacity."""
+
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, per_minute: int, now: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        deficit = min(amount, self.capacity) - self.level
+        # Ignore rounding errors left after sleeping for exactly the computed wait
+        return deficit / self.rate if deficit > 1e-9 else 0.0
+
+
+class _Waiter:
+    """A caller waiting in the admission queue, woken when it reaches the head."""
+
+    __slots__ = ("event", "loop", "future")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self) -> bool:
+        """Wake the waiter from any thread. Returns False if its event loop is already closed."""
+        if self.event is not None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            return False
+        return True
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class RateLimiter:
+    """
+    Admits model requests according to requests-per-minute and tokens-per-minute limits.
+
+    A single instance is meant to be shared (via AgentConfig.rate_limiter) by every agent using
+    the same provider account. Each request reserves one request slot and its estimated token
+    count: the prompt tokens plus a reservation for the output. Callers that can't be admitted
+    yet wait instead of failing, and are admitted in arrival order across threads, event loops
+    and sync and async callers. A request larger than the whole token budget is admitted once
+    the bucket is full.
+
+    Both the clock and the sleep functions can be replaced, so the limiter can be driven by a
+    virtual clock in tests.
+
+    Args:
+        requests_per_minute (Optional[int]): Maximum requests per minute. None means unlimited.
+        tokens_per_minute (Optional[int]): Maximum tokens (prompt + reserved output) per minute. None means unlimited.
+        output_tokens (int): Output tokens to reserve per request when the request does not set max_tokens.
+        clock (Callable[[], float]): Time source in seconds, defaults to time.monotonic.
+        sleep (Callable[[float], None]): Blocking sleep used by acquire(), defaults to time.sleep.
+        async_sleep (Callable[[float], Awaitable[None]]): Sleep used by acquire_async(), defaults to asyncio.sleep.
+
+    Example:
+        ```python
+        limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=200_000, output_tokens=1024)
+        config = AgentConfig(client=client, model="gpt-5-mini", rate_limiter=limiter)
+
+        # Later
+        print(limiter.stats().queue_depth)
+        ```
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        output_tokens: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        for name, limit in (("requests_per_minute", requests_per_minute), ("tokens_per_minute", tokens_per_minute)):
+            if limit is not None and limit <= 0:
+                raise ValueError(f"{name} must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.output_tokens = output_tokens
+        self.clock = clock
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+
+        now = clock()
+        self._requests = _Bucket(requests_per_minute, now) if requests_per_minute is not None else None
+        self._tokens = _Bucket(tokens_per_minute, now) if tokens_per_minute is not None else None
+        self._state_lock = threading.Lock()
+        # Callers in arrival order; only the head may reserve. Async waiters are bound to the
+        # event loop they wait on, so one limiter can serve several loops.
+        self._queue: Deque[_Waiter] = deque()
+        self._admitted = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until a request with the given token estimate can be admitted, then reserve it.
+
+        Args:
+            tokens (int): Estimated tokens of the request (prompt plus reserved output).
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waiter = _Waiter()
+        start = self._enqueue(waiter)
+        try:
+            waiter.event.wait()
+            while (wait := self._try_reserve(tokens)) > 0:
+                self.sleep(wait)
+        finally:
+            self._dequeue(waiter)
+        return self._record_wait(start)
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """
+        Wait until a request with the given token estimate can be admitted, then reserve it.
+
+        Waiting callers are admitted in arrival order. A cancelled caller leaves the queue without
+        reserving anything.
+
+        Args:
+            tokens (int): Estimated tokens of the request (prompt plus reserved output).
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waiter = _Waiter(asyncio.get_running_loop())
+        start = self._enqueue(waiter)
+        try:
+            await waiter.future
+            while (wait := self._try_reserve(tokens)) > 0:
+                await self.async_sleep(wait)
+        finally:
+            self._dequeue(waiter)
+        return self._record_wait(start)
+
+    def stats(self) -> RateLimiterStats:
+        """
+        Return the current queue depth, wait-time metrics and remaining capacity.
+
+        Returns:
+            RateLimiterStats: A snapshot of the limiter's state.
+        """
+        with self._state_lock:
+            now = self.clock()
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            return RateLimiterStats(
+                queue_depth=len(self._queue),
+                admitted_requests=self._admitted,
+                total_wait_time=self._total_wait,
+                max_wait_time=self._max_wait,
+                available_requests=self._requests.level if self._requests is not None else None,
+                available_tokens=self._tokens.level if self._tokens is not None else None,
+            )
+
+    def _try_reserve(self, tokens: int) -> float:
+        """Reserve the request if possible. Returns 0 on success, otherwise the seconds to wait before retrying."""
+        with self._state_lock:
+            now = self.clock()
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+
+            if self._requests is not None:
+                self._requests.level = max(0.0, self._requests.level - 1)
+            if self._tokens is not None:
+                self._tokens.level = max(0.0, self._tokens.level - min(tokens, self._tokens.capacity))
+            return 0.0
+
+    def _enqueue(self, waiter: _Waiter) -> float:
+        with self._state_lock:
+            self._queue.append(waiter)
+            if len(self._queue) == 1:
+                if waiter.future is not None:
+                    # Already on the waiter's loop, so it proceeds without a loop iteration
+                    waiter.future.set_result(None)
+                else:
+                    waiter.event.set()
+            return self.clock()
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        with self._state_lock:
+            if self._queue and self._queue[0] is waiter:
+                self._queue.popleft()
+                # Wake the next caller, skipping waiters whose event loop has been closed
+                while self._queue and not self._queue[0].wake():
+                    self._queue.popleft()
+            elif waiter in self._queue:
+                self._queue.remove(waiter)
+
+    def _record_wait(self, start: float) -> float:
+        with self._state_lock:
+            waited = self.clock() - start
+            self._admitted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            return waited
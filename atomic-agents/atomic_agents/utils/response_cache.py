@@ -0,0 +1,196 @@
+"""Response caches that let an agent skip the LLM call for a request it has already answered."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    return str(value)
+
+
+def make_cache_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    output_schema: Type[BaseModel],
+    completion_kwargs: Optional[Dict[str, Any]] = None,
+    mode: Optional[str] = None,
+) -> str:
+    """
+    Compute a stable key for a completion request.
+
+    The key is a SHA-256 hash over the model, the prepared messages, the JSON schema of the
+    output schema, the completion parameters and the Instructor mode. Multimodal content is
+    hashed through its JSON dump.
+
+    Args:
+        model (str): The model name.
+        messages (List[Dict[str, Any]]): The messages sent to the model.
+        output_schema (Type[BaseModel]): The response model.
+        completion_kwargs (Optional[Dict[str, Any]]): Additional parameters passed to the API provider.
+        mode (Optional[str]): The Instructor mode.
+
+    Returns:
+        str: A hex digest identifying the request.
+    """
+    payload = {
+        "model": model,
+        "messages": messages,
+        "schema": output_schema.model_json_schema(),
+        "parameters": completion_kwargs or {},
+        "mode": mode,
+    }
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class BaseResponseCache(ABC):
+    """
+    Abstract base class for response caches.
+
+    A cache maps request keys (see make_cache_key) to the JSON-serialized output of the model.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The request key.
+
+        Returns:
+            Optional[str]: The cached JSON response, or None on a miss.
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            key (str): The request key.
+            value (str): The JSON-serialized response.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        pass
+
+
+class LRUResponseCache(BaseResponseCache):
+    """
+    In-memory response cache with least-recently-used and time-to-live eviction.
+
+    Args:
+        max_size (int): Maximum number of cached responses. The least recently used entry is evicted first.
+        ttl (Optional[float]): Seconds after which an entry expires. None means entries never expire.
+        clock (Callable[[], float]): Time source, defaults to time.monotonic.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and self.clock() - stored_at >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseCache(BaseResponseCache):
+    """
+    On-disk response cache backed by a SQLite database.
+
+    The database can be shared between processes, so repeated runs of the same job reuse each
+    other's responses.
+
+    Args:
+        path (Union[str, PathLike]): Path of the database file. Missing parent directories are created.
+        ttl (Optional[float]): Seconds after which an entry expires. None means entries never expire.
+        clock (Callable[[], float]): Time source, defaults to time.time (wall clock, as entries outlive the process).
+    """
+
+    def __init__(self, path: Union[str, PathLike], ttl: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.clock = clock
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if self.ttl is not None and self.clock() - stored_at >= self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at) VALUES (?, ?, ?)", (key, value, self.clock())
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,104 @@
+"""Process-wide cache of the schema artifacts Instructor derives from an output schema."""
+
+import json
+import threading
+import weakref
+from textwrap import dedent
+from typing import Any, Dict, List, Optional, Type
+
+from instructor import Mode
+from pydantic import BaseModel
+
+# Modes in which Instructor sends the output schema as a tool definition instead of in the system prompt
+TOOLS_MODES = frozenset({Mode.TOOLS, Mode.TOOLS_STRICT, Mode.PARALLEL_TOOLS})
+
+
+class SchemaArtifacts:
+    """
+    The schema payload Instructor sends for an output schema in a given mode, and its token counts.
+
+    In TOOLS modes, ``tools`` holds the tools parameter and ``json_mode_text`` is None. In all other
+    modes, ``json_mode_text`` holds the schema text Instructor appends to the system message and
+    ``tools`` is None. Both are shared between all users of the cache and must not be modified.
+
+    Args:
+        output_schema (Type[BaseModel]): The output schema.
+        mode (Mode): The Instructor mode.
+    """
+
+    def __init__(self, output_schema: Type[BaseModel], mode: Mode):
+        # No reference to output_schema is kept, so the cache entry can go away with the class
+        self.mode = mode
+        self.tools: Optional[List[Dict[str, Any]]] = None
+        self.json_mode_text: Optional[str] = None
+        if mode in TOOLS_MODES:
+            from instructor.processing.schema import generate_openai_schema
+
+            self.tools = [{"type": "function", "function": generate_openai_schema(output_schema)}]
+        else:
+            self.json_mode_text = dedent(
+                f"""
+        As a genius expert, your task is to understand the content and provide
+        the parsed objects in json that match the following json_schema:
+
+        {json.dumps(output_schema.model_json_schema(), indent=2, ensure_ascii=False)}
+
+        Make sure to return an instance of the JSON, not the schema itself
+        """
+            ).strip()
+        self._token_counts: "weakref.WeakKeyDictionary[Any, Dict[str, int]]" = weakref.WeakKeyDictionary()
+
+    def token_count(self, model: str, counter: Any) -> int:
+        """
+        Tokens the schema adds to a request: the tools overhead in TOOLS modes, the schema text otherwise.
+
+        Counted once per model and counter.
+
+        Args:
+            model (str): The model identifier.
+            counter (TokenCounter): The token counter to use.
+
+        Returns:
+            int: The number of tokens.
+        """
+        counts = self._token_counts.setdefault(counter, {})
+        if model not in counts:
+            if self.tools is not None:
+                counts[model] = counter.count_tools(model, self.tools)
+            else:
+                counts[model] = counter.count_text(model, self.json_mode_text)
+        return counts[model]
+
+
+_artifacts: "weakref.WeakKeyDictionary[Type[BaseModel], Dict[Mode, SchemaArtifacts]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def get_schema_artifacts(output_schema: Type[BaseModel], mode: Mode) -> SchemaArtifacts:
+    """
+    Get the cached schema artifacts of an output schema for a mode, generating them on first use.
+
+    Output schemas are classes that don't change at runtime, so the artifacts are generated once
+    per process. Entries go away with their schema class. Call clear_schema_cache() if a schema
+    class is modified after its first use.
+
+    Args:
+        output_schema (Type[BaseModel]): The output schema.
+        mode (Mode): The Instructor mode.
+
+    Returns:
+        SchemaArtifacts: The artifacts.
+    """
+    by_mode = _artifacts.get(output_schema)
+    if by_mode is not None and mode in by_mode:
+        return by_mode[mode]
+
+    artifacts = SchemaArtifacts(output_schema, mode)
+    with _lock:
+        return _artifacts.setdefault(output_schema, {}).setdefault(mode, artifacts)
+
+
+def clear_schema_cache() -> None:
+    """Remove all cached schema artifacts."""
+    with _lock:
+        _artifacts.clear()
@@ -0,0 +1,110 @@
+"""Single-flight execution: concurrent callers with the same key share one in-flight call."""
+
+import asyncio
+import threading
+import weakref
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """An in-flight call and the number of callers waiting for it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls with the same key into a single call.
+
+    The first caller for a key starts the call as a task; callers arriving while it is in flight
+    wait for the same task and receive the same result (or exception). Once the call finishes, the
+    key is released and the next caller starts a new call.
+
+    Cancelling a waiting caller does not cancel the shared call while other callers still wait for
+    it. When the last waiting caller is cancelled, the shared call is cancelled as well.
+
+    A call's task belongs to the event loop it was started on, so calls are only shared between
+    callers on the same loop. One instance can be used from several threads and event loops.
+
+    Example:
+        ```python
+        group = SingleFlight()
+
+        async def fetch():
+            return await client.get(url)
+
+        # Only one request is made
+        results = await asyncio.gather(*(group.do(url, fetch) for _ in range(10)))
+        ```
+    """
+
+    def __init__(self):
+        # In-flight calls per event loop, dropped with the loop
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Call]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def in_flight(self, key: str) -> bool:
+        """
+        Check whether a call for the key is in flight on any event loop.
+
+        Args:
+            key (str): The call key.
+
+        Returns:
+            bool: True if a call for the key is running.
+        """
+        with self._lock:
+            return any(key in calls for calls in self._calls.values())
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn, or join the call already in flight for the same key.
+
+        Args:
+            key (str): The call key. Calls with the same key must be interchangeable.
+            fn (Callable[[], Awaitable[T]]): Starts the call. Only invoked if no call for the key is in flight.
+
+        Returns:
+            T: The result of the shared call.
+
+        Raises:
+            Exception: Whatever the shared call raised.
+            asyncio.CancelledError: If this caller, or the shared call, was cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            call = self._calls.get(loop, {}).get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            with self._lock:
+                # Only this loop's thread adds calls for the loop, so the key is still free
+                self._calls.setdefault(loop, {})[key] = call
+            call.task.add_done_callback(lambda _: self._release(loop, key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up on the call
+                self._release(loop, key, call)
+                call.task.cancel()
+
+    def _release(self, loop: asyncio.AbstractEventLoop, key: str, call: _Call) -> None:
+        with self._lock:
+            calls = self._calls.get(loop)
+            if calls is not None and calls.get(key) is call:
+                del calls[key]
+                if not calls:
+                    del self._calls[loop]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(calls) for calls in self._calls.values())
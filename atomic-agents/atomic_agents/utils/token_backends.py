@@ -0,0 +1,264 @@
+"""Tokenizer backends for TokenCounter."""
+
+import json
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _strip_provider(model: str) -> str:
+    """Strip a LiteLLM provider prefix, e.g. "anthropic/claude-3-opus" -> "claude-3-opus"."""
+    return model.rsplit("/", 1)[-1]
+
+
+def _iter_content_parts(content: Any):
+    """Yield (text, is_media) for each part of a message's content."""
+    if content is None:
+        return
+    if isinstance(content, str):
+        yield content, False
+        return
+    if not isinstance(content, list):
+        yield str(content), False
+        return
+    for part in content:
+        if isinstance(part, str):
+            yield part, False
+        elif isinstance(part, dict) and part.get("type") == "text":
+            yield part.get("text") or "", False
+        else:
+            yield "", True
+
+
+class BaseTokenCounterBackend(ABC):
+    """
+    Abstract base class for the tokenizers behind a TokenCounter.
+
+    A backend counts the tokens of OpenAI-format messages (and optional tools) for a model.
+    Model context limits are looked up in LiteLLM's model table unless a backend overrides
+    get_max_tokens().
+    """
+
+    @abstractmethod
+    def count_messages(self, model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        Count the tokens of a list of messages and optional tools.
+
+        Args:
+            model: The model identifier.
+            messages: List of message dictionaries with 'role' and 'content' keys.
+            tools: Optional list of tool definitions (for TOOLS mode).
+
+        Returns:
+            The number of tokens.
+        """
+        pass
+
+    def get_max_tokens(self, model: str) -> Optional[int]:
+        """
+        Get the maximum context window size for a model.
+
+        Args:
+            model: The model identifier.
+
+        Returns:
+            The maximum number of tokens, or None if unknown.
+
+        Raises:
+            ImportError: If litellm is not installed.
+            Exception: If the model is unknown to LiteLLM.
+        """
+        try:
+            from litellm import get_model_info
+        except ImportError as e:
+            raise ImportError("litellm is required for token counting. " "Install it with: pip install litellm") from e
+
+        info = get_model_info(model)
+        # Use max_input_tokens (context window) not max_tokens (output limit)
+        max_input = info.get("max_input_tokens")
+        return max_input if max_input is not None else info.get("max_tokens")
+
+
+class LiteLLMBackend(BaseTokenCounterBackend):
+    """
+    Exact counting with LiteLLM's provider-agnostic token_counter (the default backend).
+
+    LiteLLM selects the tokenizer that matches the model, which may mean downloading it on
+    first use for models without a local tokenizer.
+    """
+
+    def count_messages(self, model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
+        try:
+            from litellm import token_counter
+        except ImportError as e:
+            raise ImportError("litellm is required for token counting. " "Install it with: pip install litellm") from e
+
+        if tools:
+            return token_counter(model=model, messages=messages, tools=tools)
+        return token_counter(model=model, messages=messages)
+
+
+class TiktokenBackend(BaseTokenCounterBackend):
+    """
+    Counting with tiktoken directly, without going through LiteLLM.
+
+    Exact for the text of OpenAI models; other models are counted with a fallback encoding,
+    which is usually within a few percent. Messages are framed as in OpenAI's chat format
+    (a fixed overhead per message and per reply). Non-text content parts (images, audio,
+    files) are counted as a flat media_tokens each, and tools by their JSON serialization.
+
+    Args:
+        encoding: Encoding to use for every model. None selects it per model, falling back to default_encoding.
+        default_encoding: Encoding for models tiktoken doesn't know.
+        media_tokens: Tokens counted per non-text content part.
+    """
+
+    tokens_per_message = 3
+    tokens_per_name = 1
+    tokens_per_reply = 3
+
+    def __init__(self, encoding: Optional[str] = None, default_encoding: str = "o200k_base", media_tokens: int = 765):
+        self.encoding = encoding
+        self.default_encoding = default_encoding
+        self.media_tokens = media_tokens
+        self._encodings: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_encoding(self, model: str):
+        encoding = self._encodings.get(model)
+        if encoding is not None:
+            return encoding
+
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise ImportError("tiktoken is required for TiktokenBackend. " "Install it with: pip install tiktoken") from e
+
+        if self.encoding is not None:
+            encoding = tiktoken.get_encoding(self.encoding)
+        else:
+            try:
+                encoding = tiktoken.encoding_for_model(_strip_provider(model))
+            except KeyError:
+                encoding = tiktoken.get_encoding(self.default_encoding)
+        with self._lock:
+            return self._encodings.setdefault(model, encoding)
+
+    def count_messages(self, model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
+        encoding = self._get_encoding(model)
+
+        def encode(text: str) -> int:
+            return len(encoding.encode(text, disallowed_special=()))
+
+        tokens = self.tokens_per_reply
+        for message in messages:
+            tokens += self.tokens_per_message + encode(message.get("role") or "")
+            if message.get("name"):
+                tokens += self.tokens_per_name + encode(message["name"])
+            for text, is_media in _iter_content_parts(message.get("content")):
+                tokens += self.media_tokens if is_media else encode(text)
+        if tools:
+            tokens += encode(json.dumps(tools, ensure_ascii=False, separators=(",", ":")))
+        return tokens
+
+
+class HeuristicBackend(BaseTokenCounterBackend):
+    """
+    Offline token estimate from the UTF-8 size of the text, for latency-critical paths.
+
+    Counts in microseconds and never loads a tokenizer. The estimate divides the byte count
+    by a per-model-family bytes-per-token ratio, calibrated on English prose, and adds a
+    safety margin so it errs on the side of overcounting. Text in scripts with multi-byte
+    characters (e.g. CJK) tokenizes less efficiently than the ratios assume; raise the
+    margin or set bytes_per_token for such content.
+
+    Args:
+        bytes_per_token: Ratio to use for every model. None selects it by model family.
+        safety_margin: Fraction added on top of the estimate (0.1 = +10%).
+        tokens_per_message: Framing overhead per message.
+        media_tokens: Tokens counted per non-text content part (images, audio, files).
+
+    Example:
+        ```python
+        config = AgentConfig(
+            client=client,
+            model="claude-sonnet-4-5",
+            max_context_tokens=100_000,
+            token_counter_backend=HeuristicBackend(safety_margin=0.15),
+        )
+        ```
+    """
+
+    # Model-name prefixes (without provider) and their approximate UTF-8 bytes per token
+    FAMILY_BYTES_PER_TOKEN: Tuple[Tuple[str, float], ...] = (
+        ("gpt-4o", 4.4),
+        ("gpt-4.1", 4.4),
+        ("gpt-5", 4.4),
+        ("o1", 4.4),
+        ("o3", 4.4),
+        ("o4", 4.4),
+        ("gpt", 4.0),
+        ("claude", 3.5),
+        ("gemini", 4.0),
+        ("gemma", 4.0),
+        ("llama", 3.8),
+        ("mistral", 3.5),
+        ("mixtral", 3.5),
+        ("command", 4.0),
+        ("deepseek", 3.8),
+        ("qwen", 3.8),
+    )
+    DEFAULT_BYTES_PER_TOKEN = 3.5
+
+    def __init__(
+        self,
+        bytes_per_token: Optional[float] = None,
+        safety_margin: float = 0.1,
+        tokens_per_message: int = 4,
+        media_tokens: int = 765,
+    ):
+        if bytes_per_token is not None and bytes_per_token <= 0:
+            raise ValueError("bytes_per_token must be positive")
+        if safety_margin < 0:
+            raise ValueError("safety_margin must not be negative")
+        self.bytes_per_token = bytes_per_token
+        self.safety_margin = safety_margin
+        self.tokens_per_message = tokens_per_message
+        self.media_tokens = media_tokens
+
+    def get_bytes_per_token(self, model: str) -> float:
+        """
+        Get the bytes-per-token ratio used for a model.
+
+        Args:
+            model: The model identifier.
+
+        Returns:
+            The ratio.
+        """
+        if self.bytes_per_token is not None:
+            return self.bytes_per_token
+        name = _strip_provider(model).lower()
+        for prefix, ratio in self.FAMILY_BYTES_PER_TOKEN:
+            if name.startswith(prefix):
+                return ratio
+        return self.DEFAULT_BYTES_PER_TOKEN
+
+    def count_messages(self, model: str, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
+        text_bytes = 0
+        fixed_tokens = 0
+        for message in messages:
+            fixed_tokens += self.tokens_per_message
+            text_bytes += len((message.get("role") or "").encode("utf-8"))
+            text_bytes += len((message.get("name") or "").encode("utf-8"))
+            for text, is_media in _iter_content_parts(message.get("content")):
+                if is_media:
+                    fixed_tokens += self.media_tokens
+                else:
+                    text_bytes += len(text.encode("utf-8"))
+        if tools:
+            text_bytes += len(json.dumps(tools, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+        estimate = text_bytes / self.get_bytes_per_token(model) + fixed_tokens
+        return math.ceil(estimate * (1 + self.safety_margin))
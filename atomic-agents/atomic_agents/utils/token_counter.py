@@ -1,7 +1,17 @@
 """Token counting utilities for provider-agnostic context measurement."""
 
+import hashlib
+import itertools
+import json
 import logging
-from typing import Any, Dict, List, NamedTuple, Optional
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, TypeVar, Union
+
+from pydantic import BaseModel
+
+from .token_backends import BaseTokenCounterBackend, LiteLLMBackend
 
 logger = logging.getLogger(__name__)
 
@@ -35,16 +45,139 @@ class TokenCountResult(NamedTuple):
     utilization: Optional[float] = None
 
 
-# Module-level singleton for efficiency
+class OffloadedTokenCountResult(TokenCountResult):
+    """
+    Result of a token count that ran in a worker thread, off the event loop.
+
+    Unpacks and compares like a TokenCountResult, with the time the offloaded counting took
+    available as an extra attribute.
+
+    Attributes:
+        duration: Seconds the counting took in the worker thread.
+    """
+
+    duration: float = 0.0
+
+    @classmethod
+    def from_result(cls, result: TokenCountResult, duration: float) -> "OffloadedTokenCountResult":
+        """
+        Wrap a TokenCountResult with the duration of the count.
+
+        Args:
+            result: The token count.
+            duration: Seconds the counting took.
+
+        Returns:
+            The wrapped result.
+        """
+        offloaded = cls(*result)
+        offloaded.duration = duration
+        return offloaded
+
+
+class TokenCacheInfo(NamedTuple):
+    """
+    Hit and miss counters of one of a TokenCounter's caches.
+
+    Attributes:
+        hits: Number of lookups answered from the cache.
+        misses: Number of lookups that had to be computed.
+        size: Number of cached entries.
+        max_size: Maximum number of cached entries (0 if the cache is disabled).
+    """
+
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+
+T = TypeVar("T")
+
+
+class _LRUCache:
+    """A thread-safe bounded LRU mapping with hit and miss counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        if self.max_size <= 0:
+            return compute()
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # Computed outside the lock; failures are not cached
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def info(self) -> TokenCacheInfo:
+        with self._lock:
+            return TokenCacheInfo(hits=self.hits, misses=self.misses, size=len(self._entries), max_size=max(self.max_size, 0))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return repr(value)
+
+
+def _content_hash(payload: Any) -> str:
+    """Stable hash of a JSON-like payload, such as a message list or tool definitions."""
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Module-level singletons for efficiency
 _token_counter_instance: Optional["TokenCounter"] = None
+# Shared counters refer to their backend weakly, so an entry is dropped along with its backend
+_backend_counters: "weakref.WeakKeyDictionary[BaseTokenCounterBackend, TokenCounter]" = weakref.WeakKeyDictionary()
+_backend_counters_lock = threading.Lock()
+_cache_keys = itertools.count()
 
 
-def get_token_counter() -> "TokenCounter":
-    """Get the singleton TokenCounter instance."""
+def get_token_counter(backend: Optional[BaseTokenCounterBackend] = None) -> "TokenCounter":
+    """
+    Get the shared TokenCounter instance for a backend.
+
+    Args:
+        backend: The tokenizer backend. None returns the default LiteLLM-backed singleton.
+
+    Returns:
+        The TokenCounter shared by every caller passing the same backend instance, so its caches are shared too.
+    """
     global _token_counter_instance
-    if _token_counter_instance is None:
-        _token_counter_instance = TokenCounter()
-    return _token_counter_instance
+    if backend is None:
+        if _token_counter_instance is None:
+            _token_counter_instance = TokenCounter()
+        return _token_counter_instance
+
+    with _backend_counters_lock:
+        counter = _backend_counters.get(backend)
+        if counter is None:
+            counter = TokenCounter(backend=backend)
+            counter._backend = weakref.ref(backend)
+            _backend_counters[backend] = counter
+        return counter
 
 
 class TokenCounter:
@@ -52,8 +185,16 @@ class TokenCounter:
     Utility class for counting tokens using LiteLLM's provider-agnostic tokenizer.
 
     This class provides methods for counting tokens in messages, text, tools,
-    and retrieving model context limits. It uses LiteLLM's token_counter which
-    automatically selects the appropriate tokenizer based on the model.
+    and retrieving model context limits. By default it uses LiteLLM's token_counter
+    which automatically selects the appropriate tokenizer based on the model. Other
+    backends trade exactness for speed: TiktokenBackend tokenizes with tiktoken
+    directly, and HeuristicBackend estimates offline from the text size.
+
+    Results are kept in bounded LRU caches, so identical message lists (such as an
+    unchanged system prompt), the tools overhead and model context limits are only
+    computed once. Message lists and tools are keyed by a hash of their content, so
+    the caches stay correct when callers rebuild equal payloads. Use cache_info() to
+    inspect hit and miss counters.
 
     Works with any model supported by LiteLLM including:
     - OpenAI (gpt-4, gpt-3.5-turbo, etc.)
@@ -75,9 +216,65 @@ class TokenCounter:
 
         # Get max tokens for a model
         max_tokens = counter.get_max_tokens("gpt-4")
+
+        # Fast offline estimates
+        estimator = TokenCounter(backend=HeuristicBackend(safety_margin=0.1))
         ```
+
+    Args:
+        backend: The tokenizer backend, defaults to LiteLLMBackend.
+        cache_size: Maximum number of cached message counts. 0 disables the cache.
+        tools_cache_size: Maximum number of cached tools overhead counts. 0 disables the cache.
+        max_tokens_cache_size: Maximum number of cached model context limits. 0 disables the cache.
+
+    Attributes:
+        cache_key: Identifier of this counter that is never reused, for caching its counts
+            elsewhere (e.g. per message in ChatHistory.get_token_counts()).
     """
 
+    def __init__(
+        self,
+        backend: Optional[BaseTokenCounterBackend] = None,
+        cache_size: int = 1024,
+        tools_cache_size: int = 128,
+        max_tokens_cache_size: int = 128,
+    ):
+        self._backend: Union[BaseTokenCounterBackend, "weakref.ref[BaseTokenCounterBackend]"] = (
+            backend if backend is not None else LiteLLMBackend()
+        )
+        self.cache_key = next(_cache_keys)
+        self._messages_cache = _LRUCache(cache_size)
+        self._tools_cache = _LRUCache(tools_cache_size)
+        self._max_tokens_cache = _LRUCache(max_tokens_cache_size)
+        self._overhead_cache = _LRUCache(max_tokens_cache_size)
+
+    @property
+    def backend(self) -> BaseTokenCounterBackend:
+        """The tokenizer backend."""
+        backend = self._backend
+        return backend() if isinstance(backend, weakref.ref) else backend
+
+    def cache_info(self) -> Dict[str, TokenCacheInfo]:
+        """
+        Get the hit and miss counters of the caches.
+
+        Returns:
+            Counters keyed by cache: "messages", "tools", "max_tokens" and "overhead".
+        """
+        return {
+            "messages": self._messages_cache.info(),
+            "tools": self._tools_cache.info(),
+            "max_tokens": self._max_tokens_cache.info(),
+            "overhead": self._overhead_cache.info(),
+        }
+
+    def clear_cache(self) -> None:
+        """Empty the caches and reset their counters."""
+        self._messages_cache.clear()
+        self._tools_cache.clear()
+        self._max_tokens_cache.clear()
+        self._overhead_cache.clear()
+
     def count_messages(
         self,
         model: str,
@@ -101,14 +298,62 @@ class TokenCounter:
         if not model:
             raise ValueError("model is required for token counting")
 
-        try:
-            from litellm import token_counter
+        key = (model, _content_hash([messages, tools or None]))
+        return self._messages_cache.get_or_compute(key, lambda: self._count(model, messages, tools))
 
-            if tools:
-                return token_counter(model=model, messages=messages, tools=tools)
-            return token_counter(model=model, messages=messages)
-        except ImportError as e:
-            raise ImportError("litellm is required for token counting. " "Install it with: pip install litellm") from e
+    def count_message(self, model: str, message: Dict[str, Any]) -> int:
+        """
+        Count the tokens a single message adds to a list of messages.
+
+        count_messages() includes a fixed overhead per call (e.g. the tokens priming the reply),
+        which is subtracted here, so the counts of several messages add up to the count of the list.
+
+        Args:
+            model: The model identifier.
+            message: The message dictionary.
+
+        Returns:
+            The number of tokens the message adds.
+
+        Raises:
+            TokenCountError: If token counting fails.
+        """
+        return self.count_messages(model, [message]) - self.get_request_overhead(model)
+
+    def get_request_overhead(self, model: str) -> int:
+        """
+        Get the tokens count_messages() adds once per call, independently of the messages.
+
+        Args:
+            model: The model identifier.
+
+        Returns:
+            The number of tokens, e.g. 3 for the reply priming of OpenAI chat models.
+
+        Raises:
+            TokenCountError: If token counting fails.
+        """
+        if not model:
+            raise ValueError("model is required for token counting")
+
+        def compute() -> int:
+            # Every message of a list is counted alike, so one message counted twice reveals the fixed part
+            message = {"role": "user", "content": "."}
+            return max(0, 2 * self._count(model, [message]) - self._count(model, [message, message]))
+
+        return self._overhead_cache.get_or_compute(model, compute)
+
+    def _count(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> int:
+        """Count tokens with the backend, bypassing the cache."""
+        try:
+            return self.backend.count_messages(model, messages, tools)
+        except ImportError:
+            raise
         except Exception as e:
             raise TokenCountError(f"Failed to count tokens for model '{model}': {e}") from e
 
@@ -129,6 +374,32 @@ class TokenCounter:
         messages = [{"role": "user", "content": text}]
         return self.count_messages(model, messages)
 
+    def count_tools(self, model: str, tools: List[Dict[str, Any]]) -> int:
+        """
+        Count the tokens that tool definitions add to a request.
+
+        Args:
+            model: The model identifier.
+            tools: List of tool definitions (for TOOLS mode).
+
+        Returns:
+            The number of tokens the tools add.
+
+        Raises:
+            TokenCountError: If token counting fails.
+        """
+        if not model:
+            raise ValueError("model is required for token counting")
+
+        def compute() -> int:
+            # To count just the tools overhead, we count empty messages with tools
+            # and subtract the base overhead
+            empty_with_tools = self._count(model, [{"role": "user", "content": ""}], tools=tools)
+            empty_without_tools = self._count(model, [{"role": "user", "content": ""}])
+            return empty_with_tools - empty_without_tools
+
+        return self._tools_cache.get_or_compute((model, _content_hash(tools)), compute)
+
     def get_max_tokens(self, model: str) -> Optional[int]:
         """
         Get the maximum context window size for a model.
@@ -146,16 +417,14 @@ class TokenCounter:
         if not isinstance(model, str):
             raise TypeError(f"model must be a string, got {type(model).__name__}")
 
-        try:
-            from litellm import get_model_info
-        except ImportError as e:
-            raise ImportError("litellm is required for token counting. " "Install it with: pip install litellm") from e
+        return self._max_tokens_cache.get_or_compute(model, lambda: self._lookup_max_tokens(model))
 
+    def _lookup_max_tokens(self, model: str) -> Optional[int]:
+        """Look up the context window with the backend, bypassing the cache."""
         try:
-            info = get_model_info(model)
-            # Use max_input_tokens (context window) not max_tokens (output limit)
-            max_input = info.get("max_input_tokens")
-            return max_input if max_input is not None else info.get("max_tokens")
+            return self.backend.get_max_tokens(model)
+        except ImportError:
+            raise
         except Exception as e:
             logger.warning(f"Could not determine max tokens for model '{model}': {e}")
             return None
@@ -166,15 +435,27 @@ class TokenCounter:
         system_messages: List[Dict[str, Any]],
         history_messages: List[Dict[str, Any]],
         tools: Optional[List[Dict[str, Any]]] = None,
+        tools_tokens: Optional[int] = None,
+        system_tokens: Optional[int] = None,
+        history_tokens: Optional[int] = None,
     ) -> TokenCountResult:
         """
         Count tokens with breakdown by system prompt, history, and tools.
 
+        The history is counted message by message with count_message(), so the counts of messages
+        seen before come from the cache. The fixed per-request overhead (see get_request_overhead())
+        is counted once, with the system messages, or with the history if there are none.
+
         Args:
             model: The model identifier.
             system_messages: System prompt messages (may be empty).
             history_messages: Conversation history messages.
             tools: Optional list of tool definitions (for TOOLS mode).
+            tools_tokens: Optional precomputed token count of the tools, to skip counting them again.
+            system_tokens: Optional precomputed token count of the system messages, including the request
+                overhead, to skip counting them again.
+            history_tokens: Optional precomputed sum of the count_message() counts of the history messages,
+                to skip counting them again.
 
         Returns:
             TokenCountResult with breakdown and utilization metrics.
@@ -182,17 +463,18 @@ class TokenCounter:
         Raises:
             TokenCountError: If token counting fails.
         """
-        system_tokens = self.count_messages(model, system_messages) if system_messages else 0
-        history_tokens = self.count_messages(model, history_messages) if history_messages else 0
+        if system_tokens is None:
+            system_tokens = self.count_messages(model, system_messages) if system_messages else 0
+        if history_tokens is None:
+            history_tokens = sum(self.count_message(model, message) for message in history_messages)
+        if history_tokens and not system_tokens:
+            history_tokens += self.get_request_overhead(model)
 
         # Count tool tokens separately if provided
-        tools_tokens = 0
-        if tools:
-            # To count just the tools overhead, we count empty messages with tools
-            # and subtract the base overhead
-            empty_with_tools = self.count_messages(model, [{"role": "user", "content": ""}], tools=tools)
-            empty_without_tools = self.count_messages(model, [{"role": "user", "content": ""}])
-            tools_tokens = empty_with_tools - empty_without_tools
+        if not tools:
+            tools_tokens = 0
+        elif tools_tokens is None:
+            tools_tokens = self.count_tools(model, tools)
 
         total_tokens = system_tokens + history_tokens + tools_tokens
 
@@ -1,6 +1,11 @@
+import asyncio
+import threading
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, call, patch
 from enum import Enum
+from types import SimpleNamespace
+from typing import Optional
 from pydantic import BaseModel, Field
 from pydantic import ValidationError
 import instructor
@@ -17,8 +22,15 @@ from atomic_agents.context import (
     BaseDynamicContextProvider,
     BaseSystemPromptGenerator,
 )
-from atomic_agents.utils.token_counter import TokenCountResult
+from atomic_agents.context.system_prompt_generator import use_context_snapshot
+from atomic_agents.utils.token_counter import TokenCountResult, get_token_counter
+from atomic_agents.utils.token_backends import BaseTokenCounterBackend, HeuristicBackend
 from instructor.dsl.partial import PartialBase
+from atomic_agents.agents.atomic_agent import _partial_stream_factory
+from atomic_agents.utils.partial_json import PartialCoalescer, PartialModelStream
+from atomic_agents.utils.response_cache import LRUResponseCache
+from atomic_agents.utils.single_flight import SingleFlight
+from atomic_agents.utils.rate_limiter import RateLimiter
 
 
 @pytest.fixture
@@ -66,6 +78,8 @@ def mock_instructor_async():
 def mock_history():
     mock = Mock(spec=ChatHistory)
     mock.get_history.return_value = []
+    mock.get_token_counts.return_value = []
+    mock.get_token_count_snapshot.return_value = (0, [])
     mock.add_message = Mock()
     mock.copy = Mock(return_value=Mock(spec=ChatHistory))
     mock.initialize_turn = Mock()
@@ -567,6 +581,757 @@ async def test_model_from_chunks_async_patched():
     assert results == expected_values
 
 
+def test_model_from_chunks_patched_with_stream_factory():
+    class TestPartialModel(PartialBase):
+        @classmethod
+        def get_partial_model(cls):
+            class PartialModel(BaseModel):
+                field: Optional[str] = None
+
+            return PartialModel
+
+    chunks = ['{"field": "he', "", "l", "l", 'o"', "}"]
+
+    token = _partial_stream_factory.set(
+        lambda model, **kwargs: PartialModelStream(model, coalescer=PartialCoalescer(min_changed_chars=3), **kwargs)
+    )
+    try:
+        results = [result.field for result in TestPartialModel.model_from_chunks(chunks)]
+    finally:
+        _partial_stream_factory.reset(token)
+
+    # The final state is always flushed, even if the coalescer held it back
+    assert results == ["he", "hello"]
+
+
+class ClassifierOutputSchema(BaseIOSchema):
+    """Classifier output used by the streaming tests."""
+
+    intent: str = Field(..., description="The intent.")
+    confidence: float = Field(..., description="The confidence.")
+    explanation: Optional[str] = Field(None, description="The explanation.")
+
+
+CLASSIFIER_JSON = '{"intent": "purchase", "confidence": 0.9, "explanation": "The user wants to buy something."}'
+
+
+def _streaming_client(mock_instructor, text, chunk_size=4):
+    """Make create_partial stream `text` through the patched model_from_chunks, like Instructor does."""
+    consumed = []
+
+    def chunks():
+        for position in range(0, len(text), chunk_size):
+            consumed.append(text[position : position + chunk_size])
+            yield consumed[-1]
+
+    def create_partial(response_model, **kwargs):
+        return list(instructor.Partial[response_model].model_from_chunks(chunks()))
+
+    mock_instructor.chat.completions.create_partial.side_effect = create_partial
+    return consumed
+
+
+def _async_streaming_client(mock_instructor_async, text, chunk_size=4):
+    consumed = []
+
+    async def chunks():
+        for position in range(0, len(text), chunk_size):
+            consumed.append(text[position : position + chunk_size])
+            yield consumed[-1]
+
+    async def create_partial(response_model, **kwargs):
+        async for partial in instructor.Partial[response_model].model_from_chunks_async(chunks()):
+            yield partial
+
+    mock_instructor_async.chat.completions.create_partial = create_partial
+    return consumed
+
+
+def test_run_stream_coalesces_partials(mock_instructor, mock_history):
+    _streaming_client(mock_instructor, CLASSIFIER_JSON, chunk_size=2)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history, stream_min_changed_chars=20)
+    )
+
+    generator = agent.run_stream(BasicChatInputSchema(chat_message="Hi"))
+    partials = []
+    try:
+        while True:
+            partials.append(next(generator))
+    except StopIteration as stop:
+        final = stop.value
+
+    assert len(partials) < len(CLASSIFIER_JSON) // 2 // 5
+    assert final == ClassifierOutputSchema.model_validate_json(CLASSIFIER_JSON)
+
+
+def test_run_stream_without_streaming_options(mock_instructor, mock_history):
+    seen = []
+
+    def create_partial(**kwargs):
+        seen.append(_partial_stream_factory.get())
+        return iter([BasicChatOutputSchema(chat_message="Test output")])
+
+    mock_instructor.chat.completions.create_partial.side_effect = create_partial
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history)
+    )
+
+    list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+    assert seen == [None]
+
+
+@pytest.mark.asyncio
+async def test_run_async_stream_skips_unchanged_partials(mock_instructor_async, mock_history):
+    _async_streaming_client(mock_instructor_async, CLASSIFIER_JSON)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor_async, model="gpt-5-mini", history=mock_history, stream_skip_unchanged=True)
+    )
+
+    partials = [partial async for partial in agent.run_async_stream(BasicChatInputSchema(chat_message="Hi"))]
+
+    dumps = [partial.model_dump() for partial in partials]
+    assert all(previous != current for previous, current in zip(dumps, dumps[1:]))
+    mock_history.add_message.assert_any_call("assistant", ClassifierOutputSchema.model_validate_json(CLASSIFIER_JSON))
+    assert _partial_stream_factory.get() is None
+
+
+def test_field_callbacks_fire_on_completion(mock_instructor, mock_history):
+    _streaming_client(mock_instructor, CLASSIFIER_JSON)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history)
+    )
+    completed = []
+    agent.register_field_callback("intent", lambda value: completed.append(("intent", value)))
+    agent.register_field_callback("confidence", lambda value: completed.append(("confidence", value)))
+
+    list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+    assert completed == [("intent", "purchase"), ("confidence", 0.9)]
+
+
+def test_field_callback_errors_are_isolated(mock_instructor, mock_history):
+    _streaming_client(mock_instructor, CLASSIFIER_JSON)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history)
+    )
+    completed = []
+
+    def failing(value):
+        raise RuntimeError("boom")
+
+    agent.register_field_callback("intent", failing)
+    agent.register_field_callback("intent", completed.append)
+
+    with patch("logging.getLogger") as mock_get_logger:
+        list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+    assert completed == ["purchase"]
+    mock_get_logger.return_value.warning.assert_called_once()
+
+
+def test_unregister_field_callback(mock_instructor, mock_history):
+    _streaming_client(mock_instructor, CLASSIFIER_JSON)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history)
+    )
+    callback = Mock()
+    agent.register_field_callback("intent", callback)
+    agent.unregister_field_callback("intent", callback)
+
+    list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+    callback.assert_not_called()
+    assert agent._field_callbacks == {}
+
+
+def test_run_stream_stops_after_fields(mock_instructor, mock_history):
+    consumed = _streaming_client(mock_instructor, CLASSIFIER_JSON)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(
+            client=mock_instructor,
+            model="gpt-5-mini",
+            history=mock_history,
+            stream_stop_after_fields=["intent", "confidence"],
+        )
+    )
+
+    generator = agent.run_stream(BasicChatInputSchema(chat_message="Hi"))
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        final = stop.value
+
+    assert len("".join(consumed)) < CLASSIFIER_JSON.index("explanation") + 4
+    assert final.intent == "purchase"
+    assert final.confidence == 0.9
+    assert "explanation" not in final.model_fields_set
+    mock_history.add_message.assert_any_call("assistant", final)
+
+
+@pytest.mark.asyncio
+async def test_run_async_stream_stops_after_fields(mock_instructor_async, mock_history):
+    consumed = _async_streaming_client(mock_instructor_async, CLASSIFIER_JSON)
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(
+            client=mock_instructor_async,
+            model="gpt-5-mini",
+            history=mock_history,
+            stream_stop_after_fields=["intent"],
+        )
+    )
+
+    partials = [partial async for partial in agent.run_async_stream(BasicChatInputSchema(chat_message="Hi"))]
+
+    assert partials[-1].intent == "purchase"
+    # The required confidence field is awaited as well
+    assert len("".join(consumed)) < CLASSIFIER_JSON.index("explanation") + 4
+    final = mock_history.add_message.call_args_list[-1].args[1]
+    assert final.model_dump() == {"intent": "purchase", "confidence": 0.9, "explanation": None}
+
+
+def test_run_stream_stopped_response_round_trips_through_history(mock_instructor):
+    _streaming_client(mock_instructor, CLASSIFIER_JSON)
+    history = ChatHistory()
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=history, stream_stop_after_fields=["intent"])
+    )
+
+    list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+    final = history.history[-1].content
+    assert (final.intent, final.confidence, final.explanation) == ("purchase", 0.9, None)
+    restored = ChatHistory()
+    restored.load(history.dump())
+    assert restored.history[-1].content == final
+    assert history.copy().history[-1].content == final
+
+
+class _ClosableChunks:
+    """Provider stream stand-in for Mode.JSON that records whether it was closed."""
+
+    def __init__(self, text, chunk_size=4):
+        self.chunks = iter(
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[position : position + chunk_size]))])
+            for position in range(0, len(text), chunk_size)
+        )
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncClosableChunks(_ClosableChunks):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        self.closed = True
+
+
+def test_run_stream_closes_provider_stream_when_stopped(mock_instructor, mock_history):
+    completion = _ClosableChunks(CLASSIFIER_JSON)
+
+    def create_partial(response_model, **kwargs):
+        return list(instructor.Partial[response_model].from_streaming_response(completion, mode=instructor.Mode.JSON))
+
+    mock_instructor.chat.completions.create_partial.side_effect = create_partial
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history, stream_stop_after_fields=["intent"])
+    )
+
+    list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+    assert completion.closed
+    assert next(completion, None) is not None
+
+
+@pytest.mark.asyncio
+async def test_run_async_stream_closes_provider_stream_when_stopped(mock_instructor_async, mock_history):
+    completion = _AsyncClosableChunks(CLASSIFIER_JSON)
+
+    async def create_partial(response_model, **kwargs):
+        async for partial in instructor.Partial[response_model].from_streaming_response_async(
+            completion, mode=instructor.Mode.JSON
+        ):
+            yield partial
+
+    mock_instructor_async.chat.completions.create_partial = create_partial
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(
+            client=mock_instructor_async, model="gpt-5-mini", history=mock_history, stream_stop_after_fields=["intent"]
+        )
+    )
+
+    [partial async for partial in agent.run_async_stream(BasicChatInputSchema(chat_message="Hi"))]
+
+    assert completion.closed
+
+
+def test_stop_after_unknown_field_raises(mock_instructor, mock_history):
+    agent = AtomicAgent[BasicChatInputSchema, ClassifierOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history, stream_stop_after_fields=["nope"])
+    )
+
+    with pytest.raises(ValueError, match="unknown output fields"):
+        list(agent.run_stream(BasicChatInputSchema(chat_message="Hi")))
+
+
+def test_run_uses_response_cache(mock_instructor):
+    cache = LRUResponseCache()
+    config = AgentConfig(client=mock_instructor, model="gpt-5-mini", response_cache=cache)
+    user_input = BasicChatInputSchema(chat_message="Hello")
+
+    first_agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    first = first_agent.run(user_input)
+    second_agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    second = second_agent.run(user_input)
+
+    assert mock_instructor.chat.completions.create.call_count == 1
+    assert second == first
+    assert isinstance(second, BasicChatOutputSchema)
+    assert second_agent.history.get_history() == first_agent.history.get_history()
+    assert len(cache) == 1
+
+
+def test_run_response_cache_miss_on_different_history(mock_instructor):
+    cache = LRUResponseCache()
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", response_cache=cache)
+    )
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    # The second request includes the first turn, so it is a different request
+    assert mock_instructor.chat.completions.create.call_count == 2
+    assert len(cache) == 2
+
+
+def test_run_ignores_cached_response_that_does_not_validate(mock_instructor):
+    cache = LRUResponseCache()
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", response_cache=cache)
+    )
+    agent._prepare_messages()
+    cache.set(agent._get_request_key(), '{"unexpected": 1}')
+
+    response = agent.run()
+
+    assert response.chat_message == "Test output"
+    mock_instructor.chat.completions.create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_run_async_uses_response_cache(mock_instructor_async):
+    cache = LRUResponseCache()
+    config = AgentConfig(client=mock_instructor_async, model="gpt-5-mini", response_cache=cache)
+    user_input = BasicChatInputSchema(chat_message="Hello")
+
+    first = await AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config).run_async(user_input)
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    agent.client = Mock(spec=instructor.core.client.AsyncInstructor)
+    second = await agent.run_async(user_input)
+
+    assert second == first
+    agent.client.chat.completions.create.assert_not_called()
+    assert agent.history.get_history()[-1]["content"] == first.model_dump_json()
+
+
+@pytest.mark.asyncio
+async def test_run_async_single_flight_shares_one_call():
+    release = asyncio.Event()
+    calls = []
+
+    async def create(*args, **kwargs):
+        calls.append(kwargs["messages"])
+        await release.wait()
+        return BasicChatOutputSchema(chat_message="Shared output")
+
+    client = Mock(spec=instructor.core.client.AsyncInstructor)
+    client.chat = Mock()
+    client.chat.completions = Mock()
+    client.chat.completions.create = create
+    config = AgentConfig(client=client, model="gpt-5-mini", single_flight=SingleFlight())
+    agents = [AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config) for _ in range(3)]
+
+    tasks = [asyncio.create_task(agent.run_async(BasicChatInputSchema(chat_message="Hello"))) for agent in agents]
+    await asyncio.sleep(0)
+    release.set()
+    responses = await asyncio.gather(*tasks)
+
+    assert len(calls) == 1
+    assert all(response.chat_message == "Shared output" for response in responses)
+    # Each caller gets its own response object
+    assert len({id(response) for response in responses}) == len(responses)
+    for agent in agents:
+        assert agent.history.get_message_count() == 2
+        assert agent.history.history[-1].content.chat_message == "Shared output"
+
+
+@pytest.mark.asyncio
+async def test_run_async_single_flight_with_different_requests():
+    calls = []
+
+    async def create(*args, **kwargs):
+        calls.append(kwargs["messages"])
+        await asyncio.sleep(0)
+        return BasicChatOutputSchema(chat_message="Output")
+
+    client = Mock(spec=instructor.core.client.AsyncInstructor)
+    client.chat = Mock()
+    client.chat.completions = Mock()
+    client.chat.completions.create = create
+    config = AgentConfig(client=client, model="gpt-5-mini", single_flight=SingleFlight())
+
+    await asyncio.gather(
+        AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config).run_async(BasicChatInputSchema(chat_message="A")),
+        AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config).run_async(BasicChatInputSchema(chat_message="B")),
+    )
+
+    assert len(calls) == 2
+
+
+def test_run_acquires_rate_limiter_with_token_estimate(mock_instructor):
+    limiter = Mock(spec=RateLimiter)
+    limiter.tokens_per_minute = 100_000
+    limiter.output_tokens = 512
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", rate_limiter=limiter)
+    )
+
+    with patch.object(agent, "_count_context_tokens", return_value=TokenCountResult(120, 20, 100, 0, "gpt-5-mini")):
+        agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    limiter.acquire.assert_called_once_with(120 + 512)
+
+
+def test_rate_limiter_uses_max_tokens_reservation(mock_instructor):
+    limiter = RateLimiter(tokens_per_minute=100_000, output_tokens=512, clock=lambda: 0.0)
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(
+            client=mock_instructor,
+            model="gpt-5-mini",
+            rate_limiter=limiter,
+            model_api_parameters={"max_tokens": 64},
+        )
+    )
+
+    with patch.object(agent, "_count_context_tokens", return_value=TokenCountResult(120, 20, 100, 0, "gpt-5-mini")):
+        agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert limiter.stats().available_tokens == 100_000 - 184
+
+
+def test_rate_limiter_without_token_limit_skips_counting(mock_instructor):
+    limiter = RateLimiter(requests_per_minute=10)
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", rate_limiter=limiter)
+    )
+
+    with patch.object(agent, "_count_context_tokens") as count:
+        agent.run(BasicChatInputSchema(chat_message="Hello"))
+        list(agent.run_stream(BasicChatInputSchema(chat_message="Hello")))
+
+    count.assert_not_called()
+    assert limiter.stats().admitted_requests == 2
+
+
+def test_rate_limiter_estimate_does_not_dispatch_token_counted(mock_instructor):
+    limiter = RateLimiter(tokens_per_minute=100_000, clock=lambda: 0.0)
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", rate_limiter=limiter)
+    )
+    counted = []
+    agent.register_hook("token:counted", counted.append)
+
+    with patch.object(agent, "_count_context", return_value=TokenCountResult(120, 20, 100, 0, "gpt-5-mini")):
+        agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert counted == []
+    assert limiter.stats().available_tokens == 100_000 - 120
+
+
+@pytest.mark.asyncio
+async def test_run_async_waits_for_rate_limiter():
+    now = [0.0]
+
+    async def virtual_sleep(seconds):
+        now[0] += seconds
+
+    async def create(*args, **kwargs):
+        return BasicChatOutputSchema(chat_message=f"at {now[0]:.0f}")
+
+    client = Mock(spec=instructor.core.client.AsyncInstructor)
+    client.chat = Mock()
+    client.chat.completions = Mock()
+    client.chat.completions.create = create
+    limiter = RateLimiter(requests_per_minute=2, clock=lambda: now[0], async_sleep=virtual_sleep)
+    config = AgentConfig(client=client, model="gpt-5-mini", rate_limiter=limiter)
+
+    responses = await asyncio.gather(
+        *(
+            AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config).run_async(BasicChatInputSchema(chat_message="Hi"))
+            for _ in range(3)
+        )
+    )
+
+    assert [response.chat_message for response in responses] == ["at 0", "at 0", "at 30"]
+    assert limiter.stats().max_wait_time == pytest.approx(30.0)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_hit_bypasses_rate_limiter(mock_instructor_async):
+    limiter = RateLimiter(requests_per_minute=10)
+    config = AgentConfig(
+        client=mock_instructor_async, model="gpt-5-mini", response_cache=LRUResponseCache(), rate_limiter=limiter
+    )
+
+    for _ in range(2):
+        await AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config).run_async(
+            BasicChatInputSchema(chat_message="Hi")
+        )
+
+    assert limiter.stats().admitted_requests == 1
+
+
+def _echo_sync_client():
+    client = Mock(spec=instructor.Instructor)
+    client.chat = Mock()
+    client.chat.completions = Mock()
+
+    def create(messages, **kwargs):
+        user_message = BasicChatInputSchema.model_validate_json(messages[-1]["content"])
+        if user_message.chat_message == "fail":
+            raise RuntimeError("boom")
+        return BasicChatOutputSchema(chat_message=f"echo {user_message.chat_message} ({len(messages)} messages)")
+
+    client.chat.completions.create = create
+    return client
+
+
+def _echo_async_client(delays=None):
+    client = Mock(spec=instructor.core.client.AsyncInstructor)
+    client.chat = Mock()
+    client.chat.completions = Mock()
+    state = {"running": 0, "max_running": 0}
+
+    async def create(messages, **kwargs):
+        user_message = BasicChatInputSchema.model_validate_json(messages[-1]["content"])
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        try:
+            for _ in range((delays or {}).get(user_message.chat_message, 1)):
+                await asyncio.sleep(0)
+        finally:
+            state["running"] -= 1
+        if user_message.chat_message == "fail":
+            raise RuntimeError("boom")
+        return BasicChatOutputSchema(chat_message=f"echo {user_message.chat_message} ({len(messages)} messages)")
+
+    client.chat.completions.create = create
+    return client, state
+
+
+def test_run_batch():
+    history = ChatHistory()
+    history.add_message("user", BasicChatInputSchema(chat_message="Example"))
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=_echo_sync_client(), model="gpt-5-mini", history=history)
+    )
+    inputs = [BasicChatInputSchema(chat_message=message) for message in ["a", "fail", "c"]]
+
+    results = agent.run_batch(inputs, concurrency=2)
+
+    assert [result.index for result in results] == [0, 1, 2]
+    # Every item sees the initial history (system prompt + example) plus its own input only
+    assert results[0].output.chat_message == "echo a (3 messages)"
+    assert results[2].output.chat_message == "echo c (3 messages)"
+    assert not results[1].ok
+    assert isinstance(results[1].error, RuntimeError)
+    assert results[1].output is None
+    assert results[0].history.get_message_count() == 3
+    assert results[1].history.get_message_count() == 2
+    # The agent itself is untouched
+    assert agent.history.get_message_count() == 1
+    assert agent.current_user_input is None
+
+
+def test_run_batch_empty_and_invalid(mock_instructor):
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=mock_instructor, model="gpt-5-mini"))
+
+    assert agent.run_batch([]) == []
+    with pytest.raises(ValueError):
+        agent.run_batch([BasicChatInputSchema(chat_message="a")], concurrency=0)
+
+
+@pytest.mark.asyncio
+async def test_run_batch_async_bounded_and_ordered():
+    client, state = _echo_async_client(delays={"a": 5, "b": 1})
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=client, model="gpt-5-mini"))
+    inputs = [BasicChatInputSchema(chat_message=message) for message in ["a", "b", "fail", "d", "e"]]
+
+    results = await agent.run_batch_async(inputs, concurrency=2)
+
+    assert state["max_running"] == 2
+    assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    assert [result.output.chat_message if result.ok else None for result in results] == [
+        "echo a (2 messages)",
+        "echo b (2 messages)",
+        None,
+        "echo d (2 messages)",
+        "echo e (2 messages)",
+    ]
+    assert isinstance(results[2].error, RuntimeError)
+    assert agent.history.get_message_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_iter_batch_async_yields_in_completion_order():
+    client, _ = _echo_async_client(delays={"slow": 10})
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=client, model="gpt-5-mini"))
+    inputs = [BasicChatInputSchema(chat_message=message) for message in ["slow", "fast"]]
+
+    indexes = [result.index async for result in agent.iter_batch_async(inputs, concurrency=2)]
+
+    assert indexes == [1, 0]
+
+
+@pytest.mark.asyncio
+async def test_iter_batch_async_cancels_remaining_items_when_closed():
+    client, state = _echo_async_client(delays={"slow": 1000})
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=client, model="gpt-5-mini"))
+    inputs = [BasicChatInputSchema(chat_message=message) for message in ["fast", "slow", "slow"]]
+
+    iterator = agent.iter_batch_async(inputs, concurrency=3)
+    first = await anext(iterator)
+    await iterator.aclose()
+
+    assert first.index == 0
+    assert state["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_batch_async_raises_when_an_item_is_cancelled():
+    client, state = _echo_async_client(delays={"slow": 1000})
+    create = client.chat.completions.create
+
+    async def cancelling_create(messages, **kwargs):
+        if BasicChatInputSchema.model_validate_json(messages[-1]["content"]).chat_message == "cancelled":
+            raise asyncio.CancelledError()
+        return await create(messages, **kwargs)
+
+    client.chat.completions.create = cancelling_create
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=client, model="gpt-5-mini"))
+    inputs = [BasicChatInputSchema(chat_message=message) for message in ["slow", "cancelled", "fast"]]
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(agent.run_batch_async(inputs, concurrency=2), timeout=5)
+    assert state["running"] == 0
+
+
+def test_run_with_history():
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=_echo_sync_client(), model="gpt-5-mini")
+    )
+    session = ChatHistory()
+
+    first = agent.run_with_history(BasicChatInputSchema(chat_message="a"), session)
+    second = agent.run_with_history(BasicChatInputSchema(chat_message="b"), session)
+
+    assert first.output.chat_message == "echo a (2 messages)"
+    assert second.output.chat_message == "echo b (4 messages)"
+    assert [message.role for message in second.new_messages] == ["user", "assistant"]
+    assert second.new_messages[0].content.chat_message == "b"
+    assert second.new_messages[1].content == second.output
+    assert session.get_message_count() == 4
+    # No per-call state is left on the agent
+    assert agent.history.get_message_count() == 0
+    assert agent.current_user_input is None
+    assert not hasattr(agent, "messages")
+
+
+def test_run_with_history_reports_new_messages_when_trimming():
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(
+            client=_echo_sync_client(),
+            model="gpt-5-mini",
+            token_counter_backend=_PrimedBackend(),
+            max_context_tokens=30,
+        )
+    )
+    session = ChatHistory()
+
+    for index in range(20):
+        result = agent.run_with_history(BasicChatInputSchema(chat_message=str(index)), session)
+
+        # Every run trims the previous turn before appending its own
+        assert [message.role for message in result.new_messages] == ["user", "assistant"]
+        assert result.new_messages[0].content.chat_message == str(index)
+        assert result.new_messages[1].content == result.output
+        assert result.new_messages == session.history
+        # Let the trimmed messages be freed, as they would be in a long-running service
+        del result
+
+
+@pytest.mark.asyncio
+async def test_run_with_history_async_overlapping_sessions():
+    client, state = _echo_async_client(delays={"a": 5, "b": 1})
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=client, model="gpt-5-mini"))
+    sessions = {"a": ChatHistory(), "b": ChatHistory()}
+    sessions["b"].add_message("user", BasicChatInputSchema(chat_message="earlier"))
+
+    results = await asyncio.gather(
+        *(agent.run_with_history_async(BasicChatInputSchema(chat_message=name), history) for name, history in sessions.items())
+    )
+
+    assert state["max_running"] == 2
+    assert results[0].output.chat_message == "echo a (2 messages)"
+    assert results[1].output.chat_message == "echo b (3 messages)"
+    assert [message.content.chat_message for message in sessions["a"].history] == ["a", "echo a (2 messages)"]
+    assert [message.content.chat_message for message in sessions["b"].history] == [
+        "earlier",
+        "b",
+        "echo b (3 messages)",
+    ]
+    assert len(results[1].new_messages) == 2
+
+
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_get_context_token_count_reuses_tools_token_count(mock_get_token_counter, mock_instructor, mock_history):
+    mock_history.get_history.return_value = []
+    counter = Mock()
+    counter.count_tools.return_value = 42
+    counter.count_text.return_value = 10
+    counter.count_messages.return_value = 10
+    counter.count_context.return_value = TokenCountResult(total=50, system_prompt=8, history=0, tools=42, model="m")
+    mock_get_token_counter.return_value = counter
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history)
+    )
+
+    agent.get_context_token_count()
+    agent.get_context_token_count()
+
+    counter.count_tools.assert_called_once()
+    assert counter.count_context.call_args.kwargs["tools_tokens"] == 42
+    assert counter.count_context.call_args.kwargs["tools"] is agent._build_tools_definition()
+
+
 # Hook System Tests
 
 
@@ -599,9 +1364,8 @@ def test_hook_registration(agent):
     assert test_handler not in agent._hook_handlers["parse:error"]
 
 
-def test_hook_registration_with_instructor_client(mock_instructor):
-    """Test that hooks are registered with instructor client when available."""
-    # Add hook methods to mock instructor
+def test_hook_registration_does_not_touch_shared_client(mock_instructor):
+    """Test that hooks are kept on the agent instead of the shared instructor client."""
     mock_instructor.on = Mock()
     mock_instructor.off = Mock()
     mock_instructor.clear = Mock()
@@ -612,13 +1376,101 @@ def test_hook_registration_with_instructor_client(mock_instructor):
     def test_handler(error):
         pass
 
-    # Test registration delegates to instructor client
     agent.register_hook("parse:error", test_handler)
-    mock_instructor.on.assert_called_once_with("parse:error", test_handler)
-
-    # Test unregistration delegates to instructor client
     agent.unregister_hook("parse:error", test_handler)
-    mock_instructor.off.assert_called_once_with("parse:error", test_handler)
+    agent.clear_hooks()
+
+    mock_instructor.on.assert_not_called()
+    mock_instructor.off.assert_not_called()
+    mock_instructor.clear.assert_not_called()
+
+
+def test_instructor_hooks_are_passed_per_request(mock_instructor):
+    """Test that each agent passes hooks relaying Instructor events to its own handlers only."""
+    first = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=mock_instructor, model="gpt-5-mini"))
+    second = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=mock_instructor, model="gpt-5-mini"))
+    first_calls, second_calls = [], []
+    first.register_hook("completion:response", first_calls.append)
+    second.register_hook("completion:response", second_calls.append)
+
+    first.run(BasicChatInputSchema(chat_message="Hello"))
+    hooks = mock_instructor.chat.completions.create.call_args.kwargs["hooks"]
+    hooks.emit_completion_response("response")
+
+    assert first_calls == ["response"]
+    assert second_calls == []
+
+    # Clearing one agent's hooks leaves the other agent's in place
+    first.clear_hooks()
+    assert second._hook_handlers["completion:response"] == [second_calls.append]
+    first.run(BasicChatInputSchema(chat_message="Hello"))
+    assert "hooks" not in mock_instructor.chat.completions.create.call_args.kwargs
+
+
+def test_agent_only_hooks_are_not_passed_to_instructor(mock_instructor):
+    """Test that events Instructor doesn't emit don't add hooks to the request."""
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=mock_instructor, model="gpt-5-mini"))
+    agent.register_hook("token:counted", lambda result: None)
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert "hooks" not in mock_instructor.chat.completions.create.call_args.kwargs
+
+
+def test_background_hook_runs_in_hook_executor(mock_instructor):
+    """Test that background handlers run in the configured executor without blocking dispatch."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", hook_executor=executor)
+    )
+    release = threading.Event()
+    calls = []
+
+    def slow_handler(error):
+        release.wait(5)
+        calls.append((error, threading.current_thread().name))
+
+    agent.register_hook("parse:error", slow_handler, background=True)
+    agent._dispatch_hook("parse:error", "error")
+
+    assert calls == []
+    assert agent.wait_for_hooks(timeout=0.01) is False
+    release.set()
+    assert agent.wait_for_hooks(timeout=5) is True
+    assert calls[0][0] == "error"
+    assert calls[0][1] != threading.current_thread().name
+    executor.shutdown()
+
+
+def test_background_hook_errors_are_logged(mock_instructor):
+    """Test that exceptions of background handlers are logged instead of raised."""
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=mock_instructor, model="gpt-5-mini"))
+
+    def failing_handler(error):
+        raise ValueError("boom")
+
+    agent.register_hook("parse:error", failing_handler, background=True)
+    with patch("atomic_agents.agents.atomic_agent.logging") as mock_logging:
+        agent._dispatch_hook("parse:error", "error")
+        assert agent.wait_for_hooks(timeout=5) is True
+        mock_logging.getLogger.return_value.warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_async_hook_runs_on_event_loop(mock_instructor):
+    """Test that coroutine handlers are scheduled on the running event loop."""
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=mock_instructor, model="gpt-5-mini"))
+    calls = []
+
+    async def async_handler(error):
+        calls.append((error, asyncio.get_running_loop()))
+
+    agent.register_hook("parse:error", async_handler)
+    agent._dispatch_hook("parse:error", "error")
+    assert calls == []
+
+    await asyncio.to_thread(agent.wait_for_hooks, 5)
+    assert calls == [("error", asyncio.get_running_loop())]
 
 
 def test_multiple_hook_handlers(agent):
@@ -1068,6 +1920,9 @@ def test_get_context_token_count_multimodal_content(mock_get_token_counter, mock
 
     mock_counter_instance = Mock()
     mock_get_token_counter.return_value = mock_counter_instance
+    mock_counter_instance.count_message.return_value = 100
+    mock_counter_instance.count_text.return_value = 10
+    mock_counter_instance.count_messages.return_value = 10
     mock_counter_instance.count_context.return_value = TokenCountResult(
         total=150, system_prompt=50, history=100, tools=0, model="gpt-4-vision-preview"
     )
@@ -1094,12 +1949,11 @@ def test_get_context_token_count_multimodal_content(mock_get_token_counter, mock
     # Get token count
     agent.get_context_token_count()
 
-    # Verify count_context was called
-    assert mock_counter_instance.count_context.called
+    # Verify count_context was called with the history's per-message counts
+    assert mock_counter_instance.count_context.call_args.kwargs["history_tokens"] == 100
 
-    # Get the history_messages passed to count_context
-    call_args = mock_counter_instance.count_context.call_args
-    history_messages = call_args.kwargs["history_messages"]
+    # Get the history messages passed to count_message
+    history_messages = [call.args[1] for call in mock_counter_instance.count_message.call_args_list]
 
     # Verify multimodal content was serialized properly
     assert len(history_messages) == 1
@@ -1203,179 +2057,482 @@ def test_prepare_messages_remaps_system_to_user_for_gemini(mock_instructor, mock
     )
     agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
 
-    # Simulate legacy pattern: add_message("system", ...) directly on history
-    history.add_message("system", BasicChatInputSchema(chat_message="Tool output"))
-    agent._prepare_messages()
+    # Simulate legacy pattern: add_message("system", ...) directly on history
+    history.add_message("system", BasicChatInputSchema(chat_message="Tool output"))
+    agent._prepare_messages()
+
+    # The system prompt message (first) should keep its role,
+    # but mid-conversation "system" messages in history should be remapped to "user"
+    history_messages = [m for m in agent.messages if m.get("content") != mock_system_prompt_generator.generate_prompt()]
+    assert len(history_messages) == 1
+    assert history_messages[0]["role"] == "user"
+
+
+def test_prepare_messages_keeps_system_for_openai(mock_instructor, mock_system_prompt_generator):
+    history = ChatHistory()
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        system_prompt_generator=mock_system_prompt_generator,
+        history=history,
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+
+    history.add_message("system", BasicChatInputSchema(chat_message="Tool output"))
+    agent._prepare_messages()
+
+    history_messages = [m for m in agent.messages if m.get("content") != mock_system_prompt_generator.generate_prompt()]
+    assert len(history_messages) == 1
+    assert history_messages[0]["role"] == "system"
+
+
+# --- max_context_tokens and _trim_context tests ---
+
+
+def test_trim_context_no_op_when_max_context_tokens_unset(mock_instructor, mock_system_prompt_generator):
+    """When max_context_tokens is None, _trim_context returns without any action."""
+    history = ChatHistory()
+    history.add_message("user", BasicChatInputSchema(chat_message="Hello"))
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        # max_context_tokens not set — default None
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+
+    # Should not raise, should not modify history
+    agent._trim_context()
+    assert history.get_message_count() == 1
+
+
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_trim_context_no_op_when_within_limit(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
+    """When context is within max_context_tokens, history is not modified."""
+    history = ChatHistory()
+    history.add_message("user", BasicChatInputSchema(chat_message="Hello"))
+
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=100, system_prompt=30, history=70, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.01
+    )
+    mock_counter_instance.count_message.return_value = 70
+
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        max_context_tokens=200,  # well above current 100
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    agent._trim_context()
+
+    # History untouched
+    assert history.get_message_count() == 1
+    # delete_turn_id never called
+    mock_counter_instance.count_context.assert_called_once()
+
+
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_trim_context_trims_oldest_turn_when_over_limit(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
+    """When context exceeds max_context_tokens, oldest turn is removed."""
+    history = ChatHistory()
+
+    # Turn 1 (user message)
+    history.initialize_turn()
+    history.add_message("user", BasicChatInputSchema(chat_message="First request"))
+
+    # Turn 2 (user message)
+    history.initialize_turn()
+    history.add_message("user", BasicChatInputSchema(chat_message="Second request"))
+
+    turn1_id = history.history[0].turn_id
+
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    # Full context is over limit; per-message counts: removing turn 1 brings it within limit
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=500, system_prompt=100, history=400, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.06
+    )
+    # Turn 1 adds 350 tokens, turn 2 adds 50
+    mock_counter_instance.count_message.side_effect = [350, 50]
+
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        max_context_tokens=200,
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    agent._trim_context()
+
+    # Turn 1 should be gone; Turn 2 remains
+    assert history.get_message_count() == 1
+    remaining = history.history[0]
+    assert remaining.content.chat_message == "Second request"
+    assert remaining.turn_id != turn1_id
+
+
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_trim_context_raises_when_single_turn_exceeds_limit(
+    mock_get_token_counter, mock_instructor, mock_system_prompt_generator
+):
+    """When even one turn exceeds max_context_tokens, ValueError is raised."""
+    history = ChatHistory()
+    history.initialize_turn()
+    history.add_message("user", BasicChatInputSchema(chat_message="Very long message that exceeds the limit"))
+
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    # Even after trimming all turns, still over limit
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=500, system_prompt=400, history=100, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.06
+    )
+    mock_counter_instance.count_message.return_value = 100
+
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        max_context_tokens=100,  # artificially low
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+
+    with pytest.raises(ValueError, match="max_context_tokens.*smaller than the minimum"):
+        agent._trim_context()
+
+
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_trim_context_called_before_user_message_in_run(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
+    """_trim_context runs before the new user message is added to history."""
+    history = ChatHistory()
+
+    # Existing turn in history
+    history.initialize_turn()
+    history.add_message("user", BasicChatInputSchema(chat_message="Old message"))
+
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=500, system_prompt=100, history=400, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.06
+    )
+    mock_counter_instance.count_message.return_value = 400
+
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        max_context_tokens=200,
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+
+    # Mock chat completion
+    mock_instructor.chat.completions.create.return_value = BasicChatOutputSchema(chat_message="Response")
+
+    agent.run(BasicChatInputSchema(chat_message="New message"))
 
-    # The system prompt message (first) should keep its role,
-    # but mid-conversation "system" messages in history should be remapped to "user"
-    history_messages = [m for m in agent.messages if m.get("content") != mock_system_prompt_generator.generate_prompt()]
-    assert len(history_messages) == 1
-    assert history_messages[0]["role"] == "user"
+    # Old turn was trimmed BEFORE new message was added
+    assert history.get_message_count() == 2  # assistant response + new user message
+    assert history.history[0].content.chat_message == "New message"  # new message is first
 
 
-def test_prepare_messages_keeps_system_for_openai(mock_instructor, mock_system_prompt_generator):
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_trim_context_counts_history_once(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
+    """Trimming several turns tokenizes each message once and reuses the cached counts to select the turns."""
     history = ChatHistory()
+    for i in range(4):
+        history.initialize_turn()
+        history.add_message("user", BasicChatInputSchema(chat_message=f"Request {i}"))
+        history.add_message("assistant", BasicChatOutputSchema(chat_message=f"Response {i}"))
+
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=900, system_prompt=100, history=800, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.1
+    )
+    mock_counter_instance.count_message.return_value = 100
+
     config = AgentConfig(
         client=mock_instructor,
         model="gpt-5-mini",
-        system_prompt_generator=mock_system_prompt_generator,
         history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        max_context_tokens=500,
     )
     agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    agent._trim_context()
 
-    history.add_message("system", BasicChatInputSchema(chat_message="Tool output"))
-    agent._prepare_messages()
+    # 900 - 2 turns * 200 = 500, so the two oldest turns are removed
+    assert history.get_message_count() == 4
+    assert history.history[0].content.chat_message == "Request 2"
+    mock_counter_instance.count_context.assert_called_once()
+    # Every message is tokenized once, when the context is counted; the remaining history is not recounted
+    assert mock_counter_instance.count_message.call_count == 8
+    mock_counter_instance.count_messages.assert_not_called()
 
-    history_messages = [m for m in agent.messages if m.get("content") != mock_system_prompt_generator.generate_prompt()]
-    assert len(history_messages) == 1
-    assert history_messages[0]["role"] == "system"
+    # The next count only tokenizes the message added since
+    history.add_message("user", BasicChatInputSchema(chat_message="Request 4"))
+    agent.get_context_token_count()
+    assert mock_counter_instance.count_message.call_count == 9
 
 
-# --- max_context_tokens and _trim_context tests ---
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+def test_trim_context_trims_down_to_trim_target_tokens(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
+    """Exceeding max_context_tokens trims down to the lower trim_target_tokens watermark."""
+    history = ChatHistory()
+    for i in range(4):
+        history.initialize_turn()
+        history.add_message("user", BasicChatInputSchema(chat_message=f"Request {i}"))
+        history.add_message("assistant", BasicChatOutputSchema(chat_message=f"Response {i}"))
 
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=900, system_prompt=100, history=800, tools=0, model="gpt-5-mini"
+    )
+    mock_counter_instance.count_message.return_value = 100
 
-def test_trim_context_no_op_when_max_context_tokens_unset(mock_instructor, mock_system_prompt_generator):
-    """When max_context_tokens is None, _trim_context returns without any action."""
-    history = ChatHistory()
-    history.add_message("user", BasicChatInputSchema(chat_message="Hello"))
     config = AgentConfig(
         client=mock_instructor,
         model="gpt-5-mini",
         history=history,
         system_prompt_generator=mock_system_prompt_generator,
-        # max_context_tokens not set — default None
+        max_context_tokens=800,
+        trim_target_tokens=500,
     )
     agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
-
-    # Should not raise, should not modify history
     agent._trim_context()
-    assert history.get_message_count() == 1
+
+    # Removing one turn would fit max_context_tokens, but trimming continues down to 500
+    assert history.get_message_count() == 4
+    assert history.history[0].content.chat_message == "Request 2"
 
 
 @patch("atomic_agents.agents.atomic_agent.get_token_counter")
-def test_trim_context_no_op_when_within_limit(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
-    """When context is within max_context_tokens, history is not modified."""
+def test_trim_context_keeps_history_between_watermarks(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
+    """A context above trim_target_tokens but within max_context_tokens is not trimmed."""
     history = ChatHistory()
+    history.initialize_turn()
     history.add_message("user", BasicChatInputSchema(chat_message="Hello"))
 
     mock_counter_instance = Mock()
     mock_get_token_counter.return_value = mock_counter_instance
     mock_counter_instance.count_context.return_value = TokenCountResult(
-        total=100, system_prompt=30, history=70, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.01
+        total=700, system_prompt=100, history=600, tools=0, model="gpt-5-mini"
     )
+    mock_counter_instance.count_message.return_value = 600
 
     config = AgentConfig(
         client=mock_instructor,
         model="gpt-5-mini",
         history=history,
         system_prompt_generator=mock_system_prompt_generator,
-        max_context_tokens=200,  # well above current 100
+        max_context_tokens=800,
+        trim_target_tokens=500,
     )
     agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
     agent._trim_context()
 
-    # History untouched
     assert history.get_message_count() == 1
-    # delete_turn_id never called
-    mock_counter_instance.count_context.assert_called_once()
+    mock_counter_instance.count_message.assert_called_once()
+    mock_counter_instance.count_messages.assert_not_called()
 
 
-@patch("atomic_agents.agents.atomic_agent.get_token_counter")
-def test_trim_context_trims_oldest_turn_when_over_limit(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
-    """When context exceeds max_context_tokens, oldest turn is removed."""
+def test_trim_target_tokens_validation(mock_instructor):
+    """trim_target_tokens requires max_context_tokens and must not exceed it."""
+    with pytest.raises(ValidationError, match="requires max_context_tokens"):
+        AgentConfig(client=mock_instructor, trim_target_tokens=500)
+    with pytest.raises(ValidationError, match="must not exceed max_context_tokens"):
+        AgentConfig(client=mock_instructor, max_context_tokens=500, trim_target_tokens=800)
+
+
+@patch("litellm.token_counter")
+def test_trim_context_with_heuristic_backend(mock_litellm_token_counter, mock_instructor, mock_system_prompt_generator):
+    """A configured token counter backend is used for counting and trimming instead of LiteLLM."""
     history = ChatHistory()
+    for i in range(4):
+        history.initialize_turn()
+        history.add_message("user", BasicChatInputSchema(chat_message=f"Request {i} " + "x" * 400))
+        history.add_message("assistant", BasicChatOutputSchema(chat_message=f"Response {i}"))
 
-    # Turn 1 (user message)
-    history.initialize_turn()
-    history.add_message("user", BasicChatInputSchema(chat_message="First request"))
+    backend = HeuristicBackend()
+    config = AgentConfig(
+        client=mock_instructor,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=mock_system_prompt_generator,
+        token_counter_backend=backend,
+    )
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    full = agent.get_context_token_count().total
+    agent.max_context_tokens = full - 1
+    agent._trim_context()
 
-    # Turn 2 (user message)
-    history.initialize_turn()
-    history.add_message("user", BasicChatInputSchema(chat_message="Second request"))
+    assert history.get_message_count() == 6
+    assert agent.get_context_token_count().total < full
+    mock_litellm_token_counter.assert_not_called()
 
-    turn1_id = history.history[0].turn_id
 
-    mock_counter_instance = Mock()
-    mock_get_token_counter.return_value = mock_counter_instance
-    # First call: over limit; Second call: within limit after one turn removed
-    mock_counter_instance.count_context.side_effect = [
-        TokenCountResult(
-            total=500, system_prompt=100, history=400, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.06
-        ),
-        TokenCountResult(
-            total=150, system_prompt=100, history=50, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.018
-        ),
-    ]
+class _PrimedBackend(BaseTokenCounterBackend):
+    """Counts 10 tokens per message plus 3 priming tokens per call, like LiteLLM's OpenAI counting."""
+
+    def count_messages(self, model, messages, tools=None):
+        return 3 + 10 * len(messages)
+
+    def get_max_tokens(self, model):
+        return 100_000
+
+
+def test_trim_context_brings_real_count_under_limit(mock_instructor, mock_system_prompt_generator):
+    """Per-call priming tokens aren't subtracted once per message, so trimming doesn't stop too early."""
+    history = ChatHistory()
+    for i in range(4):
+        history.initialize_turn()
+        history.add_message("user", BasicChatInputSchema(chat_message=f"Request {i}"))
+        history.add_message("assistant", BasicChatOutputSchema(chat_message=f"Response {i}"))
 
     config = AgentConfig(
         client=mock_instructor,
         model="gpt-5-mini",
         history=history,
         system_prompt_generator=mock_system_prompt_generator,
-        max_context_tokens=200,
+        token_counter_backend=_PrimedBackend(),
     )
     agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    full = agent.get_context_token_count().total
+    # One turn is 20 tokens; counting each message with its priming would make it look like 26
+    agent.max_context_tokens = full - 25
     agent._trim_context()
 
-    # Turn 1 should be gone; Turn 2 remains
-    assert history.get_message_count() == 1
-    remaining = history.history[0]
-    assert remaining.content.chat_message == "Second request"
-    assert remaining.turn_id != turn1_id
+    assert agent.get_context_token_count().total <= agent.max_context_tokens
+    assert history.get_message_count() == 4
 
 
+@pytest.mark.asyncio
 @patch("atomic_agents.agents.atomic_agent.get_token_counter")
-def test_trim_context_raises_when_single_turn_exceeds_limit(
-    mock_get_token_counter, mock_instructor, mock_system_prompt_generator
+async def test_run_async_counts_tokens_in_executor(
+    mock_get_token_counter, mock_instructor_async, mock_system_prompt_generator
 ):
-    """When even one turn exceeds max_context_tokens, ValueError is raised."""
+    """run_async trims the context with token counting offloaded to token_counter_executor."""
     history = ChatHistory()
     history.initialize_turn()
-    history.add_message("user", BasicChatInputSchema(chat_message="Very long message that exceeds the limit"))
+    history.add_message("user", BasicChatInputSchema(chat_message="Old message"))
+
+    loop_thread = threading.get_ident()
+    counting_threads = []
+
+    def count_context(**kwargs):
+        counting_threads.append(threading.get_ident())
+        return TokenCountResult(total=500, system_prompt=100, history=400, tools=0, model="gpt-5-mini")
+
+    def count_message(model, message):
+        counting_threads.append(threading.get_ident())
+        return 400
 
     mock_counter_instance = Mock()
     mock_get_token_counter.return_value = mock_counter_instance
-    # Even after trimming all turns, still over limit
-    mock_counter_instance.count_context.return_value = TokenCountResult(
-        total=500, system_prompt=400, history=100, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.06
-    )
+    mock_counter_instance.count_context.side_effect = count_context
+    mock_counter_instance.count_message.side_effect = count_message
 
-    config = AgentConfig(
-        client=mock_instructor,
-        model="gpt-5-mini",
-        history=history,
-        system_prompt_generator=mock_system_prompt_generator,
-        max_context_tokens=100,  # artificially low
-    )
-    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        config = AgentConfig(
+            client=mock_instructor_async,
+            model="gpt-5-mini",
+            history=history,
+            system_prompt_generator=mock_system_prompt_generator,
+            max_context_tokens=200,
+            token_counter_executor=executor,
+        )
+        agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+        counted = []
+        agent.register_hook("token:counted", counted.append)
 
-    with pytest.raises(ValueError, match="max_context_tokens.*smaller than the minimum"):
-        agent._trim_context()
+        await agent.run_async(BasicChatInputSchema(chat_message="New message"))
 
+    assert counting_threads and loop_thread not in counting_threads
+    assert history.history[0].content.chat_message == "New message"
+    assert len(counted) == 1
+    assert counted[0].total == 500
+    assert counted[0].duration is not None and counted[0].duration >= 0
 
+
+@pytest.mark.asyncio
 @patch("atomic_agents.agents.atomic_agent.get_token_counter")
-def test_trim_context_called_before_user_message_in_run(mock_get_token_counter, mock_instructor, mock_system_prompt_generator):
-    """_trim_context runs before the new user message is added to history."""
+async def test_count_tokens_async_reads_history_on_loop(
+    mock_get_token_counter, mock_instructor_async, mock_system_prompt_generator
+):
+    """The history is read and its count cache written on the event loop; the worker only tokenizes."""
     history = ChatHistory()
+    history.add_message("user", BasicChatInputSchema(chat_message="Hello"))
+    history.add_message("assistant", BasicChatOutputSchema(chat_message="Hi"))
 
-    # Existing turn in history
+    loop_thread = threading.get_ident()
+    history_threads = []
+    for name in ("get_history", "get_token_counts", "get_token_count_snapshot", "set_token_count"):
+        method = getattr(history, name)
+
+        def spy(*args, _method=method, **kwargs):
+            history_threads.append(threading.get_ident())
+            return _method(*args, **kwargs)
+
+        setattr(history, name, spy)
+
+    counting_threads = []
+
+    def count_message(model, message):
+        counting_threads.append(threading.get_ident())
+        return 10
+
+    mock_counter_instance = Mock()
+    mock_get_token_counter.return_value = mock_counter_instance
+    mock_counter_instance.count_message.side_effect = count_message
+    mock_counter_instance.count_context.side_effect = lambda **kwargs: TokenCountResult(
+        total=kwargs["history_tokens"], system_prompt=0, history=kwargs["history_tokens"], tools=0, model="gpt-5-mini"
+    )
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        config = AgentConfig(
+            client=mock_instructor_async,
+            model="gpt-5-mini",
+            history=history,
+            system_prompt_generator=mock_system_prompt_generator,
+            token_counter_executor=executor,
+        )
+        agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+
+        first = await agent.get_context_token_count_async()
+        second = await agent.get_context_token_count_async()
+
+    assert first.total == second.total == 20
+    assert len(counting_threads) == 2 and loop_thread not in counting_threads
+    assert history_threads and set(history_threads) == {loop_thread}
+
+
+@pytest.mark.asyncio
+@patch("atomic_agents.agents.atomic_agent.get_token_counter")
+async def test_trim_context_async_raises_when_single_turn_exceeds_limit(
+    mock_get_token_counter, mock_instructor_async, mock_system_prompt_generator
+):
+    """The async trim raises like the sync one when the remaining context still exceeds the limit."""
+    history = ChatHistory()
     history.initialize_turn()
-    history.add_message("user", BasicChatInputSchema(chat_message="Old message"))
+    history.add_message("user", BasicChatInputSchema(chat_message="Only turn"))
 
     mock_counter_instance = Mock()
     mock_get_token_counter.return_value = mock_counter_instance
-    mock_counter_instance.count_context.side_effect = [
-        TokenCountResult(
-            total=500, system_prompt=100, history=400, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.06
-        ),
-        TokenCountResult(
-            total=50, system_prompt=100, history=0, tools=0, model="gpt-5-mini", max_tokens=8192, utilization=0.006
-        ),
-    ]
+    mock_counter_instance.count_context.return_value = TokenCountResult(
+        total=500, system_prompt=400, history=100, tools=0, model="gpt-5-mini"
+    )
+    mock_counter_instance.count_message.return_value = 100
 
     config = AgentConfig(
-        client=mock_instructor,
+        client=mock_instructor_async,
         model="gpt-5-mini",
         history=history,
         system_prompt_generator=mock_system_prompt_generator,
@@ -1383,14 +2540,8 @@ def test_trim_context_called_before_user_message_in_run(mock_get_token_counter,
     )
     agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
 
-    # Mock chat completion
-    mock_instructor.chat.completions.create.return_value = BasicChatOutputSchema(chat_message="Response")
-
-    agent.run(BasicChatInputSchema(chat_message="New message"))
-
-    # Old turn was trimmed BEFORE new message was added
-    assert history.get_message_count() == 2  # assistant response + new user message
-    assert history.history[0].content.chat_message == "New message"  # new message is first
+    with pytest.raises(ValueError, match="max_context_tokens"):
+        await agent._trim_context_async()
 
 
 # --- Test BaseSystemPromptGenerator integration ---
@@ -1413,3 +2564,228 @@ def test_custom_system_prompt_generator_reaches_agent(
     assert agent.system_prompt_generator == mock_custom_system_prompt_generator
     assert agent._build_system_messages() == [{"content": "Custom Prompt", "role": "system"}]
     assert agent.system_prompt_generator.context_providers == {"test_provider": mock_context_provider}
+
+
+# --- Prompt cache layout tests ---
+
+
+def _prompt_cache_agent(client, mock_context_provider, **kwargs):
+    history = ChatHistory()
+    history.initialize_turn()
+    history.add_message("user", BasicChatInputSchema(chat_message="Hello"))
+    config = AgentConfig(
+        client=client,
+        model="gpt-5-mini",
+        history=history,
+        system_prompt_generator=SystemPromptGenerator(
+            background=["Static background"], context_providers={"mock": mock_context_provider}
+        ),
+        prompt_cache_layout=True,
+        **kwargs,
+    )
+    return AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](config)
+
+
+def test_prompt_cache_layout_moves_dynamic_context_after_history(mock_instructor, mock_context_provider):
+    """The system message holds the static prompt; the context provider output follows the history."""
+    agent = _prompt_cache_agent(mock_instructor, mock_context_provider)
+    agent._prepare_messages()
+
+    generator = agent.system_prompt_generator
+    assert agent.messages[0] == {"role": "system", "content": generator.generate_static_prompt()}
+    assert "Mock Provider" not in agent.messages[0]["content"]
+    assert agent.messages[1]["role"] == "user"
+    assert agent.messages[2] == {"role": "system", "content": generator.generate_dynamic_prompt()}
+    # Without markers (OpenAI auto-detection), contents stay plain strings
+    assert all(isinstance(message["content"], str) for message in agent.messages)
+
+
+def test_prompt_cache_layout_adds_cache_markers(mock_instructor, mock_context_provider):
+    """With markers, the system message and the last history message end in cache-control breakpoints."""
+    agent = _prompt_cache_agent(mock_instructor, mock_context_provider, prompt_cache_markers=True)
+    agent._prepare_messages()
+
+    assert agent.messages[0]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert agent.messages[1]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert agent.messages[2]["role"] == "user"
+    assert isinstance(agent.messages[2]["content"], str)
+    # The history's cached serialization is not modified
+    assert isinstance(agent.history.get_history()[0]["content"], str)
+
+
+def test_prompt_cache_markers_keep_dynamic_context_out_of_anthropic_system(mock_instructor, mock_context_provider):
+    """Instructor moves system messages into Anthropic's system parameter, ahead of the history breakpoint."""
+    from instructor.processing.response import handle_response_model
+
+    agent = _prompt_cache_agent(mock_instructor, mock_context_provider, prompt_cache_markers=True)
+    agent._prepare_messages()
+
+    _, kwargs = handle_response_model(BasicChatOutputSchema, mode=instructor.Mode.ANTHROPIC_TOOLS, messages=agent.messages)
+
+    dynamic_prompt = agent.system_prompt_generator.generate_dynamic_prompt()
+    assert all(dynamic_prompt not in block["text"] for block in kwargs["system"])
+    assert kwargs["system"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert kwargs["messages"][-1] == {"role": "user", "content": dynamic_prompt}
+    assert kwargs["messages"][-2]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+
+
+def test_prompt_cache_layout_counts_dynamic_context(mock_instructor, mock_context_provider):
+    """Token counting includes the dynamic context message."""
+    agent = _prompt_cache_agent(mock_instructor, mock_context_provider)
+    system_messages, _ = agent._build_token_count_request()
+
+    assert [message["role"] for message in system_messages] == ["system", "system"]
+    assert system_messages[1]["content"] == agent.system_prompt_generator.generate_dynamic_prompt()
+
+
+def test_run_dispatches_prompt_cache_usage(mock_instructor, mock_history):
+    """Prompt caching statistics of the response are reported through the prompt_cache:usage hook."""
+    from types import SimpleNamespace
+    from atomic_agents.utils.prompt_cache import PromptCacheUsage
+
+    response = BasicChatOutputSchema(chat_message="Cached")
+    response._raw_response = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=2000, prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+    )
+    mock_instructor.chat.completions.create.return_value = response
+
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", history=mock_history)
+    )
+    usages = []
+    agent.register_hook("prompt_cache:usage", usages.append)
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert usages == [PromptCacheUsage(2000, 1536, 0)]
+
+
+# --- Context provider snapshot tests ---
+
+
+class _CountingProvider(BaseDynamicContextProvider):
+    def __init__(self):
+        super().__init__("Counting")
+        self.calls = 0
+
+    def get_info(self) -> str:
+        self.calls += 1
+        return f"call {self.calls}"
+
+
+def test_run_queries_context_providers_once(mock_instructor):
+    """The prompt is built several times per run, but each provider is queried once."""
+    provider = _CountingProvider()
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(
+            client=mock_instructor,
+            model="gpt-5-mini",
+            system_prompt_generator=SystemPromptGenerator(context_providers={"counting": provider}),
+        )
+    )
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert provider.calls == 1
+    assert "call 1" in agent.messages[0]["content"]
+
+
+@pytest.mark.asyncio
+async def test_token_counter_executor_sees_context_snapshot(mock_instructor_async):
+    """Work offloaded to token_counter_executor reads the provider snapshot of the current run."""
+    provider = _CountingProvider()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+            AgentConfig(client=mock_instructor_async, model="gpt-5-mini", token_counter_executor=executor)
+        )
+
+        with use_context_snapshot({id(provider): "snapshot"}):
+            info = await agent._run_in_token_counter_executor(provider.get_cached_info)
+
+    assert info == "snapshot"
+    assert provider.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_run_async_queries_context_providers_once(mock_instructor_async):
+    """run_async queries each provider once, through get_info_async."""
+    provider = _CountingProvider()
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(
+            client=mock_instructor_async,
+            model="gpt-5-mini",
+            system_prompt_generator=SystemPromptGenerator(context_providers={"counting": provider}),
+            rate_limiter=RateLimiter(requests_per_minute=100),
+        )
+    )
+
+    await agent.run_async(BasicChatInputSchema(chat_message="Hello"))
+
+    assert provider.calls == 1
+    assert provider.stats().calls == 1
+
+
+def test_get_context_token_count_reuses_static_prompt_tokens(mock_instructor):
+    """Only the dynamic part of the system prompt is tokenized once the static part is counted."""
+    provider = _CountingProvider()
+    generator = SystemPromptGenerator(background=["Static background"], context_providers={"counting": provider})
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(
+            client=mock_instructor,
+            model="gpt-5-mini",
+            system_prompt_generator=generator,
+            token_counter_backend=HeuristicBackend(),
+        )
+    )
+
+    with patch.object(SystemPromptGenerator, "count_static_prompt_tokens", autospec=True, return_value=1000) as count_static:
+        first = agent.get_context_token_count()
+        second = agent.get_context_token_count()
+
+    # The provider output changed between the counts, but the static part was not re-tokenized
+    assert provider.calls == 2
+    assert count_static.call_count == 2
+    assert first.system_prompt > 1000
+    assert second.system_prompt > 1000
+
+
+class _CharBackend(BaseTokenCounterBackend):
+    """Counts one token per character of content, 4 framing tokens per message and 3 priming tokens per call."""
+
+    def count_messages(self, model, messages, tools=None):
+        return 3 + sum(4 + len(message["content"]) for message in messages) + 50 * len(tools or [])
+
+    def get_max_tokens(self, model):
+        return 100_000
+
+
+@pytest.mark.parametrize("mode", [instructor.Mode.TOOLS, instructor.Mode.JSON])
+def test_count_system_tokens_counts_framing_once(mock_instructor, mode):
+    """The parts of the system message are counted as text, with the message framing and overhead counted once."""
+    provider = _CountingProvider()
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(
+            client=mock_instructor,
+            model="gpt-5-mini",
+            mode=mode,
+            system_prompt_generator=SystemPromptGenerator(context_providers={"counting": provider}),
+            token_counter_backend=_CharBackend(),
+        )
+    )
+    counter = get_token_counter(agent.token_counter_backend)
+    system_messages, schema_artifacts = agent._build_token_count_request()
+
+    exact = counter.count_messages(agent.model, system_messages)
+    # Only the whitespace between the parts is left out
+    assert exact - 4 <= agent._count_system_tokens(counter, system_messages, schema_artifacts) <= exact
+
+
+def test_count_system_tokens_falls_back_for_custom_prompts(mock_instructor, mock_custom_system_prompt_generator):
+    """Generators whose prompt doesn't start with the static prompt are counted whole."""
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=mock_instructor, model="gpt-5-mini", system_prompt_generator=mock_custom_system_prompt_generator)
+    )
+    agent.system_prompt_generator.generate_static_prompt = lambda: "Something else"
+    system_messages, schema_artifacts = agent._build_token_count_request()
+
+    assert agent._count_system_tokens(Mock(), system_messages, schema_artifacts) is None
@@ -0,0 +1,117 @@
+from enum import Enum
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+import instructor
+import pytest
+from pydantic import BaseModel, Field
+
+from atomic_agents import BaseIOSchema
+from atomic_agents.base.base_io_schema import _multimodal_fields, get_multimodal_fields
+
+
+class Color(str, Enum):
+    RED = "red"
+
+
+class TextSchema(BaseIOSchema):
+    """Text-only schema"""
+
+    text: str = Field(..., description="A text")
+    count: Optional[int] = Field(None, description="A count")
+    color: Color = Field(Color.RED, description="A color")
+    kind: Literal["a", "b"] = Field("a", description="A kind")
+    pairs: Dict[str, Tuple[int, ...]] = Field(default_factory=dict, description="Some pairs")
+
+
+class ImageSchema(BaseIOSchema):
+    """Schema with images"""
+
+    text: str = Field(..., description="A text")
+    images: List[instructor.Image] = Field(..., description="The images")
+    audio: Optional[instructor.processing.multimodal.Audio] = Field(None, description="An audio")
+
+
+class PlainModel(BaseModel):
+    pdf: instructor.processing.multimodal.PDF
+
+
+class NestedSchema(BaseIOSchema):
+    """Schema with multimodal content nested in other models"""
+
+    text: TextSchema = Field(..., description="Text content")
+    nested: Dict[str, List[ImageSchema]] = Field(default_factory=dict, description="Nested images")
+    plain: Optional[PlainModel] = Field(None, description="A plain model")
+
+
+class RecursiveSchema(BaseIOSchema):
+    """Schema referencing itself"""
+
+    text: str = Field(..., description="A text")
+    children: List["RecursiveSchema"] = Field(default_factory=list, description="Child nodes")
+
+
+class RecursiveImageSchema(BaseIOSchema):
+    """Schema referencing itself, with an image"""
+
+    image: Optional[instructor.Image] = Field(None, description="An image")
+    children: List["RecursiveImageSchema"] = Field(default_factory=list, description="Child nodes")
+
+
+class AnySchema(BaseIOSchema):
+    """Schema with untyped values"""
+
+    text: str = Field(..., description="A text")
+    values: Dict[str, Any] = Field(..., description="Any values")
+    items: list = Field(default_factory=list, description="Untyped items")
+
+
+class BaseTypedSchema(BaseIOSchema):
+    """Schema with fields typed with base classes"""
+
+    text: str = Field(..., description="A text")
+    content: BaseIOSchema = Field(..., description="Any schema")
+    value: object = Field(None, description="Any value")
+
+
+@pytest.mark.parametrize(
+    "model_class, expected",
+    [
+        (TextSchema, ()),
+        (RecursiveSchema, ("children",)),
+        (ImageSchema, ("images", "audio")),
+        (NestedSchema, ("text", "nested", "plain")),
+        (RecursiveImageSchema, ("image", "children")),
+        (AnySchema, ("values", "items")),
+        (BaseTypedSchema, ("content", "value")),
+        (PlainModel, ("pdf",)),
+    ],
+)
+def test_get_multimodal_fields(model_class, expected):
+    assert get_multimodal_fields(model_class) == expected
+
+
+def test_multimodal_fields_are_computed_at_class_creation():
+    class CreatedSchema(BaseIOSchema):
+        """Schema created in a test"""
+
+        image: instructor.Image = Field(..., description="An image")
+
+    assert _multimodal_fields[CreatedSchema] == ("image",)
+
+
+def test_forward_references_are_resolved_on_first_use():
+    class EarlySchema(BaseIOSchema):
+        """Schema referencing a schema defined later"""
+
+        later: Optional["LaterSchema"] = Field(None, description="A later schema")
+
+    class LaterSchema(BaseIOSchema):
+        """Schema defined later"""
+
+        image: instructor.Image = Field(..., description="An image")
+
+    assert EarlySchema not in _multimodal_fields
+    EarlySchema.model_rebuild(_types_namespace={"LaterSchema": LaterSchema})
+
+    assert get_multimodal_fields(EarlySchema) == ("later",)
+    assert _multimodal_fields[EarlySchema] == ("later",)
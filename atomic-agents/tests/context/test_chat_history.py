@@ -1,14 +1,20 @@
+import importlib.util
+import sys
+import types
 from enum import Enum
 
 import pytest
 import json
 from typing import List, Dict, Union
 from pathlib import Path
+from unittest.mock import Mock, patch
 from pydantic import Field
 from atomic_agents.context import ChatHistory, Message
 from atomic_agents import BaseIOSchema
 import instructor
 
+requires_msgpack = pytest.mark.skipif(importlib.util.find_spec("msgpack") is None, reason="msgpack not installed")
+
 
 class InputSchema(BaseIOSchema):
     """Test Input Schema"""
@@ -135,6 +141,18 @@ def test_copy(history):
     assert copied_history.history[0].content.test_field == history.history[0].content.test_field
 
 
+def test_restore(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+    snapshot = history.copy()
+    history.initialize_turn()
+    history.add_message("user", InputSchema(test_field="Again"))
+
+    history.restore(snapshot)
+
+    assert [message.content.test_field for message in history.history] == ["Hello"]
+    assert history.current_turn_id == snapshot.current_turn_id
+
+
 def test_get_current_turn_id(history):
     assert history.get_current_turn_id() is None
     history.initialize_turn()
@@ -267,6 +285,115 @@ def test_load_invalid_data(history):
         history.load("invalid json")
 
 
+def make_multimodal_history() -> ChatHistory:
+    import os
+
+    base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    history = ChatHistory(max_messages=5)
+    history.initialize_turn()
+    history.add_message("user", InputSchema(test_field="Hello"))
+    history.add_message(
+        "user",
+        MockMultimodalSchema(
+            instruction_text="Analyze this image",
+            images=[instructor.Image.from_path(path=os.path.join(base_path, "files/image_sample.jpg"))],
+            pdfs=[instructor.processing.multimodal.PDF.from_path(path=os.path.join(base_path, "files/pdf_sample.pdf"))],
+            audio=instructor.processing.multimodal.Audio.from_path(path=os.path.join(base_path, "files/audio_sample.mp3")),
+        ),
+    )
+    history.add_message("assistant", MockEnumSchema(color=ColorEnum.RED))
+    return history
+
+
+@requires_msgpack
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_dump_binary_and_load(compression):
+    history = make_multimodal_history()
+
+    dumped_data = history.dump_binary(compression=compression)
+    new_history = ChatHistory()
+    new_history.load(dumped_data)
+
+    assert dumped_data.startswith(b"AAHB")
+    assert new_history.dump() == history.dump()
+    assert new_history.max_messages == 5
+    assert new_history.current_turn_id == history.current_turn_id
+    assert new_history.history[1].content.images == history.history[1].content.images
+    assert new_history.history[2].content.color == ColorEnum.RED
+
+
+@requires_msgpack
+def test_dump_binary_stores_media_as_raw_bytes():
+    history = make_multimodal_history()
+
+    # Base64 inflates the media by a third, which the binary dump avoids
+    assert len(history.dump_binary()) < len(history.dump().encode("utf-8")) * 0.8
+
+
+@requires_msgpack
+def test_dump_binary_keeps_non_base64_data():
+    history = ChatHistory()
+    image = instructor.Image(source="https://example.com/image.jpg", media_type="image/jpeg", data="not base64")
+    audio = instructor.processing.multimodal.Audio(source="https://example.com/audio.mp3", media_type="audio/mp3", data="AAAA")
+    history.add_message("user", MockMultimodalSchema(instruction_text="Look", images=[image], pdfs=[], audio=audio))
+
+    new_history = ChatHistory()
+    new_history.load(history.dump_binary())
+
+    assert new_history.history[0].content.images[0].data == "not base64"
+    assert new_history.history[0].content.audio.data == "AAAA"
+
+
+@requires_msgpack
+def test_dump_binary_zstd_requires_zstandard():
+    history = make_multimodal_history()
+
+    with patch.dict("sys.modules", {"zstandard": None}):
+        with pytest.raises(ImportError, match="pip install zstandard"):
+            history.dump_binary(compression="zstd")
+
+
+def test_dump_binary_requires_msgpack(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+
+    with patch.dict("sys.modules", {"msgpack": None}):
+        with pytest.raises(ImportError, match="pip install msgpack"):
+            history.dump_binary()
+
+
+def test_dump_binary_unknown_compression(history):
+    with pytest.raises(ValueError):
+        history.dump_binary(compression="lzma")
+
+
+def test_load_json_bytes(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+
+    new_history = ChatHistory()
+    new_history.load(history.dump().encode("utf-8"))
+
+    assert new_history.dump() == history.dump()
+
+
+@requires_msgpack
+@pytest.mark.parametrize(
+    "data",
+    [b"AAHB", b"AAHB\x01\x00\x81", b"AAHB\x01\x01not zlib", b"AAHB\x01\x09", b"AAHB\x02\x00\x80"],
+)
+def test_load_invalid_binary_data(history, data):
+    with pytest.raises(ValueError):
+        history.load(data)
+
+
+@requires_msgpack
+def test_load_binary_with_unknown_class(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+    dumped_data = history.dump_binary().replace(b"test_chat_history.InputSchema", b"test_chat_history.MissingXXXX")
+
+    with pytest.raises(ValueError):
+        ChatHistory().load(dumped_data)
+
+
 def test_get_class_from_string():
     class_string = "tests.context.test_chat_history.InputSchema"
     cls = ChatHistory._get_class_from_string(class_string)
@@ -280,6 +407,49 @@ def test_get_class_from_string_invalid():
         ChatHistory._get_class_from_string("invalid.module.Class")
 
 
+def test_get_class_from_string_is_cached():
+    class_string = f"{InputSchema.__module__}.InputSchema"
+    ChatHistory._get_class_from_string(class_string)
+
+    with patch("builtins.__import__") as import_module:
+        assert ChatHistory._get_class_from_string(class_string) is InputSchema
+    import_module.assert_not_called()
+
+
+def test_get_class_from_string_follows_redefined_classes(monkeypatch):
+    module = types.ModuleType("reloaded_schemas")
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+
+    def define():
+        class Schema(BaseIOSchema):
+            """Schema defined in a module that gets reloaded"""
+
+            test_field: str = Field(..., description="A test field")
+
+        Schema.__module__ = module.__name__
+        module.Schema = Schema
+        return Schema
+
+    first = define()
+    assert ChatHistory._get_class_from_string("reloaded_schemas.Schema") is first
+
+    # Same name, new class, as after importlib.reload()
+    second = define()
+    assert ChatHistory._get_class_from_string("reloaded_schemas.Schema") is second
+
+
+def test_load_skips_multimodal_walk_for_text_schemas():
+    history = make_multimodal_history()
+    dumped_data = history.dump()
+
+    with patch.object(ChatHistory, "_process_multimodal_paths") as process:
+        ChatHistory().load(dumped_data)
+
+    # Only the multimodal message is walked
+    assert process.call_count == 1
+    assert isinstance(process.call_args.args[0], MockMultimodalSchema)
+
+
 def test_message_model():
     message = Message(role="user", content=InputSchema(test_field="Test"), turn_id="123")
     assert message.role == "user"
@@ -357,6 +527,147 @@ def test_chat_history_delete_turn_id(history):
         history.delete_turn_id("non-existent-id")
 
 
+def test_get_history_serializes_each_message_once(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+    history.add_message("assistant", MockOutputSchema(test_field="Hi"))
+
+    with patch.object(ChatHistory, "_extract_multimodal_info", return_value=([], None)) as extract:
+        first = history.get_history()
+        assert extract.call_count == 2
+
+        history.add_message("user", InputSchema(test_field="Again"))
+        second = history.get_history()
+        assert extract.call_count == 3
+
+    assert second[:2] == first
+
+
+def test_get_history_returned_dicts_do_not_affect_cache(history):
+    history.add_message("system", InputSchema(test_field="Tool result"))
+
+    result = history.get_history()
+    result[0]["role"] = "user"
+
+    assert history.get_history()[0]["role"] == "system"
+
+
+def test_get_token_counts_cached_per_message_and_model(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+    history.add_message("assistant", MockOutputSchema(test_field="Hi"))
+
+    count_message = Mock(side_effect=lambda message: len(message["content"]))
+    counts = history.get_token_counts("model-a", count_message)
+
+    assert counts == [len('{"test_field":"Hello"}'), len('{"test_field":"Hi"}')]
+    assert count_message.call_count == 2
+
+    # Cached: only newly added messages are counted
+    history.add_message("user", InputSchema(test_field="Again"))
+    assert history.get_token_counts("model-a", count_message)[:2] == counts
+    assert count_message.call_count == 3
+
+    # Separate cache per model
+    history.get_token_counts("model-b", count_message)
+    assert count_message.call_count == 6
+
+    # Separate cache per tokenizer
+    assert history.get_token_counts("model-a", lambda message: 1, tokenizer_key=1) == [1, 1, 1]
+    assert history.get_token_counts("model-a", lambda message: 2, tokenizer_key=2) == [2, 2, 2]
+    assert history.get_token_counts("model-a", count_message)[:2] == counts
+
+
+def test_get_token_count_snapshot_and_set_token_count(history):
+    history.add_message("user", InputSchema(test_field="Hello"))
+    history.get_token_counts("model-a", lambda message: 5)
+    history.add_message("assistant", MockOutputSchema(test_field="Hi"))
+
+    counted_tokens, uncounted = history.get_token_count_snapshot("model-a")
+
+    assert counted_tokens == 5
+    assert [(message.role, serialized) for message, serialized in uncounted] == [("assistant", history.get_history()[1])]
+
+    history.set_token_count(uncounted[0][0], "model-a", 7)
+    assert history.get_token_count_snapshot("model-a") == (12, [])
+    assert history.get_token_counts("model-a", Mock(side_effect=AssertionError)) == [5, 7]
+
+
+def test_get_turn_ids_in_order():
+    history = ChatHistory()
+    turn_ids = []
+    for i in range(3):
+        history.initialize_turn()
+        turn_ids.append(history.get_current_turn_id())
+        history.add_message("user", InputSchema(test_field=f"Request {i}"))
+        history.add_message("assistant", MockOutputSchema(test_field=f"Response {i}"))
+
+    assert history.get_turn_ids() == turn_ids
+
+    history.delete_turn_id(turn_ids[1])
+    assert history.get_turn_ids() == [turn_ids[0], turn_ids[2]]
+    assert [m.content.test_field for m in history.history] == ["Request 0", "Response 0", "Request 2", "Response 2"]
+
+    history.delete_turn_id(turn_ids[0])
+    assert history.get_turn_ids() == [turn_ids[2]]
+    assert history.get_message_count() == 2
+
+
+def test_turn_index_follows_retagged_messages():
+    history = ChatHistory()
+    for i in range(3):
+        history.initialize_turn()
+        history.add_message("user", InputSchema(test_field=f"Request {i}"))
+    assert len(history.get_turn_ids()) == 3
+
+    # Move the first message into a new turn, and the last one into the second turn
+    history.history[0].turn_id = "retagged"
+    history.history[2].turn_id = history.history[1].turn_id
+
+    assert history.get_turn_ids() == ["retagged", history.history[1].turn_id]
+    history.delete_turn_id(history.history[1].turn_id)
+    assert [m.content.test_field for m in history.history] == ["Request 0"]
+    history.delete_turn_id("retagged")
+    assert history.get_message_count() == 0
+
+
+def test_overflow_evicts_oldest_turns_from_index():
+    history = ChatHistory(max_messages=3)
+    turn_ids = []
+    for i in range(3):
+        history.initialize_turn()
+        turn_ids.append(history.get_current_turn_id())
+        history.add_message("user", InputSchema(test_field=f"Request {i}"))
+        history.add_message("assistant", MockOutputSchema(test_field=f"Response {i}"))
+
+    # Turn 0 fully evicted, turn 1 partially evicted
+    assert history.get_turn_ids() == turn_ids[1:]
+    assert [m.content.test_field for m in history.history] == ["Response 1", "Request 2", "Response 2"]
+    assert history.get_token_counts("model", lambda m: 1, turn_id=turn_ids[1]) == [1]
+
+    history.delete_turn_id(turn_ids[1])
+    assert [m.content.test_field for m in history.history] == ["Request 2", "Response 2"]
+
+    with pytest.raises(ValueError):
+        history.delete_turn_id(turn_ids[0])
+
+
+def test_turn_index_survives_direct_history_modification():
+    history = ChatHistory()
+    history.add_message("user", InputSchema(test_field="Hello"))
+    first_turn = history.get_current_turn_id()
+
+    history.history = []
+    assert history.get_turn_ids() == []
+
+    history.initialize_turn()
+    history.add_message("user", InputSchema(test_field="Hello again"))
+    second_turn = history.get_current_turn_id()
+    history.history.insert(0, Message(role="user", content=InputSchema(test_field="Inserted"), turn_id=first_turn))
+
+    assert history.get_turn_ids() == [first_turn, second_turn]
+    history.delete_turn_id(first_turn)
+    assert [m.content.test_field for m in history.history] == ["Hello again"]
+
+
 def test_get_history_with_multimodal_content(history):
     """Test that get_history correctly handles multimodal content"""
     # Create mock multimodal objects
@@ -574,6 +885,24 @@ def test_get_history_nested_pydantic_with_toplevel_multimodal(history):
     assert result[0]["content"][1] == mock_image
 
 
+def test_get_history_visits_only_multimodal_fields(history):
+    history.add_message("user", MockComplexOutputSchema(response_text="Hi", calculated_value=1, data_dict={}))
+    audio = instructor.processing.multimodal.Audio(source="https://example.com/audio.mp3", media_type="audio/mp3")
+    history.add_message("user", MockMultimodalSchema(instruction_text="Look", images=[], pdfs=[], audio=audio))
+
+    with patch.object(ChatHistory, "_extract_multimodal_info", wraps=ChatHistory._extract_multimodal_info) as extract:
+        history.get_history()
+
+    visited = [call.args[0] for call in extract.call_args_list]
+    # Only the fields that may hold multimodal objects are visited; the nested schemas in data_dict
+    # may be subclass instances with media, so that field is visited too
+    assert len(visited) == 6
+    assert isinstance(visited[0], MockComplexOutputSchema)
+    assert visited[1] == {}
+    assert isinstance(visited[2], MockMultimodalSchema)
+    assert visited[3:] == [[], [], audio]
+
+
 def test_get_history_deeply_nested_multimodal_only(history):
     """Issue #141: multimodal inside nested schema with no top-level multimodal"""
 
@@ -774,6 +1103,38 @@ def test_extract_multimodal_info_nested_schema():
     assert spec == {"inner": {"image": True}}
 
 
+def test_extract_multimodal_info_subclass_instance():
+    """A field typed with a text-only schema can hold a subclass instance with media"""
+
+    class Caption(BaseIOSchema):
+        """Caption schema."""
+
+        label: str = Field(..., description="Label")
+
+    class ImageCaption(Caption):
+        """Caption with an image."""
+
+        image: instructor.Image = Field(..., description="Image")
+
+    class Outer(BaseIOSchema):
+        """Outer schema."""
+
+        caption: Caption = Field(..., description="Caption")
+        extra: BaseIOSchema = Field(..., description="Any schema")
+
+    img1 = instructor.Image(source="url1", media_type="image/jpeg", detail="low")
+    img2 = instructor.Image(source="url2", media_type="image/jpeg", detail="low")
+    content = Outer(caption=ImageCaption(label="test", image=img1), extra=ImageCaption(label="more", image=img2))
+    objs, spec = ChatHistory._extract_multimodal_info(content)
+
+    assert objs == [img1, img2]
+    assert spec == {"caption": {"image": True}, "extra": {"image": True}}
+
+    history = ChatHistory()
+    history.add_message("user", content)
+    assert history.get_history()[0]["content"][1:] == [img1, img2]
+
+
 def test_extract_multimodal_info_list_all_multimodal():
     """List where every item is multimodal collapses to True"""
 
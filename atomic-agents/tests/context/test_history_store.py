@@ -0,0 +1,182 @@
+import json
+
+import pytest
+from pydantic import Field
+
+from atomic_agents import BaseIOSchema
+from atomic_agents.context import ChatHistory, JSONLHistoryStore
+
+
+class MessageSchema(BaseIOSchema):
+    """Test Message Schema"""
+
+    text: str = Field(..., description="The message text")
+
+
+def add_turn(history: ChatHistory, text: str) -> str:
+    history.initialize_turn()
+    history.add_message("user", MessageSchema(text=f"{text} question"))
+    history.add_message("assistant", MessageSchema(text=f"{text} answer"))
+    return history.get_current_turn_id()
+
+
+def read_records(store: JSONLHistoryStore):
+    return [json.loads(line) for line in store.path.read_text().splitlines()]
+
+
+def assert_same_history(restored: ChatHistory, history: ChatHistory):
+    assert restored.dump() == history.dump()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JSONLHistoryStore(tmp_path / "sessions" / "session.jsonl")
+
+
+def test_load_without_log_returns_none(store):
+    assert store.load() is None
+
+
+def test_save_appends_only_new_messages(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    store.save(history)
+    size_after_first_turn = store.path.stat().st_size
+
+    add_turn(history, "second")
+    store.save(history)
+
+    records = read_records(store)
+    assert [record["op"] for record in records] == ["add", "add", "state", "add", "add", "state"]
+    assert records[3]["message"]["content"]["data"] == '{"text":"second question"}'
+    # The first turn is not written again
+    assert store.path.read_text().startswith(store.path.read_text()[:size_after_first_turn])
+    assert_same_history(store.load(), history)
+
+
+def test_save_without_changes_writes_nothing(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    store.save(history)
+    size = store.path.stat().st_size
+
+    store.save(history)
+
+    assert store.path.stat().st_size == size
+
+
+def test_save_records_turn_deletion(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    second = add_turn(history, "second")
+    add_turn(history, "third")
+    store.save(history)
+
+    history.delete_turn_id(second)
+    store.save(history)
+
+    assert read_records(store)[-1] == {"op": "delete_turn", "turn_id": second}
+    assert_same_history(store.load(), history)
+
+
+def test_save_records_dropped_messages(store):
+    history = ChatHistory(max_messages=4)
+    add_turn(history, "first")
+    add_turn(history, "second")
+    store.save(history)
+
+    add_turn(history, "third")
+    store.save(history)
+
+    ops = [record["op"] for record in read_records(store)]
+    assert ops[-4:] == ["drop", "add", "add", "state"]
+    assert read_records(store)[-4]["count"] == 2
+    restored = store.load()
+    assert_same_history(restored, history)
+    assert restored.max_messages == 4
+
+
+def test_replaced_history_is_written_as_deltas(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    store.save(history)
+
+    other = ChatHistory()
+    add_turn(other, "other")
+    store.save(other)
+
+    assert [record["op"] for record in read_records(store)][3:] == ["drop", "add", "add", "state"]
+    assert_same_history(store.load(), other)
+
+
+def test_partly_removed_turn_is_written_as_snapshot(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    add_turn(history, "second")
+    store.save(history)
+
+    del history.history[1]
+    store.save(history)
+
+    assert [record["op"] for record in read_records(store)] == ["snapshot"]
+    assert_same_history(store.load(), history)
+
+
+def test_log_is_compacted_when_mostly_obsolete(tmp_path):
+    store = JSONLHistoryStore(tmp_path / "session.jsonl", min_compaction_records=8)
+    history = ChatHistory(max_messages=2)
+    for index in range(10):
+        add_turn(history, f"turn {index}")
+        store.save(history)
+
+    assert len(read_records(store)) < 12
+    assert_same_history(store.load(), history)
+
+
+def test_loaded_history_saves_incrementally(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    store.save(history)
+
+    reopened = JSONLHistoryStore(store.path)
+    restored = reopened.load()
+    add_turn(restored, "second")
+    reopened.save(restored)
+
+    assert [record["op"] for record in read_records(store)][-3:] == ["add", "add", "state"]
+    assert_same_history(JSONLHistoryStore(store.path).load(), restored)
+
+
+def test_truncated_last_record_is_ignored(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    store.save(history)
+    with open(store.path, "a") as file:
+        file.write('{"op": "add", "mess')
+
+    reopened = JSONLHistoryStore(store.path)
+    restored = reopened.load()
+    assert_same_history(restored, history)
+
+    # The truncated record is cut off before the next records are appended
+    add_turn(restored, "second")
+    reopened.save(restored)
+    assert_same_history(JSONLHistoryStore(store.path).load(), restored)
+
+
+def test_invalid_record_raises(store):
+    store.path.write_text('{"op": "unknown"}\n')
+
+    with pytest.raises(ValueError, match="line 1"):
+        store.load()
+
+
+def test_clear_removes_log(store):
+    history = ChatHistory()
+    add_turn(history, "first")
+    store.save(history)
+
+    store.clear()
+
+    assert not store.path.exists()
+    assert store.load() is None
@@ -0,0 +1,368 @@
+import gc
+import importlib.util
+import sqlite3
+
+import pytest
+from pydantic import Field
+from unittest.mock import Mock
+
+import instructor
+
+from atomic_agents import AgentConfig, AtomicAgent, BaseIOSchema, BasicChatInputSchema, BasicChatOutputSchema
+from atomic_agents.context import ChatHistory, SQLiteChatHistory
+
+requires_msgpack = pytest.mark.skipif(importlib.util.find_spec("msgpack") is None, reason="msgpack not installed")
+
+
+class MessageSchema(BaseIOSchema):
+    """Test Message Schema"""
+
+    text: str = Field(..., description="The message text")
+
+
+def add_turns(history: ChatHistory, count: int, start: int = 0):
+    turn_ids = []
+    for index in range(start, start + count):
+        history.initialize_turn()
+        history.add_message("user", MessageSchema(text=f"question {index}"))
+        history.add_message("assistant", MessageSchema(text=f"answer {index}"))
+        turn_ids.append(history.get_current_turn_id())
+    return turn_ids
+
+
+def texts(history: ChatHistory):
+    return [message.content.text for message in history.history]
+
+
+@pytest.fixture
+def database(tmp_path):
+    return tmp_path / "db" / "history.sqlite"
+
+
+def test_messages_are_persisted_when_added(database):
+    history = SQLiteChatHistory(database, "session")
+    add_turns(history, 2)
+
+    reopened = SQLiteChatHistory(database, "session")
+
+    assert reopened.dump() == history.dump()
+    assert reopened.get_current_turn_id() == history.get_current_turn_id()
+
+
+def test_sessions_are_isolated(database):
+    first = SQLiteChatHistory(database, "first")
+    second = SQLiteChatHistory(database, "second")
+    add_turns(first, 2)
+    add_turns(second, 1, start=10)
+
+    assert texts(SQLiteChatHistory(database, "first")) == ["question 0", "answer 0", "question 1", "answer 1"]
+    assert texts(SQLiteChatHistory(database, "second")) == ["question 10", "answer 10"]
+
+
+def test_only_tail_window_is_loaded(database):
+    add_turns(SQLiteChatHistory(database, "session"), 5)
+
+    history = SQLiteChatHistory(database, "session", window=3)
+
+    assert texts(history) == ["answer 3", "question 4", "answer 4"]
+    assert history.get_message_count() == 10
+
+
+def test_get_history_returns_loaded_window(database):
+    turn_ids = add_turns(SQLiteChatHistory(database, "session"), 5)
+    history = SQLiteChatHistory(database, "session", window=2)
+
+    assert len(history.get_history()) == 2
+    assert history.get_turn_ids() == turn_ids[-1:]
+    assert history.get_token_counts("model", lambda message: 1) == [1, 1]
+
+
+def test_load_older_pages_older_messages_in(database):
+    add_turns(SQLiteChatHistory(database, "session"), 5)
+    history = SQLiteChatHistory(database, "session", window=2, page_size=3)
+
+    history.load_older()
+
+    assert len(history.get_history()) == 10
+    assert texts(history)[:2] == ["question 0", "answer 0"]
+    assert history.get_message_count() == 10
+
+
+def test_add_message_does_not_page_in(database):
+    add_turns(SQLiteChatHistory(database, "session"), 5)
+    history = SQLiteChatHistory(database, "session", window=2)
+
+    add_turns(history, 1, start=5)
+
+    assert texts(history) == ["question 4", "answer 4", "question 5", "answer 5"]
+    assert history.get_message_count() == 12
+    assert texts(SQLiteChatHistory(database, "session", window=100))[-2:] == ["question 5", "answer 5"]
+
+
+def test_unload_keeps_window(database):
+    add_turns(SQLiteChatHistory(database, "session"), 3)
+    history = SQLiteChatHistory(database, "session", window=2)
+    history.load_older()
+
+    history.unload()
+
+    assert texts(history) == ["question 2", "answer 2"]
+    assert history.get_message_count() == 6
+
+
+def test_overflow_deletes_oldest_rows_without_loading(database):
+    add_turns(SQLiteChatHistory(database, "session"), 5)
+    history = SQLiteChatHistory(database, "session", max_messages=6, window=2)
+
+    add_turns(history, 1, start=5)
+
+    assert history.get_message_count() == 6
+    assert texts(history) == ["question 4", "answer 4", "question 5", "answer 5"]
+    reopened = SQLiteChatHistory(database, "session", window=100)
+    assert texts(reopened) == ["question 3", "answer 3", "question 4", "answer 4", "question 5", "answer 5"]
+
+
+def test_delete_unloaded_turn(database):
+    turn_ids = add_turns(SQLiteChatHistory(database, "session"), 3)
+    history = SQLiteChatHistory(database, "session", window=2)
+
+    history.delete_turn_id(turn_ids[0])
+
+    assert history.get_message_count() == 4
+    assert texts(history) == ["question 2", "answer 2"]
+    assert texts(SQLiteChatHistory(database, "session", window=100)) == ["question 1", "answer 1", "question 2", "answer 2"]
+
+
+def test_delete_current_turn_updates_current_turn_id(database):
+    turn_ids = add_turns(SQLiteChatHistory(database, "session"), 2)
+    history = SQLiteChatHistory(database, "session", window=2)
+
+    history.delete_turn_id(turn_ids[1])
+
+    assert history.get_current_turn_id() == turn_ids[0]
+    assert SQLiteChatHistory(database, "session").get_current_turn_id() == turn_ids[0]
+    with pytest.raises(ValueError):
+        history.delete_turn_id(turn_ids[1])
+
+
+def test_load_replaces_session_messages(database):
+    source = ChatHistory()
+    add_turns(source, 2, start=20)
+    history = SQLiteChatHistory(database, "session")
+    add_turns(history, 3)
+
+    history.load(source.dump())
+
+    assert texts(SQLiteChatHistory(database, "session")) == texts(source)
+    assert SQLiteChatHistory(database, "session").get_current_turn_id() == source.get_current_turn_id()
+
+
+@requires_msgpack
+def test_binary_dump_includes_unloaded_messages(database):
+    add_turns(SQLiteChatHistory(database, "session"), 3)
+    history = SQLiteChatHistory(database, "session", window=1)
+
+    restored = ChatHistory()
+    restored.load(history.dump_binary())
+
+    assert restored.get_message_count() == 6
+
+
+def test_copy_copies_rows_without_loading_them(database):
+    add_turns(SQLiteChatHistory(database, "session"), 3)
+    history = SQLiteChatHistory(database, "session", window=1)
+
+    copied = history.copy()
+    add_turns(copied, 1, start=3)
+
+    assert isinstance(copied, SQLiteChatHistory)
+    assert len(history.history) == 1
+    assert copied.get_message_count() == 8
+    assert copied.get_current_turn_id() != history.get_current_turn_id()
+    assert SQLiteChatHistory(database, "session").get_message_count() == 6
+
+
+def test_temporary_copy_is_deleted_with_it(database):
+    history = SQLiteChatHistory(database, "session")
+    add_turns(history, 2)
+    copied = history.copy()
+    session_id = copied.session_id
+
+    del copied
+    gc.collect()
+
+    assert SQLiteChatHistory(database, session_id).get_message_count() == 0
+
+
+def test_copy_into_named_session(database):
+    history = SQLiteChatHistory(database, "session")
+    add_turns(history, 2)
+
+    history.copy(session_id="backup")
+
+    reopened = SQLiteChatHistory(database, "backup")
+    assert reopened.dump() == history.dump()
+    assert reopened.get_current_turn_id() == history.get_current_turn_id()
+
+
+def test_restore_from_copy(database):
+    history = SQLiteChatHistory(database, "session", window=2)
+    add_turns(history, 2)
+    snapshot = history.copy()
+    add_turns(history, 2, start=2)
+
+    history.restore(snapshot)
+
+    assert texts(history) == ["question 1", "answer 1"]
+    assert history.get_message_count() == 4
+    assert history.get_current_turn_id() == snapshot.get_current_turn_id()
+    assert texts(SQLiteChatHistory(database, "session")) == ["question 0", "answer 0", "question 1", "answer 1"]
+
+
+def test_restore_from_in_memory_history(database):
+    source = ChatHistory()
+    add_turns(source, 1, start=20)
+    history = SQLiteChatHistory(database, "session")
+    add_turns(history, 2)
+
+    history.restore(source)
+
+    assert texts(SQLiteChatHistory(database, "session")) == ["question 20", "answer 20"]
+    assert SQLiteChatHistory(database, "session").get_current_turn_id() == source.get_current_turn_id()
+
+
+def test_clear_deletes_session(database):
+    history = SQLiteChatHistory(database, "session")
+    add_turns(history, 2)
+
+    history.clear()
+
+    assert history.get_message_count() == 0
+    assert SQLiteChatHistory(database, "session").get_message_count() == 0
+
+
+def test_shared_connection(database):
+    history = SQLiteChatHistory(database, "first")
+    shared = SQLiteChatHistory(history._connection, "second")
+    add_turns(shared, 1)
+
+    assert SQLiteChatHistory(database, "second").get_message_count() == 2
+
+
+def test_connection_with_default_isolation_level(database):
+    database.parent.mkdir()
+    connection = sqlite3.connect(database)
+    history = SQLiteChatHistory(connection, "session")
+    add_turns(history, 2)
+    history.copy("copy")
+    history.restore(history.copy())
+    history.load(history.dump())
+    connection.close()
+
+    assert SQLiteChatHistory(database, "session").get_message_count() == 4
+    assert SQLiteChatHistory(database, "copy").get_message_count() == 4
+
+
+def test_connection_joins_callers_transaction(database):
+    database.parent.mkdir()
+    connection = sqlite3.connect(database, isolation_level=None)
+    history = SQLiteChatHistory(connection, "session")
+
+    connection.execute("BEGIN")
+    add_turns(history, 1)
+    connection.execute("ROLLBACK")
+
+    assert SQLiteChatHistory(database, "session").get_message_count() == 0
+
+
+def test_agent_on_connection_with_default_isolation_level(database):
+    database.parent.mkdir()
+    connection = sqlite3.connect(database)
+    add_turns(SQLiteChatHistory(connection, "session"), 2)
+    agent = _agent(_mock_client(), SQLiteChatHistory(connection, "session"))
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+    agent.reset_history()
+    agent.run(BasicChatInputSchema(chat_message="Again"))
+    connection.close()
+
+    assert SQLiteChatHistory(database, "session").get_message_count() == 6
+
+
+def _mock_client():
+    client = Mock(spec=instructor.Instructor)
+    client.chat = Mock()
+    client.chat.completions = Mock()
+    client.chat.completions.create = Mock(return_value=BasicChatOutputSchema(chat_message="Reply"))
+    return client
+
+
+def _agent(client, history):
+    return AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=client, model="gpt-5-mini", history=history)
+    )
+
+
+def test_run_with_history_reports_only_new_messages(database):
+    add_turns(SQLiteChatHistory(database, "session"), 3)
+    client = _mock_client()
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](AgentConfig(client=client, model="gpt-5-mini"))
+    history = SQLiteChatHistory(database, "session", window=2)
+
+    result = agent.run_with_history(BasicChatInputSchema(chat_message="Hello"), history)
+
+    assert [message.role for message in result.new_messages] == ["user", "assistant"]
+    # The prompt contained the loaded window only
+    assert len(client.chat.completions.create.call_args.kwargs["messages"]) == 1 + 2 + 1
+    assert SQLiteChatHistory(database, "session").get_message_count() == 8
+
+
+def test_agent_construction_keeps_window(database):
+    add_turns(SQLiteChatHistory(database, "session"), 200)
+    history = SQLiteChatHistory(database, "session", window=4)
+
+    agent = _agent(_mock_client(), history)
+
+    assert len(history.history) == 4
+    assert isinstance(agent.initial_history, SQLiteChatHistory)
+    assert len(agent.initial_history.history) == 4
+
+
+def test_agent_run_sends_window(database):
+    add_turns(SQLiteChatHistory(database, "session"), 200)
+    client = _mock_client()
+    agent = _agent(client, SQLiteChatHistory(database, "session", window=4))
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert len(client.chat.completions.create.call_args.kwargs["messages"]) == 1 + 4 + 1
+    assert len(agent.history.history) == 6
+    assert SQLiteChatHistory(database, "session").get_message_count() == 402
+
+
+def test_agent_reset_history_keeps_sqlite_backing(database):
+    add_turns(SQLiteChatHistory(database, "session"), 200)
+    history = SQLiteChatHistory(database, "session", window=4)
+    agent = _agent(_mock_client(), history)
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    agent.reset_history()
+
+    assert agent.history is history
+    assert texts(history) == ["question 198", "answer 198", "question 199", "answer 199"]
+    assert SQLiteChatHistory(database, "session").get_message_count() == 400
+    agent.run(BasicChatInputSchema(chat_message="Again"))
+    assert SQLiteChatHistory(database, "session").get_message_count() == 402
+
+
+def test_agent_config_history(database):
+    client = _mock_client()
+    history = SQLiteChatHistory(database, "session")
+    agent = AtomicAgent[BasicChatInputSchema, BasicChatOutputSchema](
+        AgentConfig(client=client, model="gpt-5-mini", history=history)
+    )
+
+    agent.run(BasicChatInputSchema(chat_message="Hello"))
+
+    assert agent.history is history
+    assert [message.role for message in SQLiteChatHistory(database, "session").history] == ["user", "assistant"]
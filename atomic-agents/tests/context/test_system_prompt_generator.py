@@ -1,3 +1,5 @@
+import asyncio
+import time
 from typing import Dict, Optional
 
 import pytest
@@ -6,6 +8,12 @@ from atomic_agents.context import (
     SystemPromptGenerator,
     BaseDynamicContextProvider,
     BaseSystemPromptGenerator,
+    ContextProviderStats,
+)
+from atomic_agents.context.system_prompt_generator import (
+    fetch_context_snapshot,
+    fetch_context_snapshot_async,
+    use_context_snapshot,
 )
 
 
@@ -175,3 +183,192 @@ def test_base_system_prompt_generator_with_no_context_providers():
     generator = MockSystemPromptGenerator(system_prompt="Test prompt")
     assert generator.context_providers == {}
     assert repr(generator) == "MockSystemPromptGenerator (providers=[])"
+
+
+def test_generate_static_and_dynamic_prompt():
+    generator = SystemPromptGenerator(
+        background=["Background info"],
+        output_instructions=["Custom instruction"],
+        context_providers={"provider1": MockContextProvider("Provider 1", "Info 1")},
+    )
+
+    assert generator.generate_static_prompt() == """# IDENTITY and PURPOSE
+- Background info
+
+# OUTPUT INSTRUCTIONS
+- Custom instruction
+- Always respond using the proper JSON schema.
+- Always use the available additional information and context to enhance the response."""
+    assert generator.generate_dynamic_prompt() == """# EXTRA INFORMATION AND CONTEXT
+## Provider 1
+Info 1"""
+
+
+def test_base_system_prompt_generator_static_and_dynamic_defaults():
+    generator = MockSystemPromptGenerator(system_prompt="Test prompt")
+    assert generator.generate_static_prompt() == "Test prompt"
+    assert generator.generate_dynamic_prompt() == ""
+
+
+class CountingContextProvider(BaseDynamicContextProvider):
+    def __init__(self, title: str, ttl: Optional[float] = None, delay: float = 0.0):
+        super().__init__(title, ttl=ttl)
+        self.delay = delay
+        self.calls = 0
+
+    def get_info(self) -> str:
+        self.calls += 1
+        return f"{self.title} info {self.calls}"
+
+    async def get_info_async(self) -> str:
+        await asyncio.sleep(self.delay)
+        return self.get_info()
+
+
+def test_context_provider_without_ttl_is_queried_every_time():
+    provider = CountingContextProvider("Provider")
+    assert provider.get_cached_info() == "Provider info 1"
+    assert provider.get_cached_info() == "Provider info 2"
+    assert provider.stats().calls == 2
+    assert provider.stats().cache_hits == 0
+
+
+def test_context_provider_ttl_cache_and_invalidate():
+    provider = CountingContextProvider("Provider", ttl=60)
+    assert provider.get_cached_info() == "Provider info 1"
+    assert provider.get_cached_info() == "Provider info 1"
+    assert provider.calls == 1
+
+    provider.invalidate()
+    assert provider.get_cached_info() == "Provider info 2"
+
+    stats = provider.stats()
+    assert isinstance(stats, ContextProviderStats)
+    assert stats.calls == 2
+    assert stats.cache_hits == 1
+    assert stats.last_duration is not None
+    assert stats.total_duration >= stats.last_duration
+
+
+def test_context_provider_ttl_expires():
+    provider = CountingContextProvider("Provider", ttl=0.01)
+    provider.get_cached_info()
+    time.sleep(0.02)
+    assert provider.get_cached_info() == "Provider info 2"
+
+
+@pytest.mark.asyncio
+async def test_context_provider_default_get_info_async():
+    provider = MockContextProvider("Provider", "Info")
+    assert await provider.get_info_async() == "Info"
+    assert await provider.get_cached_info_async() == "Info"
+    assert provider.stats().calls == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_prompt_async_queries_providers_concurrently():
+    providers = {f"provider{i}": CountingContextProvider(f"Provider {i}", delay=0.1) for i in range(5)}
+    generator = SystemPromptGenerator(background=["Background"], context_providers=providers)
+
+    start = time.perf_counter()
+    prompt = await generator.generate_prompt_async()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.4
+    for i, provider in enumerate(providers.values()):
+        assert f"## Provider {i}\nProvider {i} info 1" in prompt
+        assert provider.calls == 1
+    assert set(generator.provider_stats()) == set(providers)
+
+
+def test_context_snapshot_answers_repeated_prompt_builds():
+    provider = CountingContextProvider("Provider")
+    generator = SystemPromptGenerator(context_providers={"provider": provider})
+
+    with use_context_snapshot(fetch_context_snapshot(generator.context_providers)):
+        first = generator.generate_prompt()
+        second = generator.generate_prompt()
+
+    assert first == second
+    assert provider.calls == 1
+    # Outside the block the provider is queried again
+    assert "Provider info 2" in generator.generate_prompt()
+
+
+@pytest.mark.asyncio
+async def test_context_snapshot_is_task_local():
+    provider = CountingContextProvider("Provider")
+    providers = {"provider": provider}
+
+    async def build() -> str:
+        with use_context_snapshot(await fetch_context_snapshot_async(providers)):
+            await asyncio.sleep(0)
+            return provider.get_cached_info()
+
+    results = await asyncio.gather(build(), build())
+    assert sorted(results) == ["Provider info 1", "Provider info 2"]
+
+
+def test_static_prompt_is_compiled_once():
+    generator = SystemPromptGenerator(background=["Background"])
+    assert generator.generate_static_prompt() is generator.generate_static_prompt()
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda generator: generator.steps.append("New step"),
+        lambda generator: generator.background.extend(["New step"]),
+        lambda generator: generator.output_instructions.insert(0, "New step"),
+        lambda generator: generator.background.__setitem__(0, "New step"),
+        lambda generator: setattr(generator, "steps", ["New step"]),
+    ],
+)
+def test_static_prompt_is_rebuilt_when_sections_change(mutate):
+    generator = SystemPromptGenerator(background=["Background"])
+    before = generator.generate_static_prompt()
+
+    mutate(generator)
+
+    assert generator.generate_static_prompt() != before
+    assert "- New step" in generator.generate_static_prompt()
+    assert "- New step" in generator.generate_prompt()
+
+
+def test_static_prompt_follows_the_callers_section_lists():
+    steps = ["Step 1"]
+    output_instructions = ["Be brief"]
+    generator = SystemPromptGenerator(steps=steps, output_instructions=output_instructions)
+    generator.generate_static_prompt()
+
+    steps.append("Step 2")
+    output_instructions.clear()
+
+    assert generator.steps is steps
+    assert "- Step 2" in generator.generate_static_prompt()
+    assert "- Be brief" not in generator.generate_static_prompt()
+
+
+def test_count_static_prompt_tokens_is_cached_per_model():
+    class FakeCounter:
+        def __init__(self):
+            self.calls = []
+
+        def count_text(self, model, text):
+            self.calls.append(model)
+            return len(text)
+
+    generator = SystemPromptGenerator(background=["Background"])
+    counter = FakeCounter()
+    static_length = len(generator.generate_static_prompt())
+
+    assert generator.count_static_prompt_tokens("model-a", counter) == static_length
+    assert generator.count_static_prompt_tokens("model-a", counter) == static_length
+    assert generator.count_static_prompt_tokens("model-b", counter) == static_length
+    assert counter.calls == ["model-a", "model-b"]
+
+    generator.steps.append("Step")
+    assert generator.count_static_prompt_tokens("model-a", counter) == static_length + len(
+        "# INTERNAL ASSISTANT STEPS\n- Step\n\n"
+    )
+    assert counter.calls == ["model-a", "model-b", "model-a"]
@@ -0,0 +1,66 @@
+import importlib.util
+import zlib
+from unittest.mock import patch
+
+import pytest
+
+from atomic_agents.utils.msgpack_codec import compress, decompress, packb, unpackb
+
+requires_msgpack = pytest.mark.skipif(importlib.util.find_spec("msgpack") is None, reason="msgpack not installed")
+
+
+@requires_msgpack
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        True,
+        0,
+        2**64 - 1,
+        -(2**63),
+        1.5,
+        "é" * 200,
+        b"\x00\xff" * 200,
+        list(range(70000)),
+        {"a": 1, "b": [True, None, {"c": b"d"}]},
+    ],
+)
+def test_round_trip(value):
+    assert unpackb(packb(value)) == value
+
+
+@requires_msgpack
+def test_tuples_are_packed_as_arrays():
+    assert unpackb(packb((1, "a"))) == [1, "a"]
+
+
+@requires_msgpack
+@pytest.mark.parametrize("data", [b"", b"\x92\x01", b"\x01\x02", b"\xc1"])
+def test_invalid_data_raises_value_error(data):
+    with pytest.raises(ValueError):
+        unpackb(data)
+
+
+def test_missing_msgpack_raises_import_error():
+    with patch.dict("sys.modules", {"msgpack": None}):
+        with pytest.raises(ImportError, match="pip install msgpack"):
+            packb({"a": 1})
+        with pytest.raises(ImportError, match="pip install msgpack"):
+            unpackb(b"\x80")
+
+
+@pytest.mark.parametrize("method", [None, "zlib"])
+def test_compress_round_trip(method):
+    data = b"history " * 100
+    assert decompress(compress(data, method), method) == data
+
+
+def test_zlib_compression_is_standard():
+    assert zlib.decompress(compress(b"data", "zlib")) == b"data"
+
+
+def test_unknown_compression_raises():
+    with pytest.raises(ValueError):
+        compress(b"data", "lzma")
+    with pytest.raises(ValueError):
+        decompress(b"data", "lzma")
@@ -0,0 +1,291 @@
+import json
+import random
+from typing import List, Optional
+
+import pytest
+from jiter import from_json
+from pydantic import BaseModel, field_validator, model_validator
+
+from atomic_agents.utils.partial_json import (
+    PartialJSONParser,
+    IncrementalModelValidator,
+    PartialCoalescer,
+    PartialModelStream,
+)
+
+
+def _feed_all(chunks):
+    parser = PartialJSONParser()
+    snapshots = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        snapshots.append(parser.snapshot())
+    return parser, snapshots
+
+
+class TestPartialJSONParser:
+    """Tests for the incremental partial JSON parser."""
+
+    def test_empty_input_is_empty_object(self):
+        parser = PartialJSONParser()
+        assert parser.snapshot() == {}
+        parser.feed("")
+        assert parser.snapshot() == {}
+
+    def test_partial_strings_are_included(self):
+        _, snapshots = _feed_all(['{"field": "hel', 'lo"}'])
+        assert snapshots == [{"field": "hel"}, {"field": "hello"}]
+
+    def test_incomplete_literals_are_left_out(self):
+        _, snapshots = _feed_all(['{"a": 1', ".", "5, ", '"b": tr', "ue}"])
+        assert snapshots == [{"a": 1}, {}, {"a": 1.5}, {"a": 1.5}, {"a": 1.5, "b": True}]
+
+    def test_escapes_split_across_chunks(self):
+        _, snapshots = _feed_all(['{"a": "x\\', "u00", "e9\\", '"', "\\ud83d", '\\ude00"}'])
+        assert snapshots == [{"a": "x"}, {"a": "x"}, {"a": "xé"}, {"a": 'xé"'}, {"a": 'xé"'}, {"a": 'xé"😀'}]
+
+    def test_nested_containers(self):
+        _, snapshots = _feed_all(['{"items": [{"name": "a"}, {"na', 'me": "b', '"}], "count": 2}'])
+        assert snapshots == [
+            {"items": [{"name": "a"}, {}]},
+            {"items": [{"name": "a"}, {"name": "b"}]},
+            {"items": [{"name": "a"}, {"name": "b"}], "count": 2},
+        ]
+
+    def test_changed_keys(self):
+        parser = PartialJSONParser()
+        parser.feed('{"title": "Hel')
+        assert parser.pop_changed_keys() == {"title"}
+        parser.feed('lo", "tags": ["a"')
+        assert parser.pop_changed_keys() == {"title", "tags"}
+        parser.feed("]}")
+        assert parser.pop_changed_keys() == {"tags"}
+        assert parser.pop_changed_keys() == set()
+
+    def test_completed_keys(self):
+        parser = PartialJSONParser()
+        parser.feed('{"a": "x", "b": [1, {"c": 2}')
+        assert parser.pop_completed_keys() == ["a"]
+        parser.feed('], "d": 1')
+        assert parser.pop_completed_keys() == ["b"]
+        parser.feed("}")
+        assert parser.pop_completed_keys() == ["d"]
+        assert parser.pop_completed_keys() == []
+
+    def test_changed_keys_unknown_for_non_object(self):
+        parser = PartialJSONParser()
+        parser.feed("[1, 2")
+        assert parser.snapshot() == [1, 2]
+        assert parser.pop_changed_keys() is None
+
+    def test_malformed_input_falls_back_to_jiter(self):
+        parser = PartialJSONParser()
+        parser.feed('{"a": 1,}')
+        assert parser.pop_changed_keys() is None
+        with pytest.raises(ValueError):
+            parser.snapshot()
+
+    def test_matches_jiter_on_every_prefix(self):
+        rng = random.Random(42)
+        alphabet = ["a", " ", '"', "\\", "\n", "é", "😀", "/", "\t"]
+
+        def value(depth=0):
+            kind = rng.randint(0, 6 if depth < 3 else 3)
+            if kind == 0:
+                return rng.choice([0, -7, 12345678901234567890, 1.5, -0.25, 1e300])
+            if kind == 1:
+                return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+            if kind == 2:
+                return rng.choice([True, False, None])
+            if kind in (3, 4):
+                return [value(depth + 1) for _ in range(rng.randint(0, 3))]
+            return {f"k{i}": value(depth + 1) for i in range(rng.randint(0, 3))}
+
+        for _ in range(200):
+            text = json.dumps({f"f{i}": value() for i in range(4)}, ensure_ascii=rng.random() < 0.5)
+            parser = PartialJSONParser()
+            position = 0
+            while position < len(text):
+                step = rng.randint(1, 5)
+                parser.feed(text[position : position + step])
+                position += step
+                assert parser.snapshot() == from_json(text[:position].encode(), partial_mode="trailing-strings")
+            assert parser.snapshot() == json.loads(text)
+
+
+class Item(BaseModel):
+    name: Optional[str] = None
+    tags: Optional[List[str]] = None
+
+
+class Report(BaseModel):
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    items: Optional[List[Item]] = None
+
+
+def _validate_stream(model, text, chunk_size=3):
+    parser = PartialJSONParser()
+    validator = IncrementalModelValidator(model)
+    results = []
+    for position in range(0, len(text), chunk_size):
+        parser.feed(text[position : position + chunk_size])
+        results.append(validator.validate(parser.snapshot(), parser.pop_changed_keys()))
+    return results
+
+
+class TestIncrementalModelValidator:
+    """Tests for the incremental model validator."""
+
+    def test_matches_full_validation(self):
+        text = json.dumps(
+            {"title": "Report", "summary": "A " * 20, "items": [{"name": f"item {i}", "tags": ["x", "y"]} for i in range(5)]}
+        )
+        results = _validate_stream(Report, text)
+        for position, result in zip(range(3, len(text) + 3, 3), results):
+            expected = Report.model_validate(from_json(text[:position].encode(), partial_mode="trailing-strings"))
+            assert result == expected
+            assert result.model_fields_set == expected.model_fields_set
+
+    def test_results_are_independent(self):
+        results = _validate_stream(Report, '{"title": "abc", "summary": "def"}')
+        assert [result.title for result in results[:6]] == [None, None, None, "a", "abc", "abc"]
+
+    def test_completed_list_items_are_reused(self):
+        text = json.dumps({"items": [{"name": "a"}, {"name": "b"}]})
+        results = _validate_stream(Report, text, chunk_size=1)
+        final = results[-1]
+        first_complete = next(r for r in results if r.items and len(r.items) == 2)
+        assert first_complete.items[0] is final.items[0]
+
+    def test_field_validators_still_run(self):
+        class Upper(BaseModel):
+            title: Optional[str] = None
+            tags: Optional[List[Item]] = None
+
+            @field_validator("title")
+            @classmethod
+            def upper(cls, value):
+                return value.upper() if value else value
+
+        results = _validate_stream(Upper, '{"tags": [], "title": "abc"}')
+        assert results[-1].title == "ABC"
+
+    def test_model_validators_force_full_validation(self):
+        class Checked(BaseModel):
+            title: Optional[str] = None
+            summary: Optional[str] = None
+
+            @model_validator(mode="after")
+            def count(self):
+                self.summary = str(len(self.title or ""))
+                return self
+
+        validator = IncrementalModelValidator(Checked)
+        assert validator._incremental is False
+        results = _validate_stream(Checked, '{"title": "abcdef"}')
+        assert results[-1].summary == "6"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPartialCoalescer:
+    """Tests for the partial emission policy."""
+
+    def test_first_partial_is_ready(self):
+        coalescer = PartialCoalescer(min_interval=1.0, min_changed_chars=100)
+        assert coalescer.ready()
+
+    def test_min_interval(self):
+        clock = FakeClock()
+        coalescer = PartialCoalescer(min_interval=0.5, clock=clock)
+        coalescer.emitted()
+        clock.now = 0.4
+        assert not coalescer.ready()
+        clock.now = 0.5
+        assert coalescer.ready()
+
+    def test_min_changed_chars(self):
+        coalescer = PartialCoalescer(min_changed_chars=10)
+        coalescer.emitted()
+        coalescer.add(6)
+        assert not coalescer.ready()
+        coalescer.add(4)
+        assert coalescer.ready()
+        coalescer.emitted()
+        assert not coalescer.ready()
+
+    def test_both_thresholds_must_be_met(self):
+        clock = FakeClock()
+        coalescer = PartialCoalescer(min_interval=1.0, min_changed_chars=5, clock=clock)
+        coalescer.emitted()
+        coalescer.add(10)
+        assert not coalescer.ready()
+        clock.now = 2.0
+        assert coalescer.ready()
+
+
+def _stream(model, chunks, coalescer=None):
+    stream = PartialModelStream(model, coalescer=coalescer)
+    results = [stream.feed(chunk) for chunk in chunks]
+    results.append(stream.flush())
+    return [result for result in results if result is not None]
+
+
+class TestPartialModelStream:
+    """Tests for the chunk to partial model pipeline."""
+
+    def test_without_coalescer_every_chunk_is_emitted(self):
+        results = _stream(Report, ['{"title": "a', "", 'b"', "}"])
+        assert [result.title for result in results] == ["a", "a", "ab", "ab"]
+
+    def test_identical_partials_are_skipped(self):
+        results = _stream(Report, ['{"title": "a', "", 'b"', ', "summ', "ary", '": "x"}'], PartialCoalescer())
+        assert [(result.title, result.summary) for result in results] == [("a", None), ("ab", None), ("ab", "x")]
+
+    def test_coalesced_chunks_are_flushed_at_the_end(self):
+        text = '{"title": "abcdefghij", "items": [{"name": "one"}, {"name": "two"}]}'
+        chunks = [text[position : position + 2] for position in range(0, len(text), 2)]
+        results = _stream(Report, chunks, PartialCoalescer(min_changed_chars=20))
+
+        assert len(results) < len(chunks) // 5
+        assert results[-1] == Report.model_validate_json(text)
+
+    def test_coalescing_by_interval(self):
+        clock = FakeClock()
+        coalescer = PartialCoalescer(min_interval=1.0, clock=clock)
+        stream = PartialModelStream(Report, coalescer=coalescer)
+
+        assert stream.feed('{"title": "a').title == "a"
+        clock.now = 0.5
+        assert stream.feed("b") is None
+        clock.now = 1.0
+        assert stream.feed("c").title == "abc"
+        assert stream.feed('"}') is None
+        assert stream.flush() is None
+
+    def test_field_completion_callback(self):
+        completed = []
+        stream = PartialModelStream(
+            Report, coalescer=PartialCoalescer(min_changed_chars=1000), on_field_complete=lambda *args: completed.append(args)
+        )
+
+        assert stream.feed('{"title": "ab') is not None
+        assert stream.feed('c", "summary": "x') is not None
+        assert completed == [("title", "abc")]
+        stream.feed('"}')
+        assert completed == [("title", "abc"), ("summary", "x")]
+        assert stream.completed_fields == ["title", "summary"]
+
+    def test_stop_after_fields(self):
+        stream = PartialModelStream(Report, stop_after_fields=["title", "summary"])
+        stream.feed('{"summary": "s", "tit')
+        assert not stream.stopped
+        stream.feed('le": "t", "items": [')
+        assert stream.stopped
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import instructor
+from instructor import Mode
+
+from atomic_agents.utils.prompt_cache import (
+    PromptCacheUsage,
+    extract_prompt_cache_usage,
+    supports_cache_control,
+    with_cache_control,
+)
+
+
+class TestWithCacheControl:
+    def test_string_content(self):
+        message = {"role": "system", "content": "Static prompt"}
+        marked = with_cache_control(message)
+        assert marked == {
+            "role": "system",
+            "content": [{"type": "text", "text": "Static prompt", "cache_control": {"type": "ephemeral"}}],
+        }
+        # The original message is not modified
+        assert message == {"role": "system", "content": "Static prompt"}
+
+    def test_text_block_content(self):
+        message = {"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "text", "text": "b"}]}
+        marked = with_cache_control(message)
+        assert marked["content"][0] == {"type": "text", "text": "a"}
+        assert marked["content"][1] == {"type": "text", "text": "b", "cache_control": {"type": "ephemeral"}}
+        assert "cache_control" not in message["content"][1]
+
+    def test_unsupported_content_is_unchanged(self):
+        message = {"role": "user", "content": ["{}", object()]}
+        assert with_cache_control(message) is message
+
+
+class TestSupportsCacheControl:
+    def test_anthropic_provider(self):
+        client = Mock(spec=instructor.Instructor)
+        client.provider = instructor.Provider.ANTHROPIC
+        assert supports_cache_control(client, Mode.TOOLS)
+
+    def test_anthropic_mode(self):
+        assert supports_cache_control(Mock(spec=instructor.Instructor), Mode.ANTHROPIC_TOOLS)
+
+    def test_openai(self):
+        client = Mock(spec=instructor.Instructor)
+        client.provider = instructor.Provider.OPENAI
+        assert not supports_cache_control(client, Mode.TOOLS)
+
+
+class TestExtractPromptCacheUsage:
+    def _response(self, usage):
+        response = SimpleNamespace()
+        response._raw_response = SimpleNamespace(usage=usage)
+        return response
+
+    def test_anthropic_usage(self):
+        usage = SimpleNamespace(input_tokens=20, cache_read_input_tokens=1000, cache_creation_input_tokens=50)
+        assert extract_prompt_cache_usage(self._response(usage)) == PromptCacheUsage(1070, 1000, 50)
+
+    def test_openai_usage(self):
+        usage = SimpleNamespace(prompt_tokens=1500, prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+        assert extract_prompt_cache_usage(self._response(usage)) == PromptCacheUsage(1500, 1024, 0)
+
+    def test_usage_without_cache_statistics(self):
+        usage = SimpleNamespace(prompt_tokens=1500, prompt_tokens_details=None)
+        assert extract_prompt_cache_usage(self._response(usage)) is None
+
+    def test_response_without_raw_response(self):
+        assert extract_prompt_cache_usage(SimpleNamespace()) is None
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from atomic_agents.utils.rate_limiter import RateLimiter, RateLimiterStats
+
+
+class VirtualClock:
+    """A clock that only advances when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        await asyncio.sleep(0)
+        self.now += seconds
+
+
+def _limiter(clock, **kwargs):
+    return RateLimiter(clock=clock, sleep=clock.sleep, async_sleep=clock.async_sleep, **kwargs)
+
+
+class TestRateLimiter:
+    def test_requests_per_minute(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, requests_per_minute=60)
+
+        waits = [limiter.acquire() for _ in range(62)]
+
+        # The bucket starts full, then refills one request per second
+        assert waits[:60] == [0.0] * 60
+        assert waits[60:] == pytest.approx([1.0, 1.0])
+        assert clock.now == pytest.approx(2.0)
+
+    def test_tokens_per_minute(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, tokens_per_minute=6000)
+
+        assert limiter.acquire(5000) == 0.0
+        # 4000 more tokens are needed, at 100 tokens per second
+        assert limiter.acquire(5000) == pytest.approx(40.0)
+
+    def test_request_larger_than_budget_waits_for_full_bucket(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, tokens_per_minute=600)
+
+        limiter.acquire(300)
+        assert limiter.acquire(10_000) == pytest.approx(30.0)
+        assert limiter.stats().available_tokens == pytest.approx(0.0)
+
+    def test_both_limits(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, requests_per_minute=1, tokens_per_minute=60_000)
+
+        limiter.acquire(10)
+        assert limiter.acquire(10) == pytest.approx(60.0)
+
+    def test_stats(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, requests_per_minute=60, tokens_per_minute=600)
+
+        assert limiter.stats() == RateLimiterStats(0, 0, 0.0, 0.0, 60.0, 600.0)
+        limiter.acquire(600)
+        limiter.acquire(300)
+        stats = limiter.stats()
+
+        assert stats.admitted_requests == 2
+        assert stats.total_wait_time == pytest.approx(30.0)
+        assert stats.max_wait_time == pytest.approx(30.0)
+        assert stats.mean_wait_time == pytest.approx(15.0)
+        assert stats.queue_depth == 0
+
+    def test_unlimited(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock)
+        assert limiter.acquire(10**9) == 0.0
+        assert limiter.stats().available_tokens is None
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            RateLimiter(requests_per_minute=0)
+        with pytest.raises(ValueError):
+            RateLimiter(tokens_per_minute=-1)
+
+
+class TestRateLimiterAsync:
+    @pytest.mark.asyncio
+    async def test_callers_are_admitted_in_order(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, requests_per_minute=60)
+        for _ in range(60):
+            await limiter.acquire_async()
+
+        admitted = []
+
+        async def call(index):
+            await limiter.acquire_async()
+            admitted.append((index, clock.now))
+
+        tasks = [asyncio.create_task(call(index)) for index in range(5)]
+        await asyncio.sleep(0)
+        assert limiter.stats().queue_depth == 5
+        await asyncio.gather(*tasks)
+
+        assert [index for index, _ in admitted] == [0, 1, 2, 3, 4]
+        assert [now for _, now in admitted] == pytest.approx([1.0, 2.0, 3.0, 4.0, 5.0])
+        assert limiter.stats().queue_depth == 0
+        assert limiter.stats().max_wait_time == pytest.approx(5.0)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_leaves_queue(self):
+        clock = VirtualClock()
+        release = asyncio.Event()
+
+        async def blocking_sleep(seconds):
+            await release.wait()
+            clock.now += seconds
+
+        limiter = RateLimiter(requests_per_minute=60, clock=clock, async_sleep=blocking_sleep)
+        for _ in range(60):
+            await limiter.acquire_async()
+
+        waiting = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+        assert limiter.stats().queue_depth == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        stats = limiter.stats()
+        assert stats.queue_depth == 0
+        assert stats.admitted_requests == 60
+
+    def test_limiter_is_shared_across_event_loops(self):
+        clock = VirtualClock()
+        limiter = _limiter(clock, requests_per_minute=60)
+
+        async def contend():
+            await asyncio.gather(*(limiter.acquire_async() for _ in range(3)))
+
+        for _ in range(30):
+            asyncio.run(contend())
+
+        assert limiter.stats().admitted_requests == 90
+        assert clock.now == pytest.approx(30.0)
+
+    def test_sync_and_async_callers_share_the_queue(self):
+        clock = VirtualClock()
+        release = threading.Event()
+
+        def blocking_sleep(seconds):
+            release.wait()
+            clock.now += seconds
+
+        limiter = RateLimiter(requests_per_minute=60, clock=clock, sleep=blocking_sleep, async_sleep=clock.async_sleep)
+        for _ in range(60):
+            limiter.acquire()
+
+        thread = threading.Thread(target=limiter.acquire)
+        thread.start()
+        while limiter.stats().queue_depth < 1:
+            time.sleep(0.001)
+
+        async def main():
+            waiting = asyncio.create_task(limiter.acquire_async())
+            await asyncio.sleep(0.05)
+            # The async caller arrived second, so it waits for the sleeping sync caller
+            assert limiter.stats().queue_depth == 2
+            assert not waiting.done()
+            release.set()
+            return await waiting
+
+        assert asyncio.run(main()) == pytest.approx(2.0)
+        thread.join()
+        assert limiter.stats().admitted_requests == 62
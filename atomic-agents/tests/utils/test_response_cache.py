@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+from pydantic import BaseModel
+
+from atomic_agents.utils.response_cache import LRUResponseCache, SQLiteResponseCache, make_cache_key
+
+
+class Output(BaseModel):
+    answer: str
+
+
+class OtherOutput(BaseModel):
+    answer: int
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+MESSAGES = [{"role": "system", "content": "Be brief."}, {"role": "user", "content": '{"question": "Why?"}'}]
+
+
+class TestMakeCacheKey:
+    def test_stable(self):
+        key = make_cache_key("gpt-5-mini", MESSAGES, Output, {"temperature": 0, "strict": None}, mode="tool_call")
+        assert key == make_cache_key(
+            "gpt-5-mini", list(MESSAGES), Output, {"strict": None, "temperature": 0}, mode="tool_call"
+        )
+
+    @pytest.mark.parametrize(
+        "changes",
+        [
+            {"model": "gpt-5"},
+            {"messages": MESSAGES[:1]},
+            {"output_schema": OtherOutput},
+            {"completion_kwargs": {"temperature": 1}},
+            {"mode": "json_mode"},
+        ],
+    )
+    def test_changes_with_request(self, changes):
+        request = {
+            "model": "gpt-5-mini",
+            "messages": MESSAGES,
+            "output_schema": Output,
+            "completion_kwargs": {"temperature": 0},
+            "mode": "tool_call",
+        }
+        assert make_cache_key(**request) != make_cache_key(**{**request, **changes})
+
+    def test_multimodal_content(self):
+        messages = [{"role": "user", "content": ["text", Output(answer="a")]}]
+        other = [{"role": "user", "content": ["text", Output(answer="b")]}]
+        assert make_cache_key("m", messages, Output) != make_cache_key("m", other, Output)
+
+
+class TestLRUResponseCache:
+    def test_get_and_set(self):
+        cache = LRUResponseCache()
+        assert cache.get("a") is None
+        cache.set("a", "1")
+        assert cache.get("a") == "1"
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUResponseCache(max_size=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert len(cache) == 2
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = LRUResponseCache(ttl=10, clock=clock)
+        cache.set("a", "1")
+        clock.now = 9.9
+        assert cache.get("a") == "1"
+        clock.now = 10
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_clear(self):
+        cache = LRUResponseCache()
+        cache.set("a", "1")
+        cache.clear()
+        assert cache.get("a") is None
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            LRUResponseCache(max_size=0)
+
+
+class TestSQLiteResponseCache:
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "cache" / "responses.db"
+        cache = SQLiteResponseCache(path)
+        cache.set("a", '{"answer": "x"}')
+        cache.close()
+
+        cache = SQLiteResponseCache(path)
+        assert cache.get("a") == '{"answer": "x"}'
+        assert cache.get("b") is None
+        assert len(cache) == 1
+        cache.close()
+
+    def test_overwrite_and_clear(self, tmp_path):
+        cache = SQLiteResponseCache(tmp_path / "responses.db")
+        cache.set("a", "1")
+        cache.set("a", "2")
+        assert cache.get("a") == "2"
+        cache.clear()
+        assert cache.get("a") is None
+        cache.close()
+
+    def test_ttl(self, tmp_path):
+        clock = FakeClock(1000.0)
+        cache = SQLiteResponseCache(tmp_path / "responses.db", ttl=5, clock=clock)
+        cache.set("a", "1")
+        clock.now = 1004
+        assert cache.get("a") == "1"
+        clock.now = 1005
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        cache.close()
+
+    def test_shared_between_threads(self, tmp_path):
+        cache = SQLiteResponseCache(tmp_path / "responses.db")
+
+        def write(index):
+            cache.set(str(index), str(index))
+
+        threads = [threading.Thread(target=write, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(cache) == 8
+        cache.close()
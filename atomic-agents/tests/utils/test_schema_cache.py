@@ -0,0 +1,93 @@
+import gc
+from typing import List, Optional
+from unittest.mock import Mock, patch
+
+from instructor import Mode
+from pydantic import BaseModel, Field
+
+from atomic_agents.utils.schema_cache import SchemaArtifacts, clear_schema_cache, get_schema_artifacts
+
+
+class Address(BaseModel):
+    street: str = Field(..., description="The street.")
+    city: str = Field(..., description="The city.")
+
+
+class Person(BaseModel):
+    """A person."""
+
+    name: str = Field(..., description="The name.")
+    addresses: List[Address] = Field(default_factory=list, description="The addresses.")
+    nickname: Optional[str] = None
+
+
+class TestSchemaArtifacts:
+    def setup_method(self):
+        clear_schema_cache()
+
+    def test_tools_mode(self):
+        from instructor.processing.schema import generate_openai_schema
+
+        artifacts = get_schema_artifacts(Person, Mode.TOOLS)
+
+        assert artifacts.tools == [{"type": "function", "function": generate_openai_schema(Person)}]
+        assert artifacts.json_mode_text is None
+
+    def test_json_mode(self):
+        artifacts = get_schema_artifacts(Person, Mode.JSON)
+
+        assert artifacts.tools is None
+        assert artifacts.json_mode_text.startswith("As a genius expert")
+        assert '"addresses"' in artifacts.json_mode_text
+        assert artifacts.json_mode_text.endswith("Make sure to return an instance of the JSON, not the schema itself")
+
+    def test_generated_once_per_schema_and_mode(self):
+        with patch.object(Person, "model_json_schema", wraps=Person.model_json_schema) as model_json_schema:
+            first = get_schema_artifacts(Person, Mode.JSON)
+            second = get_schema_artifacts(Person, Mode.JSON)
+            other_mode = get_schema_artifacts(Person, Mode.MD_JSON)
+
+        assert first is second
+        assert other_mode is not first
+        assert model_json_schema.call_count == 2
+
+    def test_token_count_cached_per_model_and_counter(self):
+        counter = Mock()
+        counter.count_tools.side_effect = [40, 50]
+        artifacts = get_schema_artifacts(Person, Mode.TOOLS)
+
+        assert artifacts.token_count("gpt-4", counter) == 40
+        assert artifacts.token_count("gpt-4", counter) == 40
+        assert artifacts.token_count("claude-3-opus", counter) == 50
+        counter.count_tools.assert_called_with("claude-3-opus", artifacts.tools)
+        assert counter.count_tools.call_count == 2
+
+        other_counter = Mock()
+        other_counter.count_tools.return_value = 41
+        assert artifacts.token_count("gpt-4", other_counter) == 41
+
+    def test_json_mode_token_count(self):
+        counter = Mock()
+        counter.count_text.return_value = 120
+        artifacts = get_schema_artifacts(Person, Mode.JSON)
+
+        assert artifacts.token_count("gpt-4", counter) == 120
+        counter.count_text.assert_called_once_with("gpt-4", artifacts.json_mode_text)
+
+    def test_entries_go_away_with_their_schema(self):
+        def make_schema():
+            class Temporary(BaseModel):
+                value: int
+
+            # JSON mode, as Instructor keeps its own bounded cache of generated tool schemas
+            get_schema_artifacts(Temporary, Mode.JSON)
+
+        from atomic_agents.utils import schema_cache
+
+        before = len(schema_cache._artifacts)
+        make_schema()
+        gc.collect()
+        assert len(schema_cache._artifacts) == before
+
+    def test_instance(self):
+        assert isinstance(get_schema_artifacts(Address, Mode.TOOLS_STRICT), SchemaArtifacts)
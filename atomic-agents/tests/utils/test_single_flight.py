@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+import pytest
+
+from atomic_agents.utils.single_flight import SingleFlight
+
+
+class Backend:
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def fetch(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"call": self.calls}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_call():
+    group = SingleFlight()
+    backend = Backend()
+
+    tasks = [asyncio.create_task(group.do("key", backend.fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert group.in_flight("key")
+    backend.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert backend.calls == 1
+    assert all(result is results[0] for result in results)
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_do_not_share():
+    group = SingleFlight()
+    backend = Backend()
+    backend.release.set()
+
+    await asyncio.gather(group.do("a", backend.fetch), group.do("b", backend.fetch))
+
+    assert backend.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_key_is_released_after_completion():
+    group = SingleFlight()
+    backend = Backend()
+    backend.release.set()
+
+    first = await group.do("key", backend.fetch)
+    second = await group.do("key", backend.fetch)
+
+    assert first == {"call": 1}
+    assert second == {"call": 2}
+
+
+@pytest.mark.asyncio
+async def test_exceptions_are_shared_and_released():
+    group = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(group.do("key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(group) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    group = SingleFlight()
+    backend = Backend()
+
+    first = asyncio.create_task(group.do("key", backend.fetch))
+    second = asyncio.create_task(group.do("key", backend.fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    backend.release.set()
+
+    assert await second == {"call": 1}
+    assert first.cancelled()
+    assert not backend.cancelled
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_when_every_caller_is_cancelled():
+    group = SingleFlight()
+    backend = Backend()
+
+    tasks = [asyncio.create_task(group.do("key", backend.fetch)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert backend.cancelled
+    assert not group.in_flight("key")
+
+    # A new caller starts a fresh call
+    backend.release.set()
+    assert await group.do("key", backend.fetch) == {"call": 2}
+
+
+def test_calls_are_shared_per_event_loop():
+    group = SingleFlight()
+    started = threading.Barrier(2, timeout=5)
+    results = {}
+
+    async def fetch():
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        return threading.get_ident()
+
+    def run():
+        results[threading.get_ident()] = asyncio.run(group.do("key", fetch))
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # Both loops had the key in flight at the same time, and each ran its own call
+    assert all(thread_id == result for thread_id, result in results.items())
+    assert len(results) == 2
+    assert len(group) == 0
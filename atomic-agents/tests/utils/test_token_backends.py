@@ -0,0 +1,165 @@
+import math
+from unittest.mock import patch
+
+import pytest
+
+from atomic_agents.utils.token_backends import (
+    BaseTokenCounterBackend,
+    HeuristicBackend,
+    LiteLLMBackend,
+    TiktokenBackend,
+)
+from atomic_agents.utils.token_counter import TokenCounter, TokenCountError
+
+
+class WhitespaceEncoding:
+    """Stand-in for a tiktoken encoding: one token per whitespace-separated word."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+class TestLiteLLMBackend:
+    @patch("litellm.token_counter")
+    def test_count_messages(self, mock_token_counter):
+        mock_token_counter.return_value = 42
+        messages = [{"role": "user", "content": "Hello"}]
+
+        assert LiteLLMBackend().count_messages("gpt-4", messages) == 42
+        mock_token_counter.assert_called_once_with(model="gpt-4", messages=messages)
+
+    @patch("litellm.get_model_info")
+    def test_get_max_tokens(self, mock_get_model_info):
+        mock_get_model_info.return_value = {"max_input_tokens": 128000, "max_tokens": 16384}
+
+        assert LiteLLMBackend().get_max_tokens("gpt-4o") == 128000
+
+
+class TestTiktokenBackend:
+    @patch("tiktoken.encoding_for_model")
+    def test_count_messages(self, mock_encoding_for_model):
+        mock_encoding_for_model.return_value = WhitespaceEncoding()
+
+        backend = TiktokenBackend()
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant"},
+            {"role": "user", "content": "Hello there", "name": "alice"},
+        ]
+
+        # reply priming (3) + per message (3 + role) + name (1 + 1) + content words
+        assert backend.count_messages("gpt-4o", messages) == 3 + (3 + 1 + 5) + (3 + 1 + 1 + 1 + 2)
+
+    @patch("tiktoken.encoding_for_model")
+    def test_provider_prefix_is_stripped_and_encoding_is_reused(self, mock_encoding_for_model):
+        mock_encoding_for_model.return_value = WhitespaceEncoding()
+
+        backend = TiktokenBackend()
+        backend.count_messages("openai/gpt-4o", [{"role": "user", "content": "Hi"}])
+        backend.count_messages("openai/gpt-4o", [{"role": "user", "content": "Hi again"}])
+
+        mock_encoding_for_model.assert_called_once_with("gpt-4o")
+
+    @patch("tiktoken.get_encoding")
+    @patch("tiktoken.encoding_for_model")
+    def test_unknown_models_use_the_default_encoding(self, mock_encoding_for_model, mock_get_encoding):
+        mock_encoding_for_model.side_effect = KeyError("unknown model")
+        mock_get_encoding.return_value = WhitespaceEncoding()
+
+        TiktokenBackend(default_encoding="cl100k_base").count_messages("claude-3-opus", [{"role": "user", "content": "Hi"}])
+
+        mock_get_encoding.assert_called_once_with("cl100k_base")
+
+    @patch("tiktoken.encoding_for_model")
+    def test_multimodal_parts_and_tools(self, mock_encoding_for_model):
+        mock_encoding_for_model.return_value = WhitespaceEncoding()
+
+        backend = TiktokenBackend(media_tokens=100)
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "Describe this"},
+                    {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+                ],
+            }
+        ]
+        tools = [{"type": "function", "function": {"name": "describe"}}]
+
+        without_tools = backend.count_messages("gpt-4o", messages)
+        assert without_tools == 3 + 3 + 1 + 2 + 100
+        # The compact JSON of the tools has no whitespace, so it is one "word"
+        assert backend.count_messages("gpt-4o", messages, tools) == without_tools + 1
+
+
+class TestHeuristicBackend:
+    def test_estimate_uses_family_ratio_and_margin(self):
+        backend = HeuristicBackend(safety_margin=0.1, tokens_per_message=4)
+        messages = [{"role": "user", "content": "x" * 346}]
+
+        # 4 + 346 bytes at 3.5 bytes per token, plus 4 per message, plus 10%
+        assert backend.count_messages("anthropic/claude-3-opus", messages) == math.ceil((350 / 3.5 + 4) * 1.1)
+
+    @pytest.mark.parametrize(
+        "model, ratio",
+        [
+            ("gpt-4o-mini", 4.4),
+            ("openai/gpt-5-mini", 4.4),
+            ("gpt-3.5-turbo", 4.0),
+            ("claude-sonnet-4-5", 3.5),
+            ("gemini/gemini-2.5-flash", 4.0),
+            ("some-unknown-model", HeuristicBackend.DEFAULT_BYTES_PER_TOKEN),
+        ],
+    )
+    def test_model_families(self, model, ratio):
+        assert HeuristicBackend().get_bytes_per_token(model) == ratio
+
+    def test_explicit_ratio_overrides_families(self):
+        assert HeuristicBackend(bytes_per_token=2.0).get_bytes_per_token("gpt-4o") == 2.0
+
+    def test_counts_utf8_bytes(self):
+        backend = HeuristicBackend(bytes_per_token=1.0, safety_margin=0.0, tokens_per_message=0)
+
+        assert backend.count_messages("gpt-4o", [{"role": "", "content": "héllo"}]) == 6
+
+    def test_media_parts_and_tools(self):
+        backend = HeuristicBackend(bytes_per_token=1.0, safety_margin=0.0, tokens_per_message=0, media_tokens=100)
+        messages = [{"role": "", "content": [{"type": "text", "text": "abc"}, {"type": "input_audio", "input_audio": {}}]}]
+        tools = [{"name": "fn"}]
+
+        assert backend.count_messages("gpt-4o", messages) == 103
+        assert backend.count_messages("gpt-4o", messages, tools) == 103 + len('[{"name":"fn"}]')
+
+    def test_invalid_parameters(self):
+        with pytest.raises(ValueError):
+            HeuristicBackend(bytes_per_token=0)
+        with pytest.raises(ValueError):
+            HeuristicBackend(safety_margin=-0.1)
+
+
+class TestTokenCounterBackends:
+    @patch("litellm.token_counter")
+    def test_counter_uses_backend(self, mock_token_counter):
+        counter = TokenCounter(backend=HeuristicBackend(bytes_per_token=1.0, safety_margin=0.0, tokens_per_message=0))
+
+        assert counter.count_text("gpt-4o", "Hello") == len("user") + len("Hello")
+        assert counter.count_tools("gpt-4o", [{"name": "fn"}]) == len('[{"name":"fn"}]')
+        mock_token_counter.assert_not_called()
+
+    def test_backend_errors_are_wrapped(self):
+        class FailingBackend(BaseTokenCounterBackend):
+            def count_messages(self, model, messages, tools=None):
+                raise RuntimeError("tokenizer unavailable")
+
+        with pytest.raises(TokenCountError):
+            TokenCounter(backend=FailingBackend()).count_text("gpt-4o", "Hello")
+
+    def test_backend_can_provide_max_tokens(self):
+        class FixedWindowBackend(HeuristicBackend):
+            def get_max_tokens(self, model):
+                return 1000
+
+        counter = TokenCounter(backend=FixedWindowBackend())
+        result = counter.count_context("custom-model", [{"role": "system", "content": "Hi"}], [])
+
+        assert result.max_tokens == 1000
+        assert result.utilization == pytest.approx(result.total / 1000)
@@ -1,13 +1,27 @@
+import gc
+import weakref
+
 import pytest
 from unittest.mock import patch
 from atomic_agents.utils.token_counter import (
     TokenCounter,
     TokenCountResult,
+    OffloadedTokenCountResult,
     TokenCountError,
+    TokenCacheInfo,
     get_token_counter,
 )
 
 
+def _primed_count(model, messages, tools=None):
+    """Count like OpenAI chat models: 3 tokens of reply priming, 4 tokens of framing per message, 50 per tool."""
+    return 3 + sum(4 + len(message["content"]) for message in messages) + 50 * len(tools or [])
+
+
+SYSTEM = [{"role": "system", "content": "You are helpful"}]
+HELLO = {"role": "user", "content": "Hello"}
+
+
 class TestTokenCountResult:
     """Tests for TokenCountResult named tuple."""
 
@@ -57,6 +71,15 @@ class TestTokenCountResult:
         assert max_tokens is None
         assert utilization is None
 
+    def test_offloaded_result_keeps_tuple_shape(self):
+        result = TokenCountResult(total=100, system_prompt=30, history=50, tools=20, model="gpt-4")
+        offloaded = OffloadedTokenCountResult.from_result(result, 0.25)
+        assert offloaded == result
+        assert isinstance(offloaded, TokenCountResult)
+        assert len(offloaded) == 7
+        assert offloaded.total == 100
+        assert offloaded.duration == 0.25
+
     def test_access_by_index(self):
         result = TokenCountResult(
             total=100,
@@ -203,69 +226,100 @@ class TestTokenCounter:
     @patch("litellm.get_model_info")
     @patch("litellm.token_counter")
     def test_count_context(self, mock_token_counter, mock_get_model_info):
-        mock_token_counter.side_effect = [30, 70]  # system, then history
+        mock_token_counter.side_effect = _primed_count
         mock_get_model_info.return_value = {"max_input_tokens": 8192, "max_tokens": 4096}
 
         counter = TokenCounter()
-        result = counter.count_context(
-            model="gpt-4",
-            system_messages=[{"role": "system", "content": "You are helpful"}],
-            history_messages=[{"role": "user", "content": "Hello"}],
-        )
+        result = counter.count_context(model="gpt-4", system_messages=SYSTEM, history_messages=[HELLO])
 
-        assert result.total == 100
-        assert result.system_prompt == 30
-        assert result.history == 70
+        # The reply priming is counted once, with the system prompt
+        assert result.system_prompt == 3 + 4 + 15
+        assert result.history == 4 + 5
+        assert result.total == 31 == _primed_count("gpt-4", SYSTEM + [HELLO])
         assert result.tools == 0
         assert result.model == "gpt-4"
         assert result.max_tokens == 8192
-        assert result.utilization == pytest.approx(100 / 8192)
+        assert result.utilization == pytest.approx(31 / 8192)
 
     @patch("litellm.get_model_info")
     @patch("litellm.token_counter")
     def test_count_context_with_tools(self, mock_token_counter, mock_get_model_info):
-        # system=30, history=70, empty_with_tools=60, empty_without_tools=10 -> tools=50
-        mock_token_counter.side_effect = [30, 70, 60, 10]
+        mock_token_counter.side_effect = _primed_count
         mock_get_model_info.return_value = {"max_input_tokens": 8192, "max_tokens": 4096}
 
         counter = TokenCounter()
         tools = [{"type": "function", "function": {"name": "test_fn"}}]
+        result = counter.count_context(model="gpt-4", system_messages=SYSTEM, history_messages=[HELLO], tools=tools)
+
+        assert result.system_prompt == 22
+        assert result.history == 9
+        assert result.tools == 50
+        assert result.total == 81 == _primed_count("gpt-4", SYSTEM + [HELLO], tools)
+        assert result.model == "gpt-4"
+
+    @patch("litellm.get_model_info")
+    @patch("litellm.token_counter")
+    def test_count_context_with_precomputed_tools_tokens(self, mock_token_counter, mock_get_model_info):
+        mock_token_counter.side_effect = _primed_count
+        mock_get_model_info.return_value = {"max_input_tokens": 8192}
+
+        counter = TokenCounter()
         result = counter.count_context(
             model="gpt-4",
-            system_messages=[{"role": "system", "content": "You are helpful"}],
-            history_messages=[{"role": "user", "content": "Hello"}],
-            tools=tools,
+            system_messages=SYSTEM,
+            history_messages=[HELLO],
+            tools=[{"type": "function", "function": {"name": "test_fn"}}],
+            tools_tokens=50,
         )
 
-        assert result.system_prompt == 30
-        assert result.history == 70
         assert result.tools == 50
-        assert result.total == 150  # 30 + 70 + 50
-        assert result.model == "gpt-4"
+        assert result.total == 81
+        assert not any("tools" in call.kwargs for call in mock_token_counter.call_args_list)
+
+    @patch("litellm.get_model_info")
+    @patch("litellm.token_counter")
+    def test_count_context_with_precomputed_system_tokens(self, mock_token_counter, mock_get_model_info):
+        mock_token_counter.side_effect = _primed_count
+        mock_get_model_info.return_value = {"max_input_tokens": 8192}
+
+        counter = TokenCounter()
+        result = counter.count_context(model="gpt-4", system_messages=SYSTEM, history_messages=[HELLO], system_tokens=30)
+
+        assert result.system_prompt == 30
+        assert result.total == 39
+        assert not any(SYSTEM[0] in call.kwargs["messages"] for call in mock_token_counter.call_args_list)
+
+    @patch("litellm.token_counter")
+    def test_count_tools(self, mock_token_counter):
+        mock_token_counter.side_effect = [60, 10]
+
+        counter = TokenCounter()
+        assert counter.count_tools("gpt-4", [{"type": "function", "function": {"name": "test_fn"}}]) == 50
 
     @patch("litellm.get_model_info")
     @patch("litellm.token_counter")
     def test_count_context_empty_system(self, mock_token_counter, mock_get_model_info):
-        mock_token_counter.return_value = 50
+        mock_token_counter.side_effect = _primed_count
         mock_get_model_info.return_value = {"max_input_tokens": 4096, "max_tokens": 2048}
 
         counter = TokenCounter()
         result = counter.count_context(
             model="gpt-3.5-turbo",
             system_messages=[],  # No system prompt
-            history_messages=[{"role": "user", "content": "Hello"}],
+            history_messages=[HELLO],
         )
 
-        assert result.total == 50
+        # Without a system prompt the reply priming is counted with the history
+        assert result.total == 12 == _primed_count("gpt-3.5-turbo", [HELLO])
         assert result.system_prompt == 0
-        assert result.history == 50
+        assert result.history == 12
         assert result.model == "gpt-3.5-turbo"
         assert result.max_tokens == 4096
 
     @patch("litellm.get_model_info")
     @patch("litellm.token_counter")
     def test_count_context_no_max_tokens(self, mock_token_counter, mock_get_model_info):
-        mock_token_counter.side_effect = [20, 30]
+        mock_token_counter.side_effect = _primed_count
         mock_get_model_info.side_effect = Exception("Unknown model")
 
         counter = TokenCounter()
@@ -275,7 +329,7 @@ class TestTokenCounter:
             history_messages=[{"role": "user", "content": "Test"}],
         )
 
-        assert result.total == 50
+        assert result.total == 19
         assert result.max_tokens is None
         assert result.utilization is None
 
@@ -305,7 +359,7 @@ class TestTokenCounter:
     @patch("litellm.token_counter")
     def test_count_context_division_by_zero_prevention(self, mock_token_counter, mock_get_model_info):
         """Test that division by zero is prevented when max_tokens is 0."""
-        mock_token_counter.side_effect = [20, 30]
+        mock_token_counter.side_effect = _primed_count
         mock_get_model_info.return_value = {"max_input_tokens": 0, "max_tokens": 0}  # Edge case
 
         counter = TokenCounter()
@@ -315,7 +369,7 @@ class TestTokenCounter:
             history_messages=[{"role": "user", "content": "Test"}],
         )
 
-        assert result.total == 50
+        assert result.total == 19
         assert result.max_tokens == 0
         assert result.utilization is None  # Should be None, not raise ZeroDivisionError
 
@@ -339,6 +393,141 @@ class TestTokenCounter:
         assert result.tools == 0
 
 
+class TestTokenCounterCaching:
+    """Tests for the TokenCounter caches."""
+
+    @patch("litellm.token_counter")
+    def test_identical_messages_are_counted_once(self, mock_token_counter):
+        mock_token_counter.return_value = 42
+
+        counter = TokenCounter()
+        assert counter.count_messages("gpt-4", [{"role": "system", "content": "You are helpful"}]) == 42
+        # An equal but distinct list hits the cache
+        assert counter.count_messages("gpt-4", [{"role": "system", "content": "You are helpful"}]) == 42
+
+        assert mock_token_counter.call_count == 1
+        assert counter.cache_info()["messages"] == TokenCacheInfo(hits=1, misses=1, size=1, max_size=1024)
+
+    @patch("litellm.token_counter")
+    def test_cache_is_keyed_by_model_content_and_tools(self, mock_token_counter):
+        mock_token_counter.return_value = 42
+        messages = [{"role": "user", "content": "Hello"}]
+
+        counter = TokenCounter()
+        counter.count_messages("gpt-4", messages)
+        counter.count_messages("gpt-4o", messages)
+        counter.count_messages("gpt-4", [{"role": "user", "content": "Hello!"}])
+        counter.count_messages("gpt-4", messages, tools=[{"type": "function", "function": {"name": "test_fn"}}])
+
+        assert mock_token_counter.call_count == 4
+        assert counter.cache_info()["messages"].hits == 0
+
+    @patch("litellm.token_counter")
+    def test_least_recently_used_entry_is_evicted(self, mock_token_counter):
+        mock_token_counter.return_value = 1
+
+        counter = TokenCounter(cache_size=2)
+        first, second, third = ([{"role": "user", "content": text}] for text in ("a", "b", "c"))
+        counter.count_messages("gpt-4", first)
+        counter.count_messages("gpt-4", second)
+        counter.count_messages("gpt-4", first)
+        counter.count_messages("gpt-4", third)  # Evicts second
+        counter.count_messages("gpt-4", first)
+        counter.count_messages("gpt-4", second)
+
+        assert mock_token_counter.call_count == 4
+        assert counter.cache_info()["messages"].size == 2
+
+    @patch("litellm.token_counter")
+    def test_failures_are_not_cached(self, mock_token_counter):
+        mock_token_counter.side_effect = [Exception("tokenizer unavailable"), 42]
+        messages = [{"role": "user", "content": "Hello"}]
+
+        counter = TokenCounter()
+        with pytest.raises(TokenCountError):
+            counter.count_messages("gpt-4", messages)
+        assert counter.count_messages("gpt-4", messages) == 42
+
+    @patch("litellm.token_counter")
+    def test_cache_can_be_disabled(self, mock_token_counter):
+        mock_token_counter.return_value = 42
+        messages = [{"role": "user", "content": "Hello"}]
+
+        counter = TokenCounter(cache_size=0)
+        counter.count_messages("gpt-4", messages)
+        counter.count_messages("gpt-4", messages)
+
+        assert mock_token_counter.call_count == 2
+        assert counter.cache_info()["messages"] == TokenCacheInfo(hits=0, misses=0, size=0, max_size=0)
+
+    @patch("litellm.token_counter")
+    def test_tools_overhead_is_counted_once(self, mock_token_counter):
+        mock_token_counter.side_effect = [60, 10]
+
+        counter = TokenCounter()
+        assert counter.count_tools("gpt-4", [{"type": "function", "function": {"name": "test_fn"}}]) == 50
+        assert counter.count_tools("gpt-4", [{"type": "function", "function": {"name": "test_fn"}}]) == 50
+
+        assert mock_token_counter.call_count == 2
+        assert counter.cache_info()["tools"] == TokenCacheInfo(hits=1, misses=1, size=1, max_size=128)
+
+    @patch("litellm.get_model_info")
+    def test_max_tokens_is_looked_up_once(self, mock_get_model_info):
+        mock_get_model_info.side_effect = [{"max_input_tokens": 8192}, Exception("Unknown model")]
+
+        counter = TokenCounter()
+        assert counter.get_max_tokens("gpt-4") == 8192
+        assert counter.get_max_tokens("gpt-4") == 8192
+        # Unknown models are cached as well, so the warning is only logged once
+        assert counter.get_max_tokens("unknown-model") is None
+        assert counter.get_max_tokens("unknown-model") is None
+
+        assert mock_get_model_info.call_count == 2
+        assert counter.cache_info()["max_tokens"].hits == 2
+
+    @patch("litellm.get_model_info")
+    @patch("litellm.token_counter")
+    def test_count_context_reuses_system_prompt_count(self, mock_token_counter, mock_get_model_info):
+        mock_token_counter.side_effect = _primed_count
+        mock_get_model_info.return_value = {"max_input_tokens": 8192}
+
+        counter = TokenCounter()
+        counter.count_context("gpt-4", SYSTEM, [HELLO])
+        calls = mock_token_counter.call_count
+        result = counter.count_context("gpt-4", SYSTEM, [HELLO, {"role": "assistant", "content": "Hi"}])
+
+        assert result.system_prompt == 22
+        assert result.history == 9 + 6
+        # Only the new message is tokenized
+        assert mock_token_counter.call_count == calls + 1
+        assert mock_get_model_info.call_count == 1
+
+    @patch("litellm.token_counter")
+    def test_count_message_excludes_request_overhead(self, mock_token_counter):
+        # Reply priming of 3 tokens per call, 6 tokens per message
+        mock_token_counter.side_effect = lambda model, messages, **kwargs: 3 + 6 * len(messages)
+
+        counter = TokenCounter()
+        assert counter.get_request_overhead("gpt-4") == 3
+        assert counter.count_message("gpt-4", {"role": "user", "content": "Hello"}) == 6
+        assert counter.count_message("gpt-4", {"role": "user", "content": "Hi"}) == 6
+        assert counter.cache_info()["overhead"].misses == 1
+
+    @patch("litellm.token_counter")
+    def test_clear_cache(self, mock_token_counter):
+        mock_token_counter.return_value = 42
+        messages = [{"role": "user", "content": "Hello"}]
+
+        counter = TokenCounter()
+        counter.count_messages("gpt-4", messages)
+        counter.count_messages("gpt-4", messages)
+        counter.clear_cache()
+        counter.count_messages("gpt-4", messages)
+
+        assert mock_token_counter.call_count == 2
+        assert counter.cache_info()["messages"] == TokenCacheInfo(hits=0, misses=1, size=1, max_size=1024)
+
+
 class TestGetTokenCounter:
     """Tests for the get_token_counter singleton function."""
 
@@ -353,6 +542,30 @@ class TestGetTokenCounter:
         counter2 = get_token_counter()
         assert counter1 is counter2
 
+    def test_get_token_counter_with_backend(self):
+        """Test that each backend instance gets its own shared counter."""
+        from atomic_agents.utils.token_backends import HeuristicBackend, LiteLLMBackend
+
+        backend = HeuristicBackend()
+        counter = get_token_counter(backend)
+        assert counter.backend is backend
+        assert get_token_counter(backend) is counter
+        assert get_token_counter(HeuristicBackend()) is not counter
+        assert isinstance(get_token_counter().backend, LiteLLMBackend)
+
+    def test_get_token_counter_releases_dropped_backends(self):
+        """The shared counter doesn't keep its backend (and the counter's caches) alive."""
+        from atomic_agents.utils.token_backends import HeuristicBackend
+
+        backend = HeuristicBackend()
+        cache_key = get_token_counter(backend).cache_key
+        backend_ref = weakref.ref(backend)
+        del backend
+        gc.collect()
+
+        assert backend_ref() is None
+        assert get_token_counter(HeuristicBackend()).cache_key != cache_key
+
 
 class TestTokenCountError:
     """Tests for TokenCountError exception."""
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare the size and speed of ChatHistory's JSON and binary dumps on synthetic histories.
+
+Usage: python scripts/benchmark_history_serialization.py [--turns N] [--repeat N]
+"""
+
+import argparse
+import base64
+import os
+import time
+from typing import Callable, List, Optional
+
+import instructor
+from pydantic import Field
+
+from atomic_agents import BaseIOSchema
+from atomic_agents.context import ChatHistory
+
+
+class TextSchema(BaseIOSchema):
+    """Synthetic text message."""
+
+    text: str = Field(..., description="The message text")
+    tags: List[str] = Field(default_factory=list, description="Some tags")
+
+
+class ImageSchema(BaseIOSchema):
+    """Synthetic multimodal message."""
+
+    text: str = Field(..., description="The instruction text")
+    images: List[instructor.Image] = Field(..., description="The images")
+
+
+def build_text_history(turns: int) -> ChatHistory:
+    history = ChatHistory()
+    for index in range(turns):
+        history.initialize_turn()
+        history.add_message("user", TextSchema(text=f"Question {index}: " + "lorem ipsum dolor " * 20, tags=["q"]))
+        history.add_message("assistant", TextSchema(text=f"Answer {index}: " + "sit amet consectetur " * 60))
+    return history
+
+
+def build_multimodal_history(turns: int) -> ChatHistory:
+    history = ChatHistory()
+    for index in range(turns):
+        # Random bytes don't compress, like real JPEG data
+        image = instructor.Image(
+            source="synthetic.jpg", media_type="image/jpeg", data=base64.b64encode(os.urandom(64 * 1024)).decode()
+        )
+        history.initialize_turn()
+        history.add_message("user", ImageSchema(text=f"Describe image {index}", images=[image]))
+        history.add_message("assistant", TextSchema(text=f"Image {index} shows " + "a landscape " * 40))
+    return history
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(name: str, history: ChatHistory, repeat: int) -> None:
+    formats = [("json", None)]
+    for label, compression in [("binary", None), ("binary+zlib", "zlib"), ("binary+zstd", "zstd")]:
+        try:
+            history.dump_binary(compression=compression)
+        except ImportError as e:
+            print(f"Skipping {label}: {e}")
+            continue
+        formats.append((label, compression))
+
+    print(f"\n{name}: {history.get_message_count()} messages")
+    print(f"{'format':<14}{'size (KiB)':>12}{'dump (ms)':>12}{'load (ms)':>12}")
+    for label, compression in formats:
+        if label == "json":
+            dump: Callable[[], object] = history.dump
+        else:
+
+            def dump(compression: Optional[str] = compression) -> bytes:
+                return history.dump_binary(compression=compression)
+
+        data = dump()
+        size = len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+        dump_time = best_time(dump, repeat)
+        load_time = best_time(lambda: ChatHistory().load(data), repeat)
+        print(f"{label:<14}{size / 1024:>12.1f}{dump_time * 1000:>12.1f}{load_time * 1000:>12.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=500, help="Number of turns in the text history")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs, the best one is reported")
+    args = parser.parse_args()
+
+    run("Text history", build_text_history(args.turns), args.repeat)
+    run("Multimodal history", build_multimodal_history(max(1, args.turns // 25)), args.repeat)
+
+
+if __name__ == "__main__":
+    main()